@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""对比两次基准测试结果
+
+示例:
+    python benchmarks/compare.py benchmarks/results/base.json benchmarks/results/new.json --threshold 10
+有指标退化超过阈值时以状态码 1 退出，可用于 CI。
+"""
+
+import argparse
+import json
+import sys
+from typing import Dict, List, Optional, Tuple
+
+# (指标名, 取值路径, 数值越大越好)
+METRICS: List[Tuple[str, Tuple[str, ...], bool]] = [
+    ('p50_ms', ('latency_ms', 'p50'), False),
+    ('p95_ms', ('latency_ms', 'p95'), False),
+    ('p99_ms', ('latency_ms', 'p99'), False),
+    ('throughput_rps', ('throughput_rps',), True),
+    ('rss_peak_mb', ('rss_mb', 'peak'), False),
+    ('errors', ('errors',), False),
+]
+
+
+def run_key(run: Dict) -> Tuple:
+    return (run['server'], run['transport'], run.get('mix', 'default'), run['concurrency'], run.get('workers', 1))
+
+
+def dig(data: Dict, path: Tuple[str, ...]) -> Optional[float]:
+    for part in path:
+        if not isinstance(data, dict) or data.get(part) is None:
+            return None
+        data = data[part]
+    return data
+
+
+def change_percent(base: float, new: float) -> Optional[float]:
+    if base == 0:
+        return None if new == 0 else float('inf')
+    return (new - base) / base * 100
+
+
+def compare(base: Dict, new: Dict, threshold: float) -> Tuple[List[Dict], List[str]]:
+    """返回 (对比行, 退化描述)"""
+    base_runs = {run_key(r): r for r in base['runs']}
+    rows, regressions = [], []
+    for run in new['runs']:
+        key = run_key(run)
+        old = base_runs.get(key)
+        if old is None:
+            continue
+        label = '/'.join(str(k) for k in key)
+        for metric, path, higher_is_better in METRICS:
+            before, after = dig(old, path), dig(run, path)
+            if before is None or after is None:
+                continue
+            change = change_percent(before, after)
+            regressed = False
+            if change is not None:
+                worse = -change if higher_is_better else change
+                regressed = worse > threshold
+            rows.append({
+                'run': label, 'metric': metric, 'base': before, 'new': after,
+                'change': change, 'regressed': regressed
+            })
+            if regressed:
+                regressions.append(f"{label} {metric}: {before} -> {after}")
+    return rows, regressions
+
+
+def format_change(change: Optional[float]) -> str:
+    if change is None:
+        return '-'
+    if change == float('inf'):
+        return '+inf'
+    return f"{change:+.1f}%"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='对比两次基准测试结果')
+    parser.add_argument('base', help='基线结果文件')
+    parser.add_argument('new', help='新结果文件')
+    parser.add_argument('--threshold', type=float, default=10.0, help='退化阈值（百分比）')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出对比结果')
+    args = parser.parse_args(argv)
+
+    with open(args.base, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(args.new, encoding='utf-8') as f:
+        new = json.load(f)
+
+    rows, regressions = compare(base, new, args.threshold)
+
+    if args.json:
+        print(json.dumps({'rows': rows, 'regressions': regressions}, ensure_ascii=False, indent=2))
+    else:
+        print(f"基线: {base['meta'].get('git_revision')} ({base['meta'].get('timestamp')})")
+        print(f"新版: {new['meta'].get('git_revision')} ({new['meta'].get('timestamp')})")
+        print(f"{'run':<40} {'metric':<16} {'base':>12} {'new':>12} {'change':>10}")
+        for row in rows:
+            flag = '  <-- 退化' if row['regressed'] else ''
+            print(
+                f"{row['run']:<40} {row['metric']:<16} {row['base']:>12} {row['new']:>12} "
+                f"{format_change(row['change']):>10}{flag}"
+            )
+        if regressions:
+            print(f"\n{len(regressions)} 项指标退化超过 {args.threshold}%", file=sys.stderr)
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+"""MCP 服务基准测试
+
+启动本地上游桩服务，分别以 stdio 和 HTTP（SSE / Streamable HTTP）方式启动被测服务，
+按工具组合并发调用，统计 p50/p95/p99 延迟、吞吐量和服务进程内存，结果写入 JSON。
+
+示例:
+    python benchmarks/run_bench.py --server all --transport all --concurrency 8 --requests 500
+    python benchmarks/run_bench.py --server stats --transport http --duration 30 --mix lookup
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import AsyncExitStack
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.sse import sse_client
+from mcp.client.stdio import stdio_client
+try:
+    from mcp.client.streamable_http import streamable_http_client
+except ImportError:  # mcp 1.x 早期版本只有旧名称
+    from mcp.client.streamable_http import streamablehttp_client as streamable_http_client
+
+from scenarios import ROOT, SCENARIOS, ServerScenario, ToolCall, resolve_mix
+from stub_upstreams import StubUpstream
+
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+STARTUP_TIMEOUT = 30.0
+RSS_SAMPLE_INTERVAL = 0.1
+
+
+# ---------------------------------------------------------------- 统计
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """线性插值百分位（输入需已排序）"""
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    values = sorted(latencies)
+    return {
+        'p50': round(percentile(values, 50), 3),
+        'p95': round(percentile(values, 95), 3),
+        'p99': round(percentile(values, 99), 3),
+        'mean': round(sum(values) / len(values), 3) if values else 0.0,
+        'max': round(values[-1], 3) if values else 0.0,
+    }
+
+
+# ---------------------------------------------------------------- 进程内存
+
+def _read_status_kb(pid: int, field: str) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def _parent_map() -> Dict[int, int]:
+    """pid -> ppid（仅 Linux）"""
+    parents = {}
+    proc = Path('/proc')
+    if not proc.is_dir():
+        return parents
+    for entry in proc.iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / 'stat').read_text()
+            parents[int(entry.name)] = int(stat.rsplit(')', 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+    return parents
+
+
+def process_tree(pid: int) -> List[int]:
+    """进程及其所有子孙进程（多 worker 模式下包含各 worker）"""
+    children: Dict[int, List[int]] = {}
+    for child, parent in _parent_map().items():
+        children.setdefault(parent, []).append(child)
+    tree, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack.extend(children.get(current, []))
+    return tree
+
+
+def find_child_pid(script: str) -> Optional[int]:
+    """stdio 模式下找到当前进程启动的服务进程（仅 Linux）"""
+    me = os.getpid()
+    for pid, ppid in _parent_map().items():
+        if ppid != me:
+            continue
+        try:
+            cmdline = Path(f"/proc/{pid}/cmdline").read_bytes().replace(b'\0', b' ').decode('utf-8', 'replace')
+        except OSError:
+            continue
+        if script in cmdline:
+            return pid
+    return None
+
+
+class RssSampler:
+    """定时采样服务进程（含子进程）的常驻内存总和"""
+
+    def __init__(self, pid: Optional[int]):
+        self.pid = pid
+        self.samples: List[int] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def sample(self) -> Optional[int]:
+        if self.pid is None:
+            return None
+        values = [_read_status_kb(p, 'VmRSS') for p in process_tree(self.pid)]
+        values = [v for v in values if v is not None]
+        if not values:
+            return None
+        rss = sum(values)
+        self.samples.append(rss)
+        return rss
+
+    async def _run(self):
+        while True:
+            self.sample()
+            await asyncio.sleep(RSS_SAMPLE_INTERVAL)
+
+    def start(self):
+        self.sample()
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> Optional[Dict[str, float]]:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self.sample()
+        if not self.samples:
+            return None
+        return {
+            'start': round(self.samples[0] / 1024, 1),
+            'end': round(self.samples[-1] / 1024, 1),
+            'peak': round(max(self.samples) / 1024, 1),
+        }
+
+
+# ---------------------------------------------------------------- 服务连接
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+async def wait_for_port(port: int, proc: subprocess.Popen, timeout: float = STARTUP_TIMEOUT):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"服务进程已退出 (code {proc.returncode})")
+        try:
+            _, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"服务在 {timeout:.0f}s 内未监听端口 {port}")
+
+
+async def open_session(stack: AsyncExitStack, scenario: ServerScenario, transport: str,
+                       python: str, env: Dict[str, str], url: str, errlog) -> ClientSession:
+    """建立一个 MCP 会话并完成初始化"""
+    if transport == 'stdio':
+        params = StdioServerParameters(
+            command=python, args=[scenario.script], env=env, cwd=str(scenario.workdir)
+        )
+        streams = await stack.enter_async_context(stdio_client(params, errlog=errlog))
+    elif scenario.http_modes[transport][2] == 'sse':
+        streams = await stack.enter_async_context(sse_client(url))
+    else:
+        # 不同版本的 mcp 客户端返回 2 元组或 3 元组
+        streams = await stack.enter_async_context(streamable_http_client(url))
+    session = await stack.enter_async_context(ClientSession(streams[0], streams[1]))
+    await session.initialize()
+    return session
+
+
+def result_is_error(result) -> bool:
+    """工具返回 isError，或返回的 JSON 顶层带 error 字段"""
+    if getattr(result, 'isError', False):
+        return True
+    for content in getattr(result, 'content', None) or []:
+        text = getattr(content, 'text', None)
+        if text and text.lstrip().startswith('{'):
+            try:
+                if 'error' in json.loads(text):
+                    return True
+            except ValueError:
+                pass
+    return False
+
+
+# ---------------------------------------------------------------- 负载
+
+class LoadRun:
+    """一次 (服务, 传输方式) 的压测"""
+
+    def __init__(self, sessions: List[ClientSession], mix: List[ToolCall], ctx: Dict,
+                 concurrency: int, requests: int, duration: Optional[float], seed: int):
+        self.sessions = sessions
+        self.mix = mix
+        self.weights = [c.weight for c in mix]
+        self.ctx = ctx
+        self.concurrency = concurrency
+        self.requests = requests
+        self.duration = duration
+        self.seed = seed
+        self.latencies: Dict[str, List[float]] = {c.tool: [] for c in mix}
+        self.errors: Dict[str, int] = {c.tool: 0 for c in mix}
+        self.error_samples: List[str] = []
+        self._issued = 0
+
+    def _next_slot(self, deadline: Optional[float]) -> bool:
+        if deadline is not None:
+            return time.perf_counter() < deadline
+        if self._issued >= self.requests:
+            return False
+        self._issued += 1
+        return True
+
+    async def call(self, session: ClientSession, rng: random.Random, call: ToolCall, record: bool = True):
+        args = call.make_args(rng, self.ctx)
+        tool = call.tool.split(':', 1)[0]
+        start = time.perf_counter()
+        failed = False
+        try:
+            result = await session.call_tool(tool, args)
+            failed = result_is_error(result)
+            if failed and len(self.error_samples) < 5:
+                self.error_samples.append(f"{call.tool}: {result.content[0].text[:200] if result.content else ''}")
+        except Exception as e:
+            failed = True
+            if len(self.error_samples) < 5:
+                self.error_samples.append(f"{call.tool}: {e!r}")
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if record:
+            self.latencies[call.tool].append(elapsed_ms)
+            if failed:
+                self.errors[call.tool] += 1
+
+    async def warmup(self, calls_per_tool: int):
+        """每个工具先调用几次（填充上游缓存、触发延迟导入），不计入结果"""
+        rng = random.Random(self.seed - 1)
+        for call in self.mix:
+            for _ in range(calls_per_tool):
+                await self.call(self.sessions[0], rng, call, record=False)
+
+    async def _worker(self, index: int, deadline: Optional[float]):
+        session = self.sessions[index % len(self.sessions)]
+        rng = random.Random(self.seed + index)
+        while self._next_slot(deadline):
+            call = rng.choices(self.mix, weights=self.weights)[0]
+            await self.call(session, rng, call)
+
+    async def run(self) -> float:
+        deadline = time.perf_counter() + self.duration if self.duration else None
+        start = time.perf_counter()
+        await asyncio.gather(*(self._worker(i, deadline) for i in range(self.concurrency)))
+        return time.perf_counter() - start
+
+
+async def bench_one(scenario: ServerScenario, transport: str, args, upstream: StubUpstream) -> Dict:
+    python = args.ea_python if scenario.name == 'eventanalyzer' else args.stats_python
+    mix = resolve_mix(scenario, args.mix, args.weights)
+    tmpdir = tempfile.mkdtemp(prefix=f"bench-{scenario.name}-")
+    server_env, ctx = scenario.prepare(tmpdir, upstream, {
+        'events': args.events, 'keys': args.keys, 'code_files': args.code_files
+    })
+    env = dict(os.environ, PYTHONUNBUFFERED='1', **server_env)
+    log_path = os.path.join(tmpdir, 'server.log')
+    errlog = open(log_path, 'w')
+    proc: Optional[subprocess.Popen] = None
+    url = ''
+
+    print(f"[{scenario.name}/{transport}] 启动服务...", file=sys.stderr)
+    try:
+        async with AsyncExitStack() as stack:
+            started = time.perf_counter()
+            if transport != 'stdio':
+                transport_env, http_path, _ = scenario.http_modes[transport]
+                port = free_port()
+                env.update(MCP_TRANSPORT=transport_env, MCP_PORT=str(port), MCP_WORKERS=str(args.workers))
+                proc = subprocess.Popen(
+                    [python, scenario.script], cwd=str(scenario.workdir), env=env,
+                    stdin=subprocess.DEVNULL, stdout=errlog, stderr=errlog
+                )
+                await wait_for_port(port, proc)
+                url = f"http://127.0.0.1:{port}{http_path}"
+                pid = proc.pid
+                # 每个并发 worker 一个会话，模拟多个客户端
+                sessions = [
+                    await open_session(stack, scenario, transport, python, env, url, errlog)
+                    for _ in range(args.concurrency)
+                ]
+            else:
+                env['MCP_TRANSPORT'] = 'stdio'
+                # stdio 只有一个会话，并发请求复用同一条管道
+                sessions = [await open_session(stack, scenario, transport, python, env, url, errlog)]
+                pid = find_child_pid(scenario.script)
+            startup_ms = (time.perf_counter() - started) * 1000
+
+            load = LoadRun(sessions, mix, ctx, args.concurrency, args.requests, args.duration, args.seed)
+            await load.warmup(args.warmup)
+
+            upstream_before = dict(upstream.counts)
+            sampler = RssSampler(pid)
+            sampler.start()
+            elapsed = await load.run()
+            rss = await sampler.stop()
+    except Exception:
+        errlog.flush()
+        with open(log_path, encoding='utf-8', errors='replace') as f:
+            tail = f.read()[-2000:]
+        print(f"[{scenario.name}/{transport}] 服务日志:\n{tail}", file=sys.stderr)
+        raise
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        errlog.close()
+
+    all_latencies = [v for values in load.latencies.values() for v in values]
+    calls = len(all_latencies)
+    errors = sum(load.errors.values())
+    result = {
+        'server': scenario.name,
+        'transport': transport,
+        'mix': args.mix,
+        'concurrency': args.concurrency,
+        'workers': args.workers if transport != 'stdio' else 1,
+        'sessions': len(sessions),
+        'calls': calls,
+        'errors': errors,
+        'duration_s': round(elapsed, 3),
+        'throughput_rps': round(calls / elapsed, 2) if elapsed > 0 else 0.0,
+        'startup_ms': round(startup_ms, 1),
+        'latency_ms': latency_summary(all_latencies),
+        'rss_mb': rss,
+        'tools': {
+            tool: {
+                'calls': len(values),
+                'errors': load.errors[tool],
+                'latency_ms': latency_summary(values),
+            }
+            for tool, values in load.latencies.items() if values
+        },
+        'upstream_calls': {
+            route: count - upstream_before.get(route, 0)
+            for route, count in upstream.counts.items() if count != upstream_before.get(route, 0)
+        },
+    }
+    if load.error_samples:
+        result['error_samples'] = load.error_samples
+    lat = result['latency_ms']
+    print(
+        f"[{scenario.name}/{transport}] {calls} 次调用, {errors} 次错误, "
+        f"{result['throughput_rps']} req/s, p50 {lat['p50']}ms p95 {lat['p95']}ms p99 {lat['p99']}ms, "
+        f"RSS {rss['peak'] if rss else 'N/A'}MB",
+        file=sys.stderr
+    )
+    return result
+
+
+def git_revision() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=str(ROOT), capture_output=True, text=True, timeout=10
+        )
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+async def run(args) -> Dict:
+    servers = list(SCENARIOS) if args.server == 'all' else [args.server]
+
+    upstream = StubUpstream(latency_ms=args.upstream_latency_ms, field_count=args.fields).start()
+    try:
+        runs = []
+        for name in servers:
+            scenario = SCENARIOS[name]
+            available = ['stdio', *scenario.http_modes]
+            transports = available if args.transport == 'all' else [args.transport]
+            for transport in transports:
+                if transport not in available:
+                    print(f"[{name}] 不支持 {transport}，跳过", file=sys.stderr)
+                    continue
+                runs.append(await bench_one(scenario, transport, args, upstream))
+    finally:
+        upstream.stop()
+
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'options': {
+                'mix': args.mix,
+                'weights': args.weights,
+                'concurrency': args.concurrency,
+                'workers': args.workers,
+                'requests': None if args.duration else args.requests,
+                'duration_s': args.duration,
+                'warmup': args.warmup,
+                'upstream_latency_ms': args.upstream_latency_ms,
+                'events': args.events,
+                'fields': args.fields,
+                'keys': args.keys,
+                'code_files': args.code_files,
+                'seed': args.seed,
+            },
+        },
+        'runs': runs,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='MCP 服务基准测试')
+    parser.add_argument('--server', choices=['all', *SCENARIOS], default='all')
+    parser.add_argument('--transport', choices=['all', 'stdio', 'http', 'streamable-http'], default='all',
+                        help='http 为各服务默认的 HTTP 方式；streamable-http 目前只有 EventAnalyzer 支持')
+    parser.add_argument('--workers', type=int, default=1, help='HTTP 模式下的 worker 进程数（MCP_WORKERS）')
+    parser.add_argument('--mix', default='default', help='工具组合名称（见 scenarios.py）')
+    parser.add_argument('--weights', default='', help='调整工具权重，如 "query_user_stats=5,generate_report=0"')
+    parser.add_argument('--concurrency', type=int, default=8, help='并发 worker 数')
+    parser.add_argument('--requests', type=int, default=400, help='总调用次数（未指定 --duration 时）')
+    parser.add_argument('--duration', type=float, default=None, help='按时长压测（秒）')
+    parser.add_argument('--warmup', type=int, default=2, help='每个工具的预热调用次数')
+    parser.add_argument('--upstream-latency-ms', type=float, default=5.0, help='桩服务的模拟延迟')
+    parser.add_argument('--events', type=int, default=50, help='事件名称数量')
+    parser.add_argument('--fields', type=int, default=40, help='每个事件的字段数')
+    parser.add_argument('--keys', type=int, default=30, help='统计服务的 API Key 数量')
+    parser.add_argument('--code-files', type=int, default=200, help='代码搜索假项目的文件数')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--ea-python', default=sys.executable, help='启动 EventAnalyzer 的解释器')
+    parser.add_argument('--stats-python', default=sys.executable, help='启动 python-mcp-demo 的解释器')
+    parser.add_argument('--output', default=None, help='结果文件（默认 benchmarks/results/<时间>.json）')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+    print(f"结果已写入 {output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+"""基准测试场景
+定义两个 MCP 服务的启动方式和工具调用组合（按权重随机抽取）
+"""
+
+import base64
+import json
+import os
+import random
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from stub_upstreams import event_names, make_event_fields, make_event_payload, write_keys_config
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# 参数生成函数：(随机数生成器, 场景上下文) -> 工具参数
+ArgsFactory = Callable[[random.Random, Dict], Dict]
+
+
+@dataclass
+class ToolCall:
+    """工具组合中的一项"""
+    tool: str
+    weight: float
+    make_args: ArgsFactory
+
+
+@dataclass
+class ServerScenario:
+    """一个被测服务"""
+    name: str
+    workdir: Path
+    script: str
+    # 传输方式 -> (MCP_TRANSPORT 取值, MCP 端点, 客户端类型 'sse' 或 'streamable')
+    http_modes: Dict[str, Tuple[str, str, str]]
+    mixes: Dict[str, List[ToolCall]] = field(default_factory=dict)
+
+    def prepare(self, tmpdir: str, upstream, options: Dict) -> Tuple[Dict[str, str], Dict]:
+        """生成测试数据，返回 (服务环境变量, 参数上下文)"""
+        raise NotImplementedError
+
+
+# ---------------------------------------------------------------- EventAnalyzer
+
+def _pick_event(rng: random.Random, ctx: Dict) -> str:
+    return rng.choice(ctx['events'])
+
+
+def _tracking_data(rng: random.Random, ctx: Dict) -> Dict:
+    event = _pick_event(rng, ctx)
+    payload = json.dumps(make_event_payload(event, ctx['fields'][event], rng.randrange(1000)), ensure_ascii=False)
+    if rng.random() < 0.5:
+        payload = base64.b64encode(payload.encode('utf-8')).decode('ascii')
+    return {'data': payload, 'check_required': rng.random() < 0.3}
+
+
+def _explain_field(rng: random.Random, ctx: Dict) -> Dict:
+    event = _pick_event(rng, ctx)
+    return {'event': event, 'field_name': rng.choice(list(ctx['fields'][event]))}
+
+
+def _find_field(rng: random.Random, ctx: Dict) -> Dict:
+    return {
+        'field_name': f"field_{rng.randrange(ctx['field_count'])}",
+        'project_path': ctx['project_path'],
+        'max_results': 50
+    }
+
+
+EVENT_ANALYZER_TOOLS = {
+    'query_event_fields': lambda rng, ctx: {'event': _pick_event(rng, ctx), 'show_details': True},
+    'analyze_tracking_data': _tracking_data,
+    'explain_field': _explain_field,
+    'compare_events': lambda rng, ctx: {'event1': _pick_event(rng, ctx), 'event2': _pick_event(rng, ctx)},
+    'find_field_in_code': _find_field,
+}
+
+
+def write_code_fixture(root: str, file_count: int, field_count: int, seed: int = 0):
+    """生成供 find_field_in_code 搜索的假项目"""
+    rng = random.Random(seed)
+    exts = ('.js', '.ts', '.vue', '.py')
+    for i in range(file_count):
+        directory = Path(root) / f"module_{i % 20:02d}"
+        directory.mkdir(parents=True, exist_ok=True)
+        lines = []
+        for line_no in range(40):
+            if rng.random() < 0.1:
+                lines.append(f"track('BenchEvent', {{ field_{rng.randrange(field_count)}: value{line_no} }})")
+            else:
+                lines.append(f"const v{line_no} = compute({line_no});")
+        (directory / f"file_{i:04d}{rng.choice(exts)}").write_text('\n'.join(lines), encoding='utf-8')
+
+
+class EventAnalyzerScenario(ServerScenario):
+
+    def prepare(self, tmpdir: str, upstream, options: Dict) -> Tuple[Dict[str, str], Dict]:
+        events = event_names(options['events'])
+        project_path = os.path.join(tmpdir, 'project')
+        write_code_fixture(project_path, options['code_files'], upstream.field_count)
+        ctx = {
+            'events': events,
+            'fields': {e: make_event_fields(e, upstream.field_count) for e in events},
+            'field_count': upstream.field_count,
+            'project_path': project_path,
+        }
+        env = {
+            'EVENT_API_BASE_URL': upstream.event_api_url,
+            'EVENT_CACHE_PATH': os.path.join(tmpdir, 'event_definitions.db'),
+            'EVENT_CHANGE_LOG': os.path.join(tmpdir, 'definition_changes.jsonl'),
+        }
+        return env, ctx
+
+
+# ---------------------------------------------------------------- Claude Stats
+
+def _pick_user(rng: random.Random, ctx: Dict) -> str:
+    return rng.choice(ctx['users'])
+
+
+STATS_TOOLS = {
+    'query_today_stats': lambda rng, ctx: {},
+    'query_monthly_stats': lambda rng, ctx: {},
+    'query_today_stats:refresh': lambda rng, ctx: {'force_refresh': True},
+    'query_user_stats': lambda rng, ctx: {'user_name': _pick_user(rng, ctx), 'period': rng.choice(['daily', 'monthly'])},
+    'query_top_users': lambda rng, ctx: {'limit': rng.randint(3, 10)},
+    'compare_users': lambda rng, ctx: {'user1_name': _pick_user(rng, ctx), 'user2_name': _pick_user(rng, ctx)},
+    'analyze_usage_trend': lambda rng, ctx: {},
+    'detect_anomalies': lambda rng, ctx: {'threshold': rng.choice([1.0, 5.0, 40.0])},
+    'generate_report': lambda rng, ctx: {},
+    'query_top_models': lambda rng, ctx: {'sort_by': rng.choice(['cost', 'requests', 'tokens'])},
+    'query_model_cost_share': lambda rng, ctx: {'user_name': _pick_user(rng, ctx) if rng.random() < 0.5 else ''},
+    'query_cache_token_ratio': lambda rng, ctx: {},
+}
+
+
+class StatsScenario(ServerScenario):
+
+    def prepare(self, tmpdir: str, upstream, options: Dict) -> Tuple[Dict[str, str], Dict]:
+        keys_path = os.path.join(tmpdir, 'keys.json')
+        keys = write_keys_config(keys_path, options['keys'])
+        env = {
+            'API_BASE_URL': upstream.stats_api_url,
+            'KEYS_CONFIG_PATH': keys_path,
+            'STATS_HISTORY_PATH': os.path.join(tmpdir, 'stats_history.db'),
+        }
+        return env, {'users': [k['name'] for k in keys]}
+
+
+def _mix(tools: Dict[str, ArgsFactory], weights: Dict[str, float]) -> List[ToolCall]:
+    return [ToolCall(name, weight, tools[name]) for name, weight in weights.items()]
+
+
+SCENARIOS: Dict[str, ServerScenario] = {
+    'eventanalyzer': EventAnalyzerScenario(
+        name='eventanalyzer',
+        workdir=ROOT / 'mcp-list' / 'packages' / 'EventAnalyzer',
+        script='server.py',
+        http_modes={
+            'http': ('http', '/sse', 'sse'),
+            'streamable-http': ('streamable-http', '/mcp', 'streamable'),
+        },
+        mixes={
+            'default': _mix(EVENT_ANALYZER_TOOLS, {
+                'query_event_fields': 3, 'analyze_tracking_data': 4, 'explain_field': 2,
+                'compare_events': 1, 'find_field_in_code': 0.5,
+            }),
+            'analyze': _mix(EVENT_ANALYZER_TOOLS, {'analyze_tracking_data': 1}),
+            'search': _mix(EVENT_ANALYZER_TOOLS, {'find_field_in_code': 1}),
+        },
+    ),
+    'stats': StatsScenario(
+        name='stats',
+        workdir=ROOT / 'python-mcp-demo',
+        script='server.py',
+        http_modes={
+            'http': ('http', '/mcp', 'streamable'),
+        },
+        mixes={
+            'default': _mix(STATS_TOOLS, {
+                'query_today_stats': 3, 'query_monthly_stats': 1, 'query_user_stats': 3,
+                'query_top_users': 2, 'compare_users': 1, 'analyze_usage_trend': 1,
+                'detect_anomalies': 1, 'generate_report': 1, 'query_top_models': 1,
+                'query_model_cost_share': 1, 'query_cache_token_ratio': 0.5,
+                'query_today_stats:refresh': 0.2,
+            }),
+            'refresh': _mix(STATS_TOOLS, {'query_today_stats:refresh': 1}),
+            'lookup': _mix(STATS_TOOLS, {'query_user_stats': 3, 'compare_users': 1}),
+        },
+    ),
+}
+
+
+def resolve_mix(scenario: ServerScenario, mix: str, overrides: str = '') -> List[ToolCall]:
+    """取出工具组合，overrides 形如 "query_user_stats=5,generate_report=0" 可调整权重"""
+    if mix not in scenario.mixes:
+        raise ValueError(f"{scenario.name} 没有名为 {mix} 的工具组合，可用: {', '.join(scenario.mixes)}")
+    calls = {c.tool: c for c in scenario.mixes[mix]}
+    tools = EVENT_ANALYZER_TOOLS if isinstance(scenario, EventAnalyzerScenario) else STATS_TOOLS
+    for item in filter(None, (s.strip() for s in overrides.split(','))):
+        tool, _, weight = item.partition('=')
+        if tool not in tools:
+            raise ValueError(f"{scenario.name} 没有工具 {tool}")
+        calls[tool] = ToolCall(tool, float(weight), tools[tool])
+    return [c for c in calls.values() if c.weight > 0]
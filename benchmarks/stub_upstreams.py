@@ -0,0 +1,206 @@
+"""本地上游桩服务
+为基准测试模拟埋点事件 API 和 Claude 统计 API（只依赖标准库）
+"""
+
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+FIELD_TYPES = ('NUMBER', 'STRING', 'BOOL', 'LIST')
+MODELS = ('claude-sonnet-4', 'claude-opus-4', 'claude-3-5-haiku')
+
+
+def event_names(count: int) -> List[str]:
+    """基准测试使用的事件名称"""
+    return [f"BenchEvent{i:03d}" for i in range(count)]
+
+
+def make_event_fields(event: str, field_count: int) -> Dict[str, Dict]:
+    """按事件名称确定性地生成字段定义（同名事件每次结果相同）"""
+    rng = random.Random(event)
+    fields = {}
+    for i in range(field_count):
+        field_type = FIELD_TYPES[rng.randrange(len(FIELD_TYPES))]
+        trans = ''
+        if field_type == 'NUMBER' and rng.random() < 0.3:
+            trans = json.dumps({str(v): f"取值{v}" for v in range(rng.randint(2, 6))}, ensure_ascii=False)
+        fields[f"field_{i}"] = {
+            'type': field_type,
+            'tips': f"{event} 的第 {i} 个字段",
+            'desc': f"基准测试字段 field_{i}",
+            'trans': trans
+        }
+    return fields
+
+
+def make_event_payload(event: str, fields: Dict[str, Dict], seed: int = 0) -> Dict:
+    """生成一条埋点数据（部分字段故意类型错误）"""
+    rng = random.Random(f"{event}:{seed}")
+    properties = {}
+    for name, definition in fields.items():
+        if rng.random() < 0.1:
+            continue
+        field_type = definition['type']
+        if rng.random() < 0.05:
+            properties[name] = 'wrong'
+        elif field_type == 'NUMBER':
+            properties[name] = rng.randint(0, 5)
+        elif field_type == 'BOOL':
+            properties[name] = rng.random() < 0.5
+        elif field_type == 'LIST':
+            properties[name] = [rng.randint(0, 9) for _ in range(3)]
+        else:
+            properties[name] = f"value_{rng.randint(0, 99)}"
+    properties['unknown_extra'] = 1
+    return {'event': event, 'properties': properties}
+
+
+def make_model_stats(api_id: str, period: str) -> List[Dict]:
+    """按 apiId 确定性地生成按模型的统计数据"""
+    rng = random.Random(f"{api_id}:{period}")
+    scale = 30 if period == 'monthly' else 1
+    data = []
+    for model in MODELS:
+        requests = rng.randint(0, 200) * scale
+        input_tokens = requests * rng.randint(50, 500)
+        output_tokens = requests * rng.randint(20, 200)
+        cache_create = requests * rng.randint(0, 300)
+        cache_read = requests * rng.randint(0, 3000)
+        data.append({
+            'model': model,
+            'requests': requests,
+            'inputTokens': input_tokens,
+            'outputTokens': output_tokens,
+            'cacheCreateTokens': cache_create,
+            'cacheReadTokens': cache_read,
+            'allTokens': input_tokens + output_tokens + cache_create + cache_read,
+            'costs': {'total': round(requests * rng.uniform(0.001, 0.05), 4)}
+        })
+    return data
+
+
+class StubUpstream:
+    """
+    上游桩服务
+
+    GET  /event?event=<name>      -> 事件字段定义（EVENT_API_BASE_URL）
+    POST /stats/get-key-id        -> {"success": true, "data": {"id": ...}}（API_BASE_URL）
+    POST /stats/user-model-stats  -> {"success": true, "data": [...]}
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency_ms: float = 0.0, field_count: int = 40):
+        self.latency_ms = latency_ms
+        self.field_count = field_count
+        self.counts: Dict[str, int] = {}
+        self._counts_lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def event_api_url(self) -> str:
+        return f"{self.base_url}/event"
+
+    @property
+    def stats_api_url(self) -> str:
+        return f"{self.base_url}/stats"
+
+    def start(self) -> 'StubUpstream':
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='stub-upstream', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _count(self, route: str):
+        with self._counts_lock:
+            self.counts[route] = self.counts.get(route, 0) + 1
+
+    def _handler_class(self):
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status: int, payload):
+                body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _delay(self):
+                if upstream.latency_ms > 0:
+                    time.sleep(upstream.latency_ms / 1000.0)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path.rstrip('/') != '/event':
+                    self._reply(404, {'error': 'not found'})
+                    return
+                upstream._count('event')
+                self._delay()
+                event = parse_qs(url.query).get('event', [''])[0]
+                self._reply(200, make_event_fields(event, upstream.field_count))
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length) or b'{}')
+                route = urlparse(self.path).path
+                upstream._count(route)
+                self._delay()
+                if route == '/stats/get-key-id':
+                    api_id = hashlib.sha256(body.get('apiKey', '').encode('utf-8')).hexdigest()[:12]
+                    self._reply(200, {'success': True, 'data': {'id': api_id}})
+                elif route == '/stats/user-model-stats':
+                    data = make_model_stats(body.get('apiId', ''), body.get('period', 'daily'))
+                    self._reply(200, {'success': True, 'data': data})
+                else:
+                    self._reply(404, {'error': 'not found'})
+
+        return Handler
+
+
+def write_keys_config(path: str, count: int):
+    """生成统计服务使用的 keys.json"""
+    keys = [
+        {'name': f"用户{i:03d}", 'account': f"user{i:03d}@bench.local", 'apiKey': f"cr_bench_{i:03d}"}
+        for i in range(count)
+    ]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'apiKeys': keys}, f, ensure_ascii=False, indent=2)
+    return keys
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='单独启动上游桩服务')
+    parser.add_argument('--port', type=int, default=18080)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    args = parser.parse_args()
+
+    stub = StubUpstream(port=args.port, latency_ms=args.latency_ms).start()
+    print(f"EVENT_API_BASE_URL={stub.event_api_url}")
+    print(f"API_BASE_URL={stub.stats_api_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stub.stop()
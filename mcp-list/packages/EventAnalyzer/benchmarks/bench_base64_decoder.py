@@ -0,0 +1,33 @@
+"""Base64Decoder 微基准"""
+
+import pytest
+
+from src.utils.base64_decoder import Base64Decoder
+from synthetic import encode_base64, encode_json, encode_url_base64, make_definitions, make_payload
+
+SIZES = [10, 100, 1000]
+
+
+def _payload(size: int):
+    return make_payload(make_definitions(size, seed=size), seed=size)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def bench_decode(benchmark, baseline, size):
+    encoded = encode_url_base64(_payload(size))
+    result = benchmark(Base64Decoder.decode, encoded)
+    baseline.check({"properties": len(result["properties"]), "event": result["event"]})
+
+
+@pytest.mark.parametrize("encoding", ["dict", "json", "base64", "url_base64"])
+@pytest.mark.parametrize("size", SIZES)
+def bench_decode_flexible(benchmark, baseline, size, encoding):
+    payload = _payload(size)
+    data = {
+        "dict": lambda p: p,
+        "json": encode_json,
+        "base64": encode_base64,
+        "url_base64": encode_url_base64,
+    }[encoding](payload)
+    result = benchmark(Base64Decoder.decode_flexible, data)
+    baseline.check({"properties": len(result["properties"]), "event": result["event"]})
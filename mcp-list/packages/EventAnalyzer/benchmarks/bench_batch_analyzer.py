@@ -0,0 +1,37 @@
+"""BatchAnalyzer 分层抽样微基准：耗时应随抽样率而不是数据量增长"""
+
+import pytest
+
+from src.batch_analyzer import BatchAnalyzer
+from src.event_analyzer import EventAnalyzer
+from synthetic import encode_base64, encode_json, make_definitions, make_payload
+
+EVENTS = ("BenchEventA", "BenchEventB", "BenchEventC")
+
+
+@pytest.fixture(scope="module")
+def batch():
+    """3000 条数据：三个事件流量 8:1:1，JSON 和 Base64 各半"""
+    definitions = {event: make_definitions(100, seed=i) for i, event in enumerate(EVENTS)}
+    payloads = []
+    for n in range(3000):
+        event = EVENTS[0] if n % 10 < 8 else EVENTS[1 + n % 2]
+        payload = make_payload(definitions[event], seed=n, event=event, error_ratio=0.002)
+        payloads.append((encode_json if n % 2 else encode_base64)(payload))
+    return definitions, payloads
+
+
+@pytest.mark.parametrize("sample_rate", [1.0, 0.1, 0.01])
+def bench_batch_sampling(benchmark, baseline, batch, sample_rate):
+    definitions, payloads = batch
+
+    def run():
+        analyzer = BatchAnalyzer(EventAnalyzer(), definitions.__getitem__, sample_rate=sample_rate, seed=0)
+        return analyzer.analyze(payloads)
+
+    result = benchmark(run)
+    baseline.check({
+        "sampled": result["sampled_payloads"],
+        "error_rate": result["error_rate"],
+        "events": {e["event"]: [e["seen"], e["sampled"]] for e in result["events"]},
+    })
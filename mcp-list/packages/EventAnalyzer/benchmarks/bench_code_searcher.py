@@ -0,0 +1,45 @@
+"""CodeSearcher.find_field 微基准
+
+假项目的文件数由 --bench-repo-sizes 指定（默认 1000,10000，最大 100000），
+生成后缓存在 BENCH_CACHE_DIR 中重复使用。
+
+bench_find_field 关闭结果缓存，测量每次都扫描文件的开销；
+bench_find_field_cached 测量结果缓存命中时（重复搜索、内容相同的分支）的开销。
+"""
+
+import os
+
+import pytest
+
+from src.code_searcher import CodeSearcher
+from synthetic import field_names, make_repo
+
+
+@pytest.fixture(scope="session")
+def repo(repo_size):
+    return str(make_repo(repo_size))
+
+
+def _summary(result, root):
+    files = sorted({os.path.relpath(m["file"], root) for m in result["found_locations"]})
+    return {"total_matches": result["total_matches"], "files": len(files), "first": files[:3]}
+
+
+@pytest.mark.parametrize("case", ["common", "missing"])
+def bench_find_field(benchmark, baseline, repo, case):
+    # common: 很快找满 max_results；missing: 字段不存在，需要扫描整个项目
+    field = field_names(200)[0] if case == "common" else "field_that_does_not_exist"
+    searcher = CodeSearcher(result_cache_size=0)
+    if case == "missing":
+        result = benchmark.pedantic(searcher.find_field, args=(field, repo, 50), rounds=3, warmup_rounds=1)
+    else:
+        result = benchmark(searcher.find_field, field, repo, 50)
+    baseline.check(_summary(result, repo))
+
+
+def bench_find_field_cached(benchmark, baseline, repo):
+    field = "field_that_does_not_exist"
+    searcher = CodeSearcher()
+    searcher.find_field(field, repo, 50)
+    result = benchmark.pedantic(searcher.find_field, args=(field, repo, 50), rounds=3, warmup_rounds=1)
+    baseline.check(_summary(result, repo))
@@ -0,0 +1,44 @@
+"""EventAnalyzer.analyze 微基准"""
+
+from collections import Counter
+
+import pytest
+
+from src.event_analyzer import EventAnalyzer
+from synthetic import make_definitions, make_payload
+
+
+def _summary(result):
+    return {
+        "status": result["status"],
+        "issues": dict(sorted(Counter(i["type"] for i in result["issues"]).items())),
+        "coverage": result["coverage"],
+    }
+
+
+@pytest.mark.parametrize("check_required", [False, True], ids=["default", "required"])
+@pytest.mark.parametrize("size", [10, 100, 1000])
+def bench_analyze(benchmark, baseline, size, check_required):
+    definitions = make_definitions(size, seed=size)
+    payload = make_payload(definitions, seed=size)
+    analyzer = EventAnalyzer()
+    result = benchmark(analyzer.analyze, payload, definitions, check_required)
+    baseline.check(_summary(result))
+
+
+@pytest.mark.parametrize("size", [10, 100, 1000])
+def bench_analyze_compiled(benchmark, baseline, size):
+    """服务中的调用方式：按事件缓存编译好的校验规则"""
+    definitions = make_definitions(size, seed=size)
+    payload = make_payload(definitions, seed=size)
+    analyzer = EventAnalyzer()
+    result = benchmark(analyzer.analyze, payload, definitions, False, "BenchEvent")
+    baseline.check(_summary(result))
+
+
+@pytest.mark.parametrize("size", [10, 100, 1000])
+def bench_compare_events(benchmark, baseline, size):
+    fields1 = make_definitions(size, seed=size)
+    fields2 = make_definitions(size, seed=size + 1)
+    result = benchmark(EventAnalyzer().compare_events, fields1, fields2)
+    baseline.check({"total_common": result["total_common"], "total_diff": result["total_diff"]})
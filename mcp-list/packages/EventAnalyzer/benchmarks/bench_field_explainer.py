@@ -0,0 +1,19 @@
+"""FieldExplainer.search_related_fields 微基准"""
+
+import pytest
+
+from src.field_explainer import FieldExplainer
+from synthetic import make_definitions
+
+
+@pytest.mark.parametrize("size", [10, 100, 1000])
+def bench_search_related_fields(benchmark, baseline, size):
+    definitions = make_definitions(size, seed=size)
+    names = list(definitions)[:20]
+    explainer = FieldExplainer()
+
+    def run():
+        return [explainer.search_related_fields(name, definitions) for name in names]
+
+    result = benchmark(run)
+    baseline.check([len(related) for related in result])
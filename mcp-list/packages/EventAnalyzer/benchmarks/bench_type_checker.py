@@ -0,0 +1,34 @@
+"""TypeChecker 微基准"""
+
+import itertools
+from collections import Counter
+
+import pytest
+
+from src.utils.type_checker import TypeChecker
+from synthetic import make_values
+
+TYPE_NAMES = ["NUMBER", "STRING", "BOOL", "LIST", "OBJECT", "NULL", "UNKNOWN"]
+
+
+@pytest.mark.parametrize("count", [1000, 100000])
+def bench_infer_type(benchmark, baseline, count):
+    values = make_values(count, seed=count)
+    infer = TypeChecker.infer_type
+
+    def run():
+        return [infer(v) for v in values]
+
+    result = benchmark(run)
+    baseline.check(dict(sorted(Counter(result).items())))
+
+
+def bench_type_matches(benchmark, baseline):
+    pairs = list(itertools.product(TYPE_NAMES, repeat=2)) * 200
+    matches = TypeChecker.type_matches
+
+    def run():
+        return sum(1 for expected, actual in pairs if matches(expected, actual))
+
+    result = benchmark(run)
+    baseline.check({"pairs": len(pairs), "matched": result})
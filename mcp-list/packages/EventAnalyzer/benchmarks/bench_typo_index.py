@@ -0,0 +1,41 @@
+"""TypoIndex 拼写纠错微基准：建索引和未命中缓存的查询"""
+
+import random
+
+import pytest
+
+from src.utils.typo_index import TypoIndex, normalize
+from synthetic import field_names
+
+
+def _typos(names, count, seed=0):
+    """每个字段名删掉、替换或交换一个字符"""
+    rng = random.Random(seed)
+    result = []
+    for name in rng.sample(names, count):
+        i = rng.randrange(len(name) - 1)
+        op = rng.randrange(3)
+        if op == 0:
+            result.append(name[:i] + name[i + 1:])
+        elif op == 1:
+            result.append(name[:i] + "x" + name[i + 1:])
+        else:
+            result.append(name[:i] + name[i + 1] + name[i] + name[i + 2:])
+    return result
+
+
+@pytest.mark.parametrize("size", [100, 1000])
+def bench_typo_index_build(benchmark, baseline, size):
+    names = field_names(size, seed=size)
+    index = benchmark(TypoIndex, names)
+    baseline.check({"names": len(index)})
+
+
+@pytest.mark.parametrize("size", [100, 1000])
+def bench_typo_lookup(benchmark, baseline, size):
+    """100 个不同的拼写错误，不经过结果缓存"""
+    names = field_names(size, seed=size)
+    index = TypoIndex(names)
+    queries = [normalize(q) for q in _typos(names, 100, seed=size)]
+    result = benchmark(lambda: [index._lookup(q) for q in queries])
+    baseline.check({"found": sum(1 for r in result if r), "first": [r[:1] for r in result[:10]]})
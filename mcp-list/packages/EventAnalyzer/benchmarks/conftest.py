@@ -0,0 +1,238 @@
+"""微基准测试公共配置
+
+- 安装了 pytest-benchmark 时直接使用它的 benchmark fixture；否则使用下面接口兼容的简化版
+- baseline fixture 把每个基准的结果摘要和耗时中位数与 baseline.json 对比
+"""
+
+import json
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import pytest
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))  # 使 from src... 可用
+sys.path.insert(0, str(BENCH_DIR))
+
+BASELINE_PATH = BENCH_DIR / "baseline.json"
+
+try:
+    import pytest_benchmark  # noqa: F401
+    HAS_PYTEST_BENCHMARK = True
+except ImportError:
+    HAS_PYTEST_BENCHMARK = False
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("eventanalyzer-bench")
+    group.addoption("--bench-update-baseline", action="store_true",
+                    help="用本次结果覆盖 baseline.json")
+    group.addoption("--bench-tolerance", type=float, default=0.25,
+                    help="耗时相对基线的容忍比例（默认 0.25，即慢 25%% 以内不算退化）")
+    group.addoption("--bench-fail-slower", action="store_true",
+                    help="耗时退化超过容忍比例时判为失败（默认只报告）")
+    group.addoption("--bench-repo-sizes", default="1000,10000",
+                    help="代码搜索的假项目文件数，逗号分隔，最大 100000")
+    group.addoption("--bench-min-time", type=float, default=0.2,
+                    help="简化版 benchmark 每个基准的最少计时时长（秒）")
+
+
+def pytest_generate_tests(metafunc):
+    if "repo_size" in metafunc.fixturenames:
+        sizes = [int(s) for s in metafunc.config.getoption("--bench-repo-sizes").split(",") if s.strip()]
+        metafunc.parametrize("repo_size", [min(s, 100_000) for s in sizes], scope="session")
+
+
+# ---------------------------------------------------------------- 简化版 benchmark
+
+class _Stats:
+    def __init__(self, durations: List[float]):
+        self.data = durations
+        self.rounds = len(durations)
+        self.min = min(durations)
+        self.max = max(durations)
+        self.mean = statistics.fmean(durations)
+        self.median = statistics.median(durations)
+        self.stddev = statistics.stdev(durations) if len(durations) > 1 else 0.0
+
+
+class _Metadata:
+    """与 pytest-benchmark 一致：benchmark.stats.stats.median"""
+
+    def __init__(self, stats: _Stats):
+        self.stats = stats
+
+
+class SimpleBenchmark:
+    """pytest-benchmark 的最小替代：自动确定轮数，记录每轮耗时"""
+
+    def __init__(self, min_time: float, max_rounds: int = 1000, min_rounds: int = 5):
+        self.min_time = min_time
+        self.max_rounds = max_rounds
+        self.min_rounds = min_rounds
+        self.stats: Optional[_Metadata] = None
+
+    def __call__(self, func: Callable, *args, **kwargs):
+        durations: List[float] = []
+        started = time.perf_counter()
+        result = None
+        while len(durations) < self.max_rounds:
+            t0 = time.perf_counter()
+            result = func(*args, **kwargs)
+            durations.append(time.perf_counter() - t0)
+            if len(durations) >= self.min_rounds and time.perf_counter() - started >= self.min_time:
+                break
+        self.stats = _Metadata(_Stats(durations))
+        return result
+
+    def pedantic(self, func: Callable, args=(), kwargs=None, setup: Optional[Callable] = None,
+                 rounds: int = 1, iterations: int = 1, warmup_rounds: int = 0):
+        kwargs = kwargs or {}
+        for _ in range(warmup_rounds):
+            func(*args, **kwargs)
+        durations: List[float] = []
+        result = None
+        for _ in range(rounds):
+            if setup is not None:
+                prepared = setup()
+                if prepared is not None:
+                    args, kwargs = prepared
+            t0 = time.perf_counter()
+            for _ in range(iterations):
+                result = func(*args, **kwargs)
+            durations.append((time.perf_counter() - t0) / iterations)
+        self.stats = _Metadata(_Stats(durations))
+        return result
+
+
+if not HAS_PYTEST_BENCHMARK:
+    @pytest.fixture
+    def benchmark(request):
+        return SimpleBenchmark(request.config.getoption("--bench-min-time"))
+
+
+# ---------------------------------------------------------------- 基线
+
+def machine_info() -> Dict[str, Any]:
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+    }
+
+
+class BaselineStore:
+    """baseline.json 的读写，及本次运行的对比记录"""
+
+    def __init__(self, path: Path, update: bool, tolerance: float):
+        self.path = path
+        self.update = update
+        self.tolerance = tolerance
+        self.data: Dict[str, Any] = {"machine": machine_info(), "benchmarks": {}}
+        if path.exists():
+            self.data = json.loads(path.read_text(encoding="utf-8"))
+        self.rows: List[Dict[str, Any]] = []
+        self.dirty = False
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        return self.data["benchmarks"].get(name)
+
+    def record(self, name: str, result: Any, median: float):
+        self.data["benchmarks"][name] = {"result": result, "median_s": round(median, 9)}
+        self.data["machine"] = machine_info()
+        self.dirty = True
+
+    def save(self):
+        if self.dirty:
+            self.data["benchmarks"] = dict(sorted(self.data["benchmarks"].items()))
+            self.path.write_text(json.dumps(self.data, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+
+
+class BaselineCheck:
+    """单个基准的基线对比"""
+
+    def __init__(self, store: BaselineStore, name: str, benchmark, fail_slower: bool):
+        self.store = store
+        self.name = name
+        self.benchmark = benchmark
+        self.fail_slower = fail_slower
+
+    def check(self, result: Any):
+        """
+        对比结果摘要和耗时中位数
+
+        结果摘要必须与基线完全一致（性能优化不能改变结果）；
+        耗时退化超过容忍比例时报告，开启 --bench-fail-slower 时判为失败。
+        """
+        result = json.loads(json.dumps(result, ensure_ascii=False))
+        median = self.benchmark.stats.stats.median
+        expected = self.store.get(self.name)
+
+        if self.store.update or expected is None:
+            self.store.record(self.name, result, median)
+            self.store.rows.append({"name": self.name, "median": median, "baseline": None, "ratio": None})
+            return
+
+        assert result == expected["result"], (
+            f"{self.name} 的结果与基线不一致:\n期望 {expected['result']}\n实际 {result}"
+        )
+        ratio = median / expected["median_s"] if expected["median_s"] else None
+        self.store.rows.append({"name": self.name, "median": median, "baseline": expected["median_s"], "ratio": ratio})
+        if self.fail_slower and ratio is not None and ratio > 1 + self.store.tolerance:
+            pytest.fail(f"{self.name} 比基线慢 {ratio:.2f} 倍（容忍 {1 + self.store.tolerance:.2f}）")
+
+
+@pytest.fixture(scope="session")
+def baseline_store(request):
+    store = BaselineStore(
+        BASELINE_PATH,
+        update=request.config.getoption("--bench-update-baseline"),
+        tolerance=request.config.getoption("--bench-tolerance"),
+    )
+    request.config._bench_baseline_store = store
+    yield store
+    store.save()
+
+
+@pytest.fixture
+def baseline(request, baseline_store, benchmark):
+    name = f"{Path(request.node.fspath).name}::{request.node.name}"
+    return BaselineCheck(baseline_store, name, benchmark, request.config.getoption("--bench-fail-slower"))
+
+
+def _format_seconds(value: Optional[float]) -> str:
+    if value is None:
+        return "-"
+    if value < 1e-3:
+        return f"{value * 1e6:.1f}us"
+    if value < 1:
+        return f"{value * 1e3:.2f}ms"
+    return f"{value:.2f}s"
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    store: Optional[BaselineStore] = getattr(config, "_bench_baseline_store", None)
+    if store is None or not store.rows:
+        return
+    recorded = store.data.get("machine")
+    terminalreporter.section("基线对比")
+    if recorded and recorded != machine_info():
+        terminalreporter.write_line(f"注意：基线记录于不同环境 {recorded}，耗时仅供参考")
+    width = max(len(r["name"]) for r in store.rows)
+    terminalreporter.write_line(f"{'benchmark':<{width}}  {'median':>10}  {'baseline':>10}  {'ratio':>7}")
+    for row in store.rows:
+        ratio = row["ratio"]
+        flag = ""
+        if ratio is not None and ratio > 1 + store.tolerance:
+            flag = "  slower"
+        elif ratio is not None and ratio < 1 / (1 + store.tolerance):
+            flag = "  faster"
+        terminalreporter.write_line(
+            f"{row['name']:<{width}}  {_format_seconds(row['median']):>10}  "
+            f"{_format_seconds(row['baseline']):>10}  {(f'{ratio:.2f}x' if ratio else '-'):>7}{flag}"
+        )
@@ -0,0 +1,200 @@
+"""合成测试数据
+生成字段定义、埋点数据和假项目目录（同样的参数每次生成相同的数据）
+"""
+
+import base64
+import json
+import os
+import random
+import tempfile
+import urllib.parse
+from pathlib import Path
+from typing import Any, Dict, List
+
+FIELD_TYPES = ("NUMBER", "STRING", "BOOL", "LIST")
+
+# 字段名词根，组合后不同字段之间有共同部分，便于测试 search_related_fields
+WORDS = (
+    "res", "user", "page", "btn", "click", "show", "down", "list", "item", "pos",
+    "id", "type", "name", "time", "src", "tab", "cate", "tag", "from", "ab",
+    "exp", "rank", "vip", "price", "count", "model", "scene", "ref", "size", "style",
+)
+
+SOURCE_EXTENSIONS = (".js", ".ts", ".vue", ".jsx", ".py", ".java")
+OTHER_EXTENSIONS = (".md", ".json", ".css", ".png")
+
+
+def field_names(count: int, seed: int = 0) -> List[str]:
+    """生成不重复的字段名，如 res_click_pos"""
+    rng = random.Random(seed)
+    names: List[str] = []
+    seen = set()
+    while len(names) < count:
+        name = "_".join(rng.sample(WORDS, rng.randint(1, 3)))
+        if name in seen:
+            name = f"{name}_{len(names)}"
+        seen.add(name)
+        names.append(name)
+    return names
+
+
+def make_definitions(count: int, seed: int = 0, enum_ratio: float = 0.2) -> Dict[str, Dict[str, Any]]:
+    """生成 count 个字段的定义，格式与埋点 API 返回一致"""
+    rng = random.Random(seed)
+    definitions = {}
+    for name in field_names(count, seed):
+        field_type = rng.choice(FIELD_TYPES)
+        trans = ""
+        if field_type == "NUMBER" and rng.random() < enum_ratio:
+            trans = json.dumps({str(v): f"枚举{v}" for v in range(rng.randint(2, 8))}, ensure_ascii=False)
+        definitions[name] = {
+            "type": field_type,
+            "tips": f"{name} 字段",
+            "desc": f"合成字段 {name}",
+            "trans": trans,
+        }
+    return definitions
+
+
+def _value_for(field_def: Dict[str, Any], rng: random.Random) -> Any:
+    field_type = field_def["type"]
+    if field_type == "NUMBER":
+        return rng.randint(0, 9)
+    if field_type == "BOOL":
+        return rng.random() < 0.5
+    if field_type == "LIST":
+        return [rng.randint(0, 99) for _ in range(rng.randint(0, 5))]
+    return f"v{rng.randint(0, 999)}"
+
+
+def make_payload(
+    definitions: Dict[str, Dict[str, Any]],
+    seed: int = 0,
+    event: str = "SyntheticEvent",
+    missing_ratio: float = 0.1,
+    error_ratio: float = 0.05,
+    unknown_fields: int = 3,
+) -> Dict[str, Any]:
+    """按字段定义生成一条埋点数据，包含少量缺失、类型错误和未定义字段"""
+    rng = random.Random(seed)
+    properties: Dict[str, Any] = {}
+    for name, field_def in definitions.items():
+        if rng.random() < missing_ratio:
+            continue
+        if rng.random() < error_ratio:
+            properties[name] = {"unexpected": True}
+        else:
+            properties[name] = _value_for(field_def, rng)
+    for i in range(unknown_fields):
+        properties[f"undefined_field_{i}"] = i
+    properties["$lib"] = "js"
+    return {"event": event, "properties": properties}
+
+
+def encode_json(payload: Dict[str, Any]) -> str:
+    return json.dumps(payload, ensure_ascii=False)
+
+
+def encode_base64(payload: Dict[str, Any]) -> str:
+    return base64.b64encode(encode_json(payload).encode("utf-8")).decode("ascii")
+
+
+def encode_url_base64(payload: Dict[str, Any]) -> str:
+    """前端上报常见的 URL 编码 + Base64 双重编码"""
+    return urllib.parse.quote(encode_base64(payload))
+
+
+def make_values(count: int, seed: int = 0) -> List[Any]:
+    """混合类型的值，用于类型推断"""
+    rng = random.Random(seed)
+    makers = (
+        lambda: None,
+        lambda: rng.random() < 0.5,
+        lambda: rng.randint(-1000, 1000),
+        lambda: rng.random(),
+        lambda: f"s{rng.randint(0, 99)}",
+        lambda: [1, 2],
+        lambda: {"k": 1},
+        lambda: (1, 2),
+    )
+    return [rng.choice(makers)() for _ in range(count)]
+
+
+# ---------------------------------------------------------------- 假项目
+
+def cache_dir() -> Path:
+    """假项目缓存目录（BENCH_CACHE_DIR），大项目生成一次后重复使用"""
+    return Path(os.getenv("BENCH_CACHE_DIR") or Path(tempfile.gettempdir()) / "eventanalyzer-bench")
+
+
+def _source_lines(rng: random.Random, fields: List[str], lines: int) -> List[str]:
+    out = []
+    for i in range(lines):
+        roll = rng.random()
+        if roll < 0.04:
+            out.append(f"track('SyntheticEvent', {{ {rng.choice(fields)}: value{i} }});")
+        elif roll < 0.06:
+            out.append(f"payload.{rng.choice(fields)} = compute({i});")
+        elif roll < 0.07:
+            out.append(f"const {{ {rng.choice(fields)} }} = props;")
+        else:
+            out.append(f"const local{i} = helper(local{max(0, i - 1)}, '{rng.choice(WORDS)}');")
+    return out
+
+
+def make_repo(file_count: int, seed: int = 0, lines_per_file: int = 40, field_count: int = 200) -> Path:
+    """
+    生成（或复用）包含 file_count 个文件的假项目
+
+    目录深度 3 层，约 85% 为支持的源码文件，其余是其他类型的文件，
+    另有 node_modules 和 .git 目录用于检验目录排除；.gitignore 忽略的 generated 目录、
+    压缩后的单行 bundle 和超过大小上限的文件用于检验跳过规则。
+    """
+    root = cache_dir() / f"repo-{file_count}-{seed}-{lines_per_file}-v2"
+    marker = root / ".complete"
+    if marker.exists():
+        return root
+
+    rng = random.Random(seed)
+    fields = field_names(field_count, seed)
+    for i in range(file_count):
+        directory = root / f"pkg{i % 16:02d}" / f"mod{(i // 16) % 32:02d}" / f"sub{(i // 512) % 64:02d}"
+        directory.mkdir(parents=True, exist_ok=True)
+        if rng.random() < 0.85:
+            ext = rng.choice(SOURCE_EXTENSIONS)
+            content = "\n".join(_source_lines(rng, fields, lines_per_file))
+        else:
+            ext = rng.choice(OTHER_EXTENSIONS)
+            content = "placeholder\n"
+        (directory / f"file{i:06d}{ext}").write_text(content, encoding="utf-8")
+
+    for excluded in ("node_modules/lib", ".git/objects"):
+        directory = root / excluded
+        directory.mkdir(parents=True, exist_ok=True)
+        for i in range(max(1, file_count // 100)):
+            (directory / f"vendor{i}.js").write_text(
+                "\n".join(_source_lines(rng, fields, lines_per_file)), encoding="utf-8"
+            )
+
+    # .gitignore 忽略的构建产物（约为源码的 1/5）
+    (root / ".gitignore").write_text("generated/\n*.map\n", encoding="utf-8")
+    for i in range(max(1, file_count // 5)):
+        directory = root / "generated" / f"chunk{i % 16:02d}"
+        directory.mkdir(parents=True, exist_ok=True)
+        (directory / f"gen{i:06d}.js").write_text(
+            "\n".join(_source_lines(rng, fields, lines_per_file)), encoding="utf-8"
+        )
+
+    # 压缩后的 bundle 和超过 1MB 的文件（未被忽略，需要按内容或大小跳过）
+    bundles = root / "public"
+    bundles.mkdir(parents=True, exist_ok=True)
+    for i in range(max(1, file_count // 200)):
+        (bundles / f"bundle{i}.js").write_text(
+            ";".join(_source_lines(rng, fields, lines_per_file * 20)), encoding="utf-8"
+        )
+    (bundles / "vendor-large.js").write_text(
+        "\n".join(_source_lines(rng, fields, 30000)), encoding="utf-8"
+    )
+
+    marker.write_text(str(file_count), encoding="utf-8")
+    return root
@@ -2,45 +2,135 @@
 """EventAnalyzer MCP Server
 埋点分析 MCP 服务
 
-提供 5 个 Tools:
+提供 8 个 Tools:
 1. query_event_fields - 查询事件字段定义
 2. analyze_tracking_data - 分析埋点数据
 3. explain_field - 解释字段含义
 4. find_field_in_code - 在代码中搜索字段
 5. compare_events - 比较事件差异
+6. analyze_tracking_batch - 批量分析埋点数据（支持分层抽样，见 src/batch_analyzer.py）
+7. import_capture - 分析抓包文件（HAR / Charles / mitmproxy）中的埋点请求（见 src/capture_importer.py）
+8. find_field_history - 在 git 历史中查找字段何时加入 / 移除（见 src/field_history.py）
+
+另有管理工具 trace_control（追踪与性能剖析，见 src/utils/tracing.py）
+、definition_changes（上游事件定义的变更记录，见 src/definition_tracker.py）
+、export_definition_snapshot（导出离线定义快照，见 src/definition_snapshot.py）
+、recent_issues（HTTP 模式下 /collect 接收的上报最近的问题，见 src/beacon_collector.py）
+和 startup_report（启动耗时报告，见 src/utils/startup.py）
 """
 
+from src.utils import startup  # 最先导入，作为启动计时起点
+
 import asyncio
+import functools
 import json
 import os
 import sys
+from datetime import datetime
 from typing import Any
 
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
 from mcp.types import Tool, TextContent
 
-# 导入业务模块
-from src.api_client import EventAPIClient
-from src.event_analyzer import EventAnalyzer
-from src.field_explainer import FieldExplainer
-from src.code_searcher import CodeSearcher
-from src.utils.base64_decoder import Base64Decoder
+from src.definition_snapshot import DEFAULT_SNAPSHOT_PATH, collect_definitions, write_snapshot
+from src.definition_store import DEFAULT_STORE_PATH
+from src.utils.tracing import get_tracer, span
 
 # 创建 MCP Server 实例
 server = Server("eventanalyzer")
+tracer = get_tracer()
+
+# 耗时较长的 Tool 在线程中执行，不阻塞事件循环（HTTP 模式下的其他会话和 /collect 上报）
+THREADED_TOOLS = {"analyze_tracking_batch", "import_capture", "find_field_in_code", "find_field_history"}
+
+
+# 业务模块在第一次用到时才导入和创建：stdio 模式每个 IDE 会话启动一个进程，
+# 不做与握手无关的工作，客户端更快拿到第一次响应
+@functools.lru_cache(maxsize=None)
+def get_api_client():
+    """埋点事件 API 客户端"""
+    from src.api_client import EventAPIClient
+
+    with startup.timed("api_client"):
+        client = EventAPIClient()
+    # 上游定义变化时，按字段失效编译好的校验规则
+    client.tracker.add_listener(get_event_analyzer().invalidate)
+    return client
+
+
+@functools.lru_cache(maxsize=None)
+def get_event_analyzer():
+    """埋点事件分析器"""
+    from src.event_analyzer import EventAnalyzer
+
+    with startup.timed("event_analyzer"):
+        return EventAnalyzer()
+
+
+@functools.lru_cache(maxsize=None)
+def get_field_explainer():
+    """字段解释器"""
+    from src.field_explainer import FieldExplainer
+
+    with startup.timed("field_explainer"):
+        return FieldExplainer()
+
+
+@functools.lru_cache(maxsize=None)
+def get_code_searcher():
+    """代码搜索器"""
+    from src.code_searcher import CodeSearcher
+
+    with startup.timed("code_searcher"):
+        return CodeSearcher()
+
+
+@functools.lru_cache(maxsize=None)
+def get_field_history():
+    """字段历史索引（FIELD_HISTORY_PATH）"""
+    from src.field_history import open_field_history
+
+    with startup.timed("field_history"):
+        return open_field_history()
 
-# 初始化业务模块
-api_client = EventAPIClient()
-event_analyzer = EventAnalyzer()
-field_explainer = FieldExplainer()
-code_searcher = CodeSearcher()
-base64_decoder = Base64Decoder()
+
+@functools.lru_cache(maxsize=None)
+def get_base64_decoder():
+    """Base64 解码器"""
+    from src.utils.base64_decoder import Base64Decoder
+
+    with startup.timed("base64_decoder"):
+        return Base64Decoder()
+
+
+@functools.lru_cache(maxsize=None)
+def get_beacon_collector():
+    """埋点上报收集器（HTTP 模式下 COLLECTOR_ENABLED=true 时接收上报）"""
+    from src.beacon_collector import BeaconCollector, collector_settings
+
+    settings = collector_settings()
+    return BeaconCollector(
+        get_event_analyzer,
+        lambda event: get_api_client().get_event_fields(event),
+        queue_size=settings["queue_size"],
+        bucket_seconds=settings["bucket_seconds"],
+        window_seconds=settings["window_seconds"]
+    )
+
+
+# query_event_fields 可选的字段属性（enum_values 由 trans 解析得到）
+FIELD_ATTRIBUTES = ("type", "tips", "desc", "trans", "enum_values")
+DETAIL_ATTRIBUTES = ("type", "tips", "desc", "enum_values")
+
+# 紧凑 JSON（不缩进），减少传输字节数和客户端解析时间
+COMPACT_JSON = os.getenv("EVENT_COMPACT_JSON", "false").lower() in ("1", "true", "yes")
 
 
 @server.list_tools()
 async def list_tools() -> list[Tool]:
     """注册 MCP Tools"""
+    startup.mark("first_list_tools")
     return [
         Tool(
             name="query_event_fields",
@@ -54,8 +144,28 @@ async def list_tools() -> list[Tool]:
                     },
                     "show_details": {
                         "type": "boolean",
-                        "description": "是否显示详细信息（默认 true）",
+                        "description": "是否显示详细信息（默认 true，返回解析后的 enum_values 而不是原始 trans；false 时返回原始定义）",
                         "default": True
+                    },
+                    "attributes": {
+                        "type": "array",
+                        "items": {"type": "string", "enum": list(FIELD_ATTRIBUTES)},
+                        "description": "只返回指定的字段属性，如 [\"type\"]；不填时由 show_details 决定"
+                    },
+                    "fields": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "只返回指定名称的字段（可选）"
+                    },
+                    "offset": {
+                        "type": "integer",
+                        "description": "分页：跳过的字段数（默认 0）",
+                        "default": 0
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "分页：最多返回的字段数，0 表示全部（默认 0）",
+                        "default": 0
                     }
                 },
                 "required": ["event"]
@@ -84,6 +194,115 @@ async def list_tools() -> list[Tool]:
                 "required": ["data"]
             }
         ),
+        Tool(
+            name="analyze_tracking_batch",
+            description="批量分析埋点数据（如上报日志），按事件分层抽样校验，返回各事件的错误率及置信区间、问题类型分布和示例数据",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "data": {
+                        "type": "string",
+                        "description": "批量数据：JSON 数组，或每行一条（JSON 或 Base64）"
+                    },
+                    "file_path": {
+                        "type": "string",
+                        "description": "批量数据文件的绝对路径（格式同 data，逐行读取），与 data 二选一"
+                    },
+                    "event": {
+                        "type": "string",
+                        "description": "数据中没有 event 字段时使用的事件名称（可选）"
+                    },
+                    "sample_rate": {
+                        "type": "number",
+                        "description": "抽样率 0~1（默认 1，即全部校验）",
+                        "default": 1
+                    },
+                    "event_rates": {
+                        "type": "object",
+                        "additionalProperties": {"type": "number"},
+                        "description": "按事件覆盖抽样率，如 {\"LlwResExposure\": 0.01}（可选）"
+                    },
+                    "min_per_event": {
+                        "type": "integer",
+                        "description": "每个事件至少校验的条数（默认 20）",
+                        "default": 20
+                    },
+                    "examples": {
+                        "type": "integer",
+                        "description": "每种问题类型保留的示例数据条数（默认 3）",
+                        "default": 3
+                    },
+                    "top_k": {
+                        "type": "integer",
+                        "description": "列出出现最多的未知字段 / 非法枚举值的个数（默认 20）",
+                        "default": 20
+                    },
+                    "confidence": {
+                        "type": "number",
+                        "description": "置信度（默认 0.95）",
+                        "default": 0.95
+                    },
+                    "seed": {
+                        "type": "integer",
+                        "description": "随机种子，指定时抽样结果可复现（可选）"
+                    },
+                    "check_required": {
+                        "type": "boolean",
+                        "description": "是否检查必填字段（默认 false）",
+                        "default": False
+                    }
+                }
+            }
+        ),
+        Tool(
+            name="import_capture",
+            description="流式读取抓包文件（HAR、Charles .chlsj、mitmproxy 流量文件），提取埋点上报请求并按事件汇总问题，适合几百 MB 的大文件",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "file_path": {
+                        "type": "string",
+                        "description": "抓包文件的绝对路径"
+                    },
+                    "format": {
+                        "type": "string",
+                        "enum": ["auto", "har", "charles", "mitmproxy"],
+                        "description": "抓包格式（默认 auto，按扩展名或文件内容判断）",
+                        "default": "auto"
+                    },
+                    "url_patterns": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "埋点上报地址的正则，匹配任意一个即视为埋点请求（默认匹配 /sa、/sa.gif、sensorsdata、/collect、/track）"
+                    },
+                    "event": {
+                        "type": "string",
+                        "description": "数据中没有 event 字段时使用的事件名称（可选）"
+                    },
+                    "sample_rate": {
+                        "type": "number",
+                        "description": "抽样率 0~1（默认 1，即全部校验）",
+                        "default": 1
+                    },
+                    "examples": {
+                        "type": "integer",
+                        "description": "每种问题类型保留的示例数据条数（默认 3）",
+                        "default": 3
+                    },
+                    "top_k": {
+                        "type": "integer",
+                        "description": "列出出现最多的未知字段 / 非法枚举值的个数（默认 20）",
+                        "default": 20
+                    },
+                    "check_required": {
+                        "type": "boolean",
+                        "description": "是否检查必填字段（默认 false）",
+                        "default": False
+                    }
+                },
+                "required": ["file_path"]
+            }
+        ),
         Tool(
             name="explain_field",
             description="解释埋点字段的含义、类型和枚举值",
@@ -125,6 +344,59 @@ async def list_tools() -> list[Tool]:
                         "type": "integer",
                         "description": "最大结果数（默认 50）",
                         "default": 50
+                    },
+                    "respect_ignore": {
+                        "type": "boolean",
+                        "description": "是否跳过 .gitignore / .ignore 忽略的文件（默认 true）",
+                        "default": True
+                    },
+                    "skip_binary": {
+                        "type": "boolean",
+                        "description": "是否跳过二进制文件（默认 true）",
+                        "default": True
+                    },
+                    "skip_minified": {
+                        "type": "boolean",
+                        "description": "是否跳过压缩后的代码，如 .min.js 和打包产物（默认 true）",
+                        "default": True
+                    },
+                    "max_file_size": {
+                        "type": "integer",
+                        "description": "单个文件大小上限（字节，默认 1048576，0 表示不限制）",
+                        "default": 1048576
+                    }
+                },
+                "required": ["field_name", "project_path"]
+            }
+        ),
+        Tool(
+            name="find_field_history",
+            description="在项目的 git 历史中查找字段何时被加入、移除埋点代码（已处理的提交会缓存，之后只处理新提交）",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "field_name": {
+                        "type": "string",
+                        "description": "字段名称"
+                    },
+                    "project_path": {
+                        "type": "string",
+                        "description": "项目目录的绝对路径（git 仓库或其子目录）"
+                    },
+                    "rev": {
+                        "type": "string",
+                        "description": "从哪个分支 / 提交往前查找（默认 HEAD）",
+                        "default": "HEAD"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "最多返回的提交数（默认 50）",
+                        "default": 50
+                    },
+                    "max_commits": {
+                        "type": "integer",
+                        "description": "本次最多处理的新提交数（默认 5000，大仓库首次查询时分多次完成）",
+                        "default": 5000
                     }
                 },
                 "required": ["field_name", "project_path"]
@@ -147,6 +419,113 @@ async def list_tools() -> list[Tool]:
                 },
                 "required": ["event1", "event2"]
             }
+        ),
+        Tool(
+            name="definition_changes",
+            description="查看上游事件定义的最近变化：新增/删除字段、类型变化、枚举值变化",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "event": {
+                        "type": "string",
+                        "description": "只看该事件的变化（可选）"
+                    },
+                    "hours": {
+                        "type": "number",
+                        "description": "只看最近多少小时内的变化（可选）"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "最多返回的记录数（默认 20）",
+                        "default": 20
+                    }
+                }
+            }
+        ),
+        Tool(
+            name="export_definition_snapshot",
+            description="把已缓存的事件定义（和指定事件）导出为离线快照，供 EVENT_SNAPSHOT_PATH / EVENT_OFFLINE 使用",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "path": {
+                        "type": "string",
+                        "description": "快照文件路径（默认 data/definitions.snap）"
+                    },
+                    "events": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "额外导出的事件名称，未缓存时请求上游（可选）"
+                    }
+                }
+            }
+        ),
+        Tool(
+            name="recent_issues",
+            description="查看测试设备上报到 /collect 的埋点最近几分钟的问题：各事件的出错条数、问题类型、问题最多的字段和最近的示例（需 HTTP 模式并设置 COLLECTOR_ENABLED=true）",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "minutes": {
+                        "type": "number",
+                        "description": "统计最近多少分钟（默认 5）",
+                        "default": 5
+                    },
+                    "event": {
+                        "type": "string",
+                        "description": "只看该事件（可选）"
+                    },
+                    "top": {
+                        "type": "integer",
+                        "description": "每个事件列出的问题最多的字段数（默认 10）",
+                        "default": 10
+                    }
+                }
+            }
+        ),
+        Tool(
+            name="startup_report",
+            description="管理工具：查看服务启动耗时（各阶段、延迟创建的组件），可选给出 -X importtime 导入耗时明细",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "importtime": {
+                        "type": "boolean",
+                        "description": "是否在子进程中用 -X importtime 统计导入耗时（约需 1 秒）",
+                        "default": False
+                    }
+                }
+            }
+        ),
+        Tool(
+            name="trace_control",
+            description="管理工具：查看各工具的分段耗时，开启/关闭追踪，对慢调用做性能剖析（结果写入 TRACE_DIR）",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "action": {
+                        "type": "string",
+                        "enum": ["status", "enable", "disable", "profile", "reset"],
+                        "description": "status 查看统计，enable/disable 开关追踪，profile 开启剖析，reset 清空统计（默认 status）",
+                        "default": "status"
+                    },
+                    "mode": {
+                        "type": "string",
+                        "enum": ["sample", "cprofile", "off"],
+                        "description": "剖析方式：sample 采样调用栈（输出 .folded 火焰图数据），cprofile 输出 .prof",
+                        "default": "sample"
+                    },
+                    "slow_ms": {
+                        "type": "number",
+                        "description": "慢调用阈值（毫秒），超过阈值的调用才保存剖析结果"
+                    },
+                    "calls": {
+                        "type": "integer",
+                        "description": "剖析的调用次数，之后自动关闭（0 表示不限）",
+                        "default": 0
+                    }
+                }
+            }
         )
     ]
 
@@ -155,136 +534,467 @@ async def list_tools() -> list[Tool]:
 async def call_tool(name: str, arguments: Any) -> list[TextContent]:
     """处理 Tool 调用"""
 
-    try:
-        if name == "query_event_fields":
-            # 查询事件字段定义
-            event = arguments["event"]
-            show_details = arguments.get("show_details", True)
+    startup.mark("first_tool_call")
+    with tracer.trace(name):
+        try:
+            if name == "startup_report":
+                result = await startup_report(arguments.get("importtime", False))
+            elif name in THREADED_TOOLS:
+                # to_thread 会复制当前上下文，追踪的 span 仍记在本次调用下
+                result = await asyncio.to_thread(dispatch_tool, name, arguments)
+            else:
+                result = dispatch_tool(name, arguments)
+        except Exception as e:
+            result = {
+                "error": str(e),
+                "tool": name,
+                "arguments": arguments
+            }
 
-            fields = api_client.get_event_fields(event)
+        with span("serialize"):
+            if COMPACT_JSON:
+                text = json.dumps(result, ensure_ascii=False, separators=(",", ":"))
+            else:
+                text = json.dumps(result, ensure_ascii=False, indent=2)
 
-            # 解析枚举值
-            if show_details:
-                for field_name, field_def in fields.items():
-                    if field_def.get("trans"):
-                        field_def["enum_values"] = api_client.parse_field_trans(field_def["trans"])
+    startup.mark("first_tool_result")
+    return [TextContent(type="text", text=text)]
 
-            result = {
-                "event": event,
-                "total_fields": len(fields),
-                "fields": fields
+
+async def startup_report(importtime: bool = False) -> dict:
+    """
+    启动耗时报告
+
+    Args:
+        importtime: 是否附带 -X importtime 导入耗时明细（在子进程中统计，不阻塞事件循环）
+
+    Returns:
+        各阶段耗时、延迟创建的组件耗时
+    """
+    result = startup.report()
+    if importtime:
+        result["importtime"] = await asyncio.to_thread(
+            startup.importtime_report, "server", os.path.dirname(os.path.abspath(__file__))
+        )
+    return result
+
+
+def dispatch_tool(name: str, arguments: Any) -> dict:
+    """执行 Tool，返回结果字典"""
+
+    if name == "query_event_fields":
+        # 查询事件字段定义
+        event = arguments["event"]
+        show_details = arguments.get("show_details", True)
+        attributes = arguments.get("attributes")
+        wanted = arguments.get("fields")
+        offset = max(int(arguments.get("offset", 0)), 0)
+        limit = max(int(arguments.get("limit", 0)), 0)
+
+        if attributes:
+            unknown = [a for a in attributes if a not in FIELD_ATTRIBUTES]
+            if unknown:
+                return {"error": f"未知字段属性: {', '.join(unknown)}，可选: {', '.join(FIELD_ATTRIBUTES)}"}
+        elif show_details:
+            attributes = DETAIL_ATTRIBUTES
+
+        with span("fetch_definitions"):
+            fields = get_api_client().get_event_fields(event)
+
+        names = list(fields)
+        missing = []
+        if wanted:
+            missing = [n for n in wanted if n not in fields]
+            names = [n for n in wanted if n in fields]
+
+        page = names[offset:offset + limit] if limit else names[offset:]
+        next_offset = offset + len(page)
+
+        with span("parse_enums"):
+            if attributes:
+                selected = {
+                    n: project_field(fields[n], attributes) for n in page
+                }
+            else:
+                selected = {n: fields[n] for n in page}
+
+        result = {
+            "event": event,
+            "total_fields": len(names),
+            "offset": offset,
+            "limit": limit,
+            "returned": len(selected),
+            "has_more": next_offset < len(names),
+            "fields": selected
+        }
+        if result["has_more"]:
+            result["next_offset"] = next_offset
+        if missing:
+            result["missing_fields"] = missing
+        return result
+
+    elif name == "analyze_tracking_data":
+        # 分析埋点数据
+        data = arguments["data"]
+        event_name = arguments.get("event")
+        check_required = arguments.get("check_required", False)
+
+        # 解码数据
+        with span("decode"):
+            event_data = get_base64_decoder().decode_flexible(data)
+
+        # 如果没有指定事件名称，从数据中提取
+        if not event_name:
+            event_name = event_data.get("event")
+
+        if not event_name:
+            return {
+                "error": "无法确定事件名称，请指定 event 参数或确保数据中包含 event 字段"
             }
 
-            return [TextContent(
-                type="text",
-                text=json.dumps(result, ensure_ascii=False, indent=2)
-            )]
-
-        elif name == "analyze_tracking_data":
-            # 分析埋点数据
-            data = arguments["data"]
-            event_name = arguments.get("event")
-            check_required = arguments.get("check_required", False)
-
-            # 解码数据
-            event_data = base64_decoder.decode_flexible(data)
-
-            # 如果没有指定事件名称，从数据中提取
-            if not event_name:
-                event_name = event_data.get("event")
-
-            if not event_name:
-                return [TextContent(
-                    type="text",
-                    text=json.dumps({
-                        "error": "无法确定事件名称，请指定 event 参数或确保数据中包含 event 字段"
-                    }, ensure_ascii=False)
-                )]
-
-            # 获取字段定义
-            field_definitions = api_client.get_event_fields(event_name)
-
-            # 分析数据
-            result = event_analyzer.analyze(event_data, field_definitions, check_required)
-
-            return [TextContent(
-                type="text",
-                text=json.dumps(result, ensure_ascii=False, indent=2)
-            )]
-
-        elif name == "explain_field":
-            # 解释字段含义
-            event = arguments["event"]
-            field_name = arguments["field_name"]
-            show_enum = arguments.get("show_enum", True)
-
-            field_info = api_client.get_field_info(event, field_name)
-
-            if not field_info:
-                return [TextContent(
-                    type="text",
-                    text=json.dumps({
-                        "error": f"字段 {field_name} 在事件 {event} 中不存在"
-                    }, ensure_ascii=False)
-                )]
-
-            result = field_explainer.explain_field(field_name, field_info, show_enum)
+        # 获取字段定义
+        with span("fetch_definitions"):
+            field_definitions = get_api_client().get_event_fields(event_name)
+
+        # 分析数据
+        with span("analyze"):
+            return get_event_analyzer().analyze(event_data, field_definitions, check_required, event=event_name)
+
+    elif name == "analyze_tracking_batch":
+        # 批量分析埋点数据（分层抽样）
+        from src.batch_analyzer import BatchAnalyzer, iter_payload_file, iter_payloads
+
+        data = arguments.get("data")
+        file_path = arguments.get("file_path")
+        if bool(data) == bool(file_path):
+            return {"error": "请指定 data 或 file_path 其中之一"}
+
+        batch = BatchAnalyzer(
+            get_event_analyzer(),
+            get_api_client().get_event_fields,
+            sample_rate=float(arguments.get("sample_rate", 1)),
+            event_rates=arguments.get("event_rates"),
+            min_per_event=arguments.get("min_per_event", 20),
+            reservoir_size=arguments.get("examples", 3),
+            check_required=arguments.get("check_required", False),
+            confidence=float(arguments.get("confidence", 0.95)),
+            seed=arguments.get("seed"),
+            default_event=arguments.get("event"),
+            top_k=arguments.get("top_k", 20)
+        )
+        with span("analyze"):
+            return batch.analyze(iter_payload_file(file_path) if file_path else iter_payloads(data))
+
+    elif name == "import_capture":
+        # 分析抓包文件中的埋点请求
+        from src.batch_analyzer import BatchAnalyzer
+        from src.capture_importer import DEFAULT_URL_PATTERNS, import_capture
+
+        file_path = arguments["file_path"]
+        if not os.path.isfile(file_path):
+            return {"error": f"文件不存在: {file_path}"}
+
+        batch = BatchAnalyzer(
+            get_event_analyzer(),
+            get_api_client().get_event_fields,
+            sample_rate=float(arguments.get("sample_rate", 1)),
+            reservoir_size=arguments.get("examples", 3),
+            check_required=arguments.get("check_required", False),
+            default_event=arguments.get("event"),
+            top_k=arguments.get("top_k", 20)
+        )
+        with span("analyze"):
+            return import_capture(
+                file_path,
+                batch,
+                arguments.get("format", "auto"),
+                arguments.get("url_patterns") or DEFAULT_URL_PATTERNS
+            )
+
+    elif name == "explain_field":
+        # 解释字段含义
+        event = arguments["event"]
+        field_name = arguments["field_name"]
+        show_enum = arguments.get("show_enum", True)
+
+        with span("fetch_definitions"):
+            field_info = get_api_client().get_field_info(event, field_name)
+
+        if not field_info:
+            return {
+                "error": f"字段 {field_name} 在事件 {event} 中不存在"
+            }
+
+        with span("analyze"):
+            result = get_field_explainer().explain_field(field_name, field_info, show_enum)
 
             # 查找相关字段
-            all_fields = api_client.get_event_fields(event)
-            related_fields = field_explainer.search_related_fields(field_name, all_fields)
-            result["related_fields"] = related_fields
-
-            return [TextContent(
-                type="text",
-                text=json.dumps(result, ensure_ascii=False, indent=2)
-            )]
-
-        elif name == "find_field_in_code":
-            # 在代码中搜索字段
-            field_name = arguments["field_name"]
-            project_path = arguments["project_path"]
-            max_results = arguments.get("max_results", 50)
-
-            result = code_searcher.find_field(field_name, project_path, max_results)
-
-            return [TextContent(
-                type="text",
-                text=json.dumps(result, ensure_ascii=False, indent=2)
-            )]
-
-        elif name == "compare_events":
-            # 比较事件差异
-            event1 = arguments["event1"]
-            event2 = arguments["event2"]
-
-            fields1 = api_client.get_event_fields(event1)
-            fields2 = api_client.get_event_fields(event2)
-
-            result = event_analyzer.compare_events(fields1, fields2)
-            result["event1"] = event1
-            result["event2"] = event2
-
-            return [TextContent(
-                type="text",
-                text=json.dumps(result, ensure_ascii=False, indent=2)
-            )]
-
-        else:
-            return [TextContent(
-                type="text",
-                text=json.dumps({"error": f"Unknown tool: {name}"}, ensure_ascii=False)
-            )]
-
-    except Exception as e:
-        return [TextContent(
-            type="text",
-            text=json.dumps({
-                "error": str(e),
-                "tool": name,
-                "arguments": arguments
-            }, ensure_ascii=False, indent=2)
-        )]
+            all_fields = get_api_client().get_event_fields(event)
+            result["related_fields"] = get_field_explainer().search_related_fields(field_name, all_fields)
+
+        return result
+
+    elif name == "find_field_in_code":
+        # 在代码中搜索字段
+        field_name = arguments["field_name"]
+        project_path = arguments["project_path"]
+        max_results = arguments.get("max_results", 50)
+        searcher = get_code_searcher()
+
+        with span("search"):
+            return searcher.find_field(
+                field_name,
+                project_path,
+                max_results,
+                respect_ignore=arguments.get("respect_ignore", True),
+                skip_binary=arguments.get("skip_binary", True),
+                skip_minified=arguments.get("skip_minified", True),
+                max_file_size=arguments.get("max_file_size", searcher.DEFAULT_MAX_FILE_SIZE)
+            )
+
+    elif name == "find_field_history":
+        # 字段在 git 历史中的加入 / 移除
+        with span("search"):
+            result = get_field_history().find_history(
+                arguments["field_name"],
+                arguments["project_path"],
+                arguments.get("rev", "HEAD"),
+                arguments.get("limit", 50),
+                arguments.get("max_commits", 5000)
+            )
+
+        commits = result.get("changes", []) + result.get("events", [])
+        if result.get("introduced"):
+            commits.append(result["introduced"])
+        for commit in commits:
+            if isinstance(commit["time"], int):
+                commit["time"] = datetime.fromtimestamp(commit["time"]).strftime("%Y-%m-%d %H:%M:%S")
+        return result
+
+    elif name == "compare_events":
+        # 比较事件差异
+        event1 = arguments["event1"]
+        event2 = arguments["event2"]
+
+        with span("fetch_definitions"):
+            fields1 = get_api_client().get_event_fields(event1)
+            fields2 = get_api_client().get_event_fields(event2)
+
+        with span("analyze"):
+            result = get_event_analyzer().compare_events(fields1, fields2)
+        result["event1"] = event1
+        result["event2"] = event2
+
+        return result
+
+    elif name == "definition_changes":
+        # 上游定义变更记录
+        event = arguments.get("event")
+        hours = arguments.get("hours")
+        limit = arguments.get("limit", 20)
+        tracker = get_api_client().tracker
+
+        if not tracker.log_path:
+            return {"error": "变更日志未启用（EVENT_CHANGE_LOG=off）"}
+
+        since = datetime.now().timestamp() - float(hours) * 3600 if hours else 0
+        records = tracker.recent_changes(event, limit, since)
+        for record in records:
+            record["time"] = datetime.fromtimestamp(record["ts"]).strftime("%Y-%m-%d %H:%M:%S")
+
+        return {
+            "log_path": tracker.log_path,
+            "total": len(records),
+            "changes": records
+        }
+
+    elif name == "export_definition_snapshot":
+        # 导出离线定义快照
+        path = arguments.get("path") or DEFAULT_SNAPSHOT_PATH
+        with span("fetch_definitions"):
+            definitions = collect_definitions(get_api_client(), arguments.get("events") or [])
+        if not definitions:
+            return {"error": "没有可导出的事件定义，请先查询事件或通过 events 参数指定"}
+        return write_snapshot(path, definitions, get_api_client().BASE_URL)
+
+    elif name == "recent_issues":
+        # /collect 上报的最近问题
+        from src.beacon_collector import collector_settings
+
+        if not collector_settings()["enabled"]:
+            return {"error": "上报收集未启用：请以 HTTP 模式运行并设置 COLLECTOR_ENABLED=true"}
+        return get_beacon_collector().recent_issues(
+            float(arguments.get("minutes", 5)),
+            arguments.get("event"),
+            arguments.get("top", 10)
+        )
+
+    elif name == "trace_control":
+        # 追踪与性能剖析管理
+        action = arguments.get("action", "status")
+        if action == "enable":
+            tracer.configure(enabled=True, slow_ms=arguments.get("slow_ms"))
+        elif action == "disable":
+            tracer.configure(enabled=False, profile="off")
+        elif action == "profile":
+            tracer.configure(
+                profile=arguments.get("mode", "sample"),
+                slow_ms=arguments.get("slow_ms"),
+                calls=arguments.get("calls", 0)
+            )
+        elif action == "reset":
+            tracer.reset()
+        elif action != "status":
+            return {"error": f"未知操作: {action}"}
+        return tracer.status()
+
+    else:
+        return {"error": f"Unknown tool: {name}"}
+
+
+def project_field(field_def: dict, attributes) -> dict:
+    """
+    按属性裁剪字段定义（返回新字典，不修改缓存中的定义）
+
+    Args:
+        field_def: 原始字段定义
+        attributes: 需要的属性，enum_values 由 trans 解析得到
+
+    Returns:
+        裁剪后的字段定义
+    """
+    projected = {}
+    for attr in attributes:
+        if attr == "enum_values":
+            if field_def.get("trans"):
+                projected["enum_values"] = get_api_client().parse_field_trans(field_def["trans"])
+        elif attr in field_def:
+            projected[attr] = field_def[attr]
+    return projected
+
+
+def compression_middleware():
+    """
+    HTTP 模式的响应压缩中间件配置（MCP_COMPRESSION=off 关闭）
+
+    Returns:
+        Starlette Middleware 列表
+    """
+    from starlette.middleware import Middleware
+    from src.utils.compression import CompressionMiddleware, DEFAULT_MINIMUM_SIZE
+
+    if os.getenv("MCP_COMPRESSION", "on").lower() in ("0", "off", "false", "no"):
+        return []
+    minimum_size = int(os.getenv("MCP_COMPRESSION_MIN_SIZE", str(DEFAULT_MINIMUM_SIZE)))
+    return [Middleware(CompressionMiddleware, minimum_size=minimum_size)]
+
+
+def collector_routes():
+    """
+    上报收集路由（COLLECTOR_ENABLED=true 时启用，路径为 COLLECTOR_PATH，默认 /collect）
+
+    Returns:
+        Starlette Route 列表
+    """
+    from src.beacon_collector import collector_settings, create_collect_endpoint
+
+    settings = collector_settings()
+    if not settings["enabled"]:
+        return []
+
+    from starlette.routing import Route
+
+    endpoint = create_collect_endpoint(get_beacon_collector(), settings["max_body"])
+    return [Route(settings["path"], endpoint, methods=["GET", "POST", "OPTIONS"])]
+
+
+def create_streamable_http_app():
+    """
+    创建 Streamable HTTP 应用（uvicorn 工厂函数，每个 worker 进程各创建一次）
+
+    默认无状态（MCP_STATELESS=true）：每个请求独立处理，不依赖进程内会话，
+    可以运行多个 worker，任意 worker 都能处理任意请求，worker 重启也不会丢失会话。
+    """
+    import contextlib
+
+    from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+    from starlette.applications import Starlette
+    from starlette.requests import Request
+    from starlette.responses import JSONResponse, Response
+    from starlette.routing import Route
+
+    base_path = os.getenv("MCP_BASE_PATH", "")
+    session_manager = StreamableHTTPSessionManager(
+        app=server,
+        stateless=os.getenv("MCP_STATELESS", "true").lower() in ("1", "true", "yes"),
+        json_response=os.getenv("MCP_JSON_RESPONSE", "true").lower() in ("1", "true", "yes"),
+    )
+
+    class StreamableHTTPEndpoint:
+        """把请求交给 session manager 处理（ASGI 应用）"""
+
+        async def __call__(self, scope, receive, send):
+            await session_manager.handle_request(scope, receive, send)
+
+    async def handle_root(request: Request) -> Response:
+        """处理根路径"""
+        return Response(
+            content="EventAnalyzer MCP Server is running",
+            media_type="text/plain"
+        )
+
+    async def handle_health(request: Request) -> Response:
+        """健康检查（返回处理请求的 worker 进程）"""
+        return JSONResponse({"status": "ok", "pid": os.getpid()})
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        async with session_manager.run():
+            yield
+
+    return Starlette(
+        routes=[
+            Route("/", handle_root, methods=["GET"]),
+            Route("/health", handle_health, methods=["GET"]),
+            Route(f"{base_path}/mcp", StreamableHTTPEndpoint(), methods=["GET", "POST", "DELETE"]),
+            *collector_routes(),
+        ],
+        middleware=compression_middleware(),
+        lifespan=lifespan
+    )
+
+
+def run_streamable_http():
+    """以 Streamable HTTP 模式启动（MCP_WORKERS 个 uvicorn worker）"""
+    import uvicorn
+
+    workers = int(os.getenv("MCP_WORKERS", "1"))
+    port = int(os.getenv("MCP_PORT", "8000"))
+
+    if workers > 1:
+        # 多个 worker 共用字段定义缓存（子进程继承环境变量）
+        os.environ.setdefault("EVENT_CACHE_PATH", DEFAULT_STORE_PATH)
+        if os.getenv("MCP_STATELESS", "true").lower() not in ("1", "true", "yes"):
+            print(
+                "警告: 有状态模式下运行多个 worker，需要在代理上按 mcp-session-id 请求头做会话保持",
+                file=sys.stderr
+            )
+        if os.getenv("COLLECTOR_ENABLED", "false").lower() in ("1", "true", "yes"):
+            print(
+                "警告: 上报统计保存在各 worker 进程内，recent_issues 只能看到处理该请求的 worker 收到的上报，"
+                "使用上报收集时建议 MCP_WORKERS=1",
+                file=sys.stderr
+            )
+
+    startup.mark("transport_start")
+    uvicorn.run(
+        "server:create_streamable_http_app",
+        factory=True,
+        host=os.getenv("MCP_HOST", "0.0.0.0"),
+        port=port,
+        workers=workers,
+        log_level="info"
+    )
 
 
 async def main():
@@ -346,16 +1056,20 @@ async def main():
                 Route("/", handle_root, methods=["GET"]),
                 Route("/sse", handle_sse, methods=["GET"]),
                 Route("/messages", handle_messages, methods=["POST"]),
-            ]
+                *collector_routes(),
+            ],
+            middleware=compression_middleware()
         )
 
         # 启动 HTTP 服务器
         port = int(os.getenv("MCP_PORT", "8000"))
         config = uvicorn.Config(app, host="0.0.0.0", port=port, log_level="info")
+        startup.mark("transport_start")
         server_instance = uvicorn.Server(config)
         await server_instance.serve()
     else:
         # stdio 模式（用于本地）
+        startup.mark("transport_start")
         async with stdio_server() as (read_stream, write_stream):
             await server.run(
                 read_stream,
@@ -364,5 +1078,15 @@ async def main():
             )
 
 
+startup.mark("module_loaded")
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    if "--startup-report" in sys.argv:
+        # 只输出导入耗时明细，不启动服务
+        report = startup.importtime_report("server", os.path.dirname(os.path.abspath(__file__)))
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    elif os.getenv("MCP_TRANSPORT", "stdio").lower() == "streamable-http":
+        run_streamable_http()
+    else:
+        asyncio.run(main())
@@ -4,9 +4,16 @@
 
 import json
 import os
-import requests
-from typing import Dict, Any, Optional
+import sys
+import threading
+import time
+from collections import OrderedDict
 from functools import lru_cache
+from typing import Dict, Any, Optional, Tuple
+
+from src.definition_snapshot import DefinitionSnapshot, open_definition_snapshot
+from src.definition_store import DEFAULT_TTL, DefinitionStore, open_definition_store
+from src.definition_tracker import DefinitionTracker, open_definition_tracker
 
 
 class EventAPIClient:
@@ -17,21 +24,64 @@ class EventAPIClient:
         "https://tptest-3d66.top/trans/api/event"
     )
 
-    def __init__(self, timeout: int = 10):
+    # 进程内缓存的事件数
+    CACHE_SIZE = 128
+
+    # 上游请求失败、改用快照时，快照数据在进程内缓存的时间（秒），过后重新请求上游
+    SNAPSHOT_FALLBACK_TTL = 60
+
+    def __init__(
+        self,
+        timeout: int = 10,
+        store: Optional[DefinitionStore] = None,
+        ttl: Optional[float] = None,
+        tracker: Optional[DefinitionTracker] = None,
+        snapshot: Optional[DefinitionSnapshot] = None,
+        offline: Optional[bool] = None
+    ):
         """
         初始化 API 客户端
 
         Args:
             timeout: 请求超时时间（秒）
+            store: 多进程共享的定义缓存（默认按 EVENT_CACHE_PATH 打开，未设置则只用进程内缓存）
+            ttl: 缓存有效期（秒），默认 EVENT_CACHE_TTL 或 600
+            tracker: 定义变化追踪器（默认按 EVENT_CHANGE_LOG 创建）
+            snapshot: 离线定义快照（默认按 EVENT_SNAPSHOT_PATH 打开），上游请求失败时使用
+            offline: 离线模式，只从缓存和快照读取，不请求上游（默认 EVENT_OFFLINE）
         """
         self.timeout = timeout
-        self.session = requests.Session()
+        self._session = None
+        self.store = store if store is not None else open_definition_store()
+        self.tracker = tracker if tracker is not None else open_definition_tracker()
+        self.snapshot = snapshot if snapshot is not None else open_definition_snapshot()
+        if offline is None:
+            offline = os.getenv("EVENT_OFFLINE", "false").lower() in ("1", "true", "yes")
+        self.offline = offline
+        if offline and self.snapshot is None:
+            print("警告: 离线模式下没有可用的定义快照（EVENT_SNAPSHOT_PATH），只能使用已缓存的定义", file=sys.stderr)
+        self.ttl = ttl if ttl is not None else float(os.getenv("EVENT_CACHE_TTL", str(DEFAULT_TTL)))
+        # 事件 -> (过期时间, 字段定义)
+        self._cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """HTTP 会话（第一次请求上游时才导入 requests，离线模式和缓存命中时不需要）"""
+        if self._session is None:
+            import requests
+            self._session = requests.Session()
+        return self._session
 
-    @lru_cache(maxsize=128)
     def get_event_fields(self, event_name: str) -> Dict[str, Any]:
         """
         获取事件的所有字段定义（带缓存）
 
+        依次查找进程内缓存、共享缓存，都没有命中时请求 API 并写回两级缓存。
+        每次刷新进程内缓存时交给追踪器比较，记录定义的变化。
+        离线模式或请求失败时从快照读取：快照数据只放入进程内缓存（请求失败时只缓存
+        SNAPSHOT_FALLBACK_TTL 秒），不写共享缓存，也不交给追踪器（旧快照不是定义的变化）
+
         Args:
             event_name: 事件名称（如 LlwResExposure）
 
@@ -49,6 +99,54 @@ class EventAPIClient:
         Raises:
             Exception: 请求失败时抛出异常
         """
+        now = time.time()
+        with self._cache_lock:
+            cached = self._cache.get(event_name)
+            if cached is not None and now <= cached[0]:
+                self._cache.move_to_end(event_name)
+                return cached[1]
+
+        ttl = self.ttl
+        fields = self.store.get(event_name) if self.store is not None else None
+        from_snapshot = False
+        if fields is None:
+            fields, from_snapshot = self._load_event_fields(event_name)
+            if from_snapshot:
+                if not self.offline:
+                    ttl = min(ttl, self.SNAPSHOT_FALLBACK_TTL)
+            elif self.store is not None:
+                self.store.put(event_name, fields)
+
+        if not from_snapshot:
+            self.tracker.observe(event_name, fields)
+
+        with self._cache_lock:
+            self._cache[event_name] = (now + ttl, fields)
+            self._cache.move_to_end(event_name)
+            while len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return fields
+
+    def _load_event_fields(self, event_name: str) -> Tuple[Dict[str, Any], bool]:
+        """从上游或快照获取字段定义，返回 (字段定义, 是否来自快照)"""
+        if self.offline:
+            fields = self.snapshot.get(event_name) if self.snapshot is not None else None
+            if fields is None:
+                raise Exception(f"离线模式下快照中没有事件 {event_name}")
+            return fields, True
+
+        try:
+            return self._fetch_event_fields(event_name), False
+        except Exception:
+            fields = self.snapshot.get(event_name) if self.snapshot is not None else None
+            if fields is None:
+                raise
+            return fields, True
+
+    def _fetch_event_fields(self, event_name: str) -> Dict[str, Any]:
+        """请求 API 获取字段定义"""
+        import requests
+
         try:
             response = self.session.get(
                 self.BASE_URL,
@@ -73,11 +171,7 @@ class EventAPIClient:
         """
         if not trans_str:
             return {}
-
-        try:
-            return json.loads(trans_str)
-        except json.JSONDecodeError:
-            return {}
+        return _parse_trans(trans_str)
 
     def get_field_info(self, event_name: str, field_name: str) -> Optional[Dict[str, Any]]:
         """
@@ -94,8 +188,8 @@ class EventAPIClient:
         field_info = fields.get(field_name)
 
         if field_info and field_info.get("trans"):
-            # 解析枚举值
-            field_info["enum_values"] = self.parse_field_trans(field_info["trans"])
+            # 解析枚举值（复制一份，不修改缓存中的定义）
+            field_info = dict(field_info, enum_values=self.parse_field_trans(field_info["trans"]))
 
         return field_info
 
@@ -112,6 +206,31 @@ class EventAPIClient:
         fields = self.get_event_fields(event_name)
         return list(fields.keys())
 
+    def cached_definitions(self) -> Dict[str, Dict[str, Any]]:
+        """
+        已缓存的全部事件定义（共享缓存和进程内缓存，用于导出快照）
+
+        Returns:
+            {事件名称: 字段定义字典}
+        """
+        definitions = self.store.all() if self.store is not None else {}
+        with self._cache_lock:
+            for event_name, (_, fields) in self._cache.items():
+                definitions[event_name] = fields
+        return definitions
+
     def clear_cache(self):
-        """清空缓存"""
-        self.get_event_fields.cache_clear()
+        """清空缓存（含共享缓存）"""
+        with self._cache_lock:
+            self._cache.clear()
+        if self.store is not None:
+            self.store.clear()
+
+
+@lru_cache(maxsize=4096)
+def _parse_trans(trans_str: str) -> Dict[str, str]:
+    """解析 trans JSON 字符串（按内容缓存，同一枚举映射只解析一次）"""
+    try:
+        return json.loads(trans_str)
+    except json.JSONDecodeError:
+        return {}
@@ -0,0 +1,531 @@
+"""Batch Analyzer
+批量/流式分析埋点数据，支持按事件分层抽样校验
+
+大批量数据（如整天的上报日志）不需要逐条校验：
+- 每条数据只做很小的固定开销（从开头一小段中提取事件名称），决定是否抽中
+- 按事件名称分层，每个事件各自按抽样率抽取，小流量事件至少校验 min_per_event 条
+- 只有抽中的数据才完整解码和校验，CPU 开销随抽样率而不是数据量增长
+- 每种问题类型用蓄水池抽样保留若干条示例数据
+- 报告每个事件和整体的错误率及置信区间
+- 未知字段和非法枚举值的种类没有上限，用固定内存的概率结构汇总（见 src/utils/sketches.py）
+"""
+
+import base64
+import binascii
+import json
+import math
+import random
+import re
+import statistics
+import time
+import urllib.parse
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from src.event_analyzer import EventAnalyzer
+from src.utils.base64_decoder import Base64Decoder
+from src.utils.sketches import FrequencySketch
+
+Payload = Union[str, Dict[str, Any]]
+
+# 只在数据开头和结尾这么多字符中查找事件名称（神策等 SDK 的 event 字段在 properties 之后，
+# 通常靠近结尾），都找不到时才扫描全文
+EDGE_CHARS = 512
+
+_EVENT_PATTERN = re.compile(rb'"event"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+# 事件名称无法确定的数据归入这一层
+UNKNOWN_EVENT = "(unknown)"
+
+# 这些问题的字段名 / 值不受字段定义限制，用概率结构近似计数
+SKETCHED_ISSUES = ("unknown_field", "invalid_enum")
+_KEY_SEPARATOR = "\x1f"
+# 非法枚举值计入汇总时截断的长度
+MAX_VALUE_CHARS = 200
+
+
+def _search_event(data: bytes, last: bool = False) -> Optional[str]:
+    """查找 "event": "..."，last 为 True 时取最后一处（结尾一段中，顶层 event 在 properties 之后）"""
+    if last:
+        matches = _EVENT_PATTERN.findall(data)
+        raw = matches[-1] if matches else None
+    else:
+        match = _EVENT_PATTERN.search(data)
+        raw = match.group(1) if match else None
+    if raw is None:
+        return None
+    if b"\\" not in raw:
+        return raw.decode("utf-8", "replace")
+    try:
+        return json.loads(b'"' + raw + b'"')
+    except ValueError:
+        return raw.decode("utf-8", "replace")
+
+
+def _escape_safe(text: str, position: int) -> int:
+    """把截断位置向前移到 URL 转义序列（%XX）之外"""
+    while position > 0 and "%" in text[max(position - 2, 0):position]:
+        position -= 1
+    return position
+
+
+def _unquote(text: str) -> str:
+    return urllib.parse.unquote(text) if "%" in text else text
+
+
+def _event_from_json(text: str) -> Optional[str]:
+    data = text.encode("utf-8")
+    if len(text) <= 2 * EDGE_CHARS:
+        return _search_event(data)
+    return (
+        _search_event(text[:EDGE_CHARS].encode("utf-8"))
+        or _search_event(text[-EDGE_CHARS:].encode("utf-8"), last=True)
+        or _search_event(data)
+    )
+
+
+def _event_from_base64(text: str) -> Optional[str]:
+    if len(text) > 2 * EDGE_CHARS:
+        # 开头一段从头对齐；带填充的 Base64 总长度是 4 的倍数，结尾一段从尾部对齐
+        head = _unquote(text[:_escape_safe(text, EDGE_CHARS)])
+        event = _search_event(base64.b64decode(head[:len(head) // 4 * 4]))
+        if event is None:
+            tail = _unquote(text[_escape_safe(text, len(text) - EDGE_CHARS):])
+            event = _search_event(base64.b64decode(tail[len(tail) % 4:]), last=True)
+        if event is not None:
+            return event
+    return _search_event(base64.b64decode(_unquote(text)))
+
+
+def extract_event_name(payload: Payload) -> Optional[str]:
+    """
+    不完整解析数据，快速提取事件名称（用于分层抽样）
+
+    JSON 字符串只在开头和结尾一段中用正则查找；Base64 数据也只解码这两段，
+    都找不到时才处理全文。结果只用于决定是否抽中，抽中后以完整解码的 event 字段为准。
+
+    Args:
+        payload: 埋点数据（字典、JSON 字符串或 URL 编码 + Base64 字符串）
+
+    Returns:
+        事件名称，无法提取时返回 None
+    """
+    if isinstance(payload, dict):
+        event = payload.get("event")
+        return event if isinstance(event, str) else None
+
+    text = payload.strip()
+    try:
+        if text.startswith("{"):
+            return _event_from_json(text)
+        return _event_from_base64(text)
+    except (binascii.Error, ValueError):
+        return None
+
+
+def wilson_interval(successes: int, total: int, z: float) -> Tuple[float, float]:
+    """
+    比例的 Wilson 置信区间（样本少或比例接近 0/1 时比正态近似可靠）
+
+    Args:
+        successes: 命中数
+        total: 样本数
+        z: 正态分位数（95% 置信度为 1.96）
+
+    Returns:
+        (下限, 上限)
+    """
+    if total <= 0:
+        return 0.0, 1.0
+    p = successes / total
+    denominator = 1 + z * z / total
+    center = (p + z * z / (2 * total)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / total + z * z / (4 * total * total)) / denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+def _rate(successes: int, total: int, z: float) -> Dict[str, float]:
+    low, high = wilson_interval(successes, total, z)
+    return {
+        "estimate": round(successes / total, 6) if total else 0.0,
+        "low": round(low, 6),
+        "high": round(high, 6),
+    }
+
+
+class _Stratum:
+    """单个事件（一层）的抽样统计"""
+
+    __slots__ = ("seen", "sampled", "error_payloads", "issue_payloads",
+                 "issue_types", "issue_fields", "skipped")
+
+    def __init__(self):
+        self.seen = 0
+        self.sampled = 0
+        # 抽中且完成校验的数据中，有 error 级问题的条数 / 有任何问题的条数
+        self.error_payloads = 0
+        self.issue_payloads = 0
+        # 问题类型 -> 出现该类型问题的数据条数
+        self.issue_types: Dict[str, int] = {}
+        # (问题类型, 已定义的字段) -> 出现次数；未知字段不在这里计数（见 BatchAnalyzer._sketches）
+        self.issue_fields: Dict[Tuple[str, str], int] = {}
+        # 抽中但无法校验（解码失败、获取定义失败）的条数
+        self.skipped = 0
+
+
+class BatchAnalyzer:
+    """
+    批量埋点数据分析器
+
+    用法：创建后逐条调用 feed()（流式），或一次调用 analyze()；最后用 report() 生成报告。
+    """
+
+    def __init__(
+        self,
+        event_analyzer: EventAnalyzer,
+        get_fields: Callable[[str], Dict[str, Any]],
+        sample_rate: float = 1.0,
+        event_rates: Optional[Dict[str, float]] = None,
+        min_per_event: int = 20,
+        reservoir_size: int = 3,
+        check_required: bool = False,
+        confidence: float = 0.95,
+        seed: Optional[int] = None,
+        default_event: Optional[str] = None,
+        top_k: int = 20
+    ):
+        """
+        初始化批量分析器
+
+        Args:
+            event_analyzer: 单条数据的分析器
+            get_fields: 获取事件字段定义的函数（如 EventAPIClient.get_event_fields）
+            sample_rate: 默认抽样率（0~1）
+            event_rates: 按事件覆盖抽样率，如 {"LlwResExposure": 0.01}
+            min_per_event: 每个事件至少校验的条数（不超过该事件的数据量）
+            reservoir_size: 每种问题类型保留的示例数据条数
+            check_required: 是否检查必填字段
+            confidence: 置信度
+            seed: 随机种子，指定时抽样结果可复现
+            default_event: 数据中没有 event 字段时使用的事件名称
+            top_k: 报告出现最多的未知字段 / 非法枚举值的个数
+        """
+        if not 0 < confidence < 1:
+            raise ValueError(f"置信度必须在 0 和 1 之间: {confidence}")
+        for rate in [sample_rate, *(event_rates or {}).values()]:
+            if not 0 <= rate <= 1:
+                raise ValueError(f"抽样率必须在 0 和 1 之间: {rate}")
+
+        self.event_analyzer = event_analyzer
+        self.get_fields = get_fields
+        self.sample_rate = sample_rate
+        self.event_rates = dict(event_rates or {})
+        self.min_per_event = max(int(min_per_event), 0)
+        self.reservoir_size = max(int(reservoir_size), 0)
+        self.check_required = check_required
+        self.confidence = confidence
+        self.default_event = default_event
+        self._z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+        self._rng = random.Random(seed)
+
+        self._strata: Dict[str, _Stratum] = {}
+        self._definitions: Dict[str, Dict[str, Any]] = {}
+        self._definition_errors: Dict[str, str] = {}
+        # 问题类型 -> (累计出现次数, 示例列表)
+        self._reservoirs: Dict[str, Tuple[int, List[Dict[str, Any]]]] = {}
+        # 未知字段（事件, 字段）和非法枚举值（事件, 字段, 值）的固定内存汇总
+        self._sketches = {issue_type: FrequencySketch(top_k) for issue_type in SKETCHED_ISSUES}
+        self._decode_errors = 0
+        self._started = time.perf_counter()
+
+    # ---------------------------------------------------------------- 输入
+
+    def feed(self, payload: Payload) -> bool:
+        """
+        处理一条数据
+
+        Args:
+            payload: 埋点数据（字典、JSON 字符串或 URL 编码 + Base64 字符串）
+
+        Returns:
+            是否被抽中校验
+        """
+        event = extract_event_name(payload) or self.default_event or UNKNOWN_EVENT
+        stratum = self._strata.get(event)
+        if stratum is None:
+            stratum = self._strata[event] = _Stratum()
+        stratum.seen += 1
+
+        if stratum.sampled >= self.min_per_event:
+            rate = self.event_rates.get(event, self.sample_rate)
+            if rate < 1 and self._rng.random() >= rate:
+                return False
+
+        stratum.sampled += 1
+        self._validate(payload, stratum)
+        return True
+
+    def analyze(self, payloads: Iterable[Payload]) -> Dict[str, Any]:
+        """
+        处理全部数据并生成报告
+
+        Args:
+            payloads: 埋点数据序列（可以是逐行读取文件的生成器）
+
+        Returns:
+            分析报告（见 report）
+        """
+        for payload in payloads:
+            self.feed(payload)
+        return self.report()
+
+    def _validate(self, payload: Payload, stratum: _Stratum):
+        try:
+            event_data = Base64Decoder.decode_flexible(payload)
+            if not isinstance(event_data, dict):
+                raise ValueError("数据不是 JSON 对象")
+        except ValueError:
+            self._decode_errors += 1
+            stratum.skipped += 1
+            return
+
+        event = event_data.get("event") or self.default_event
+        fields = self._fields(event) if event else None
+        if fields is None:
+            stratum.skipped += 1
+            return
+
+        result = self.event_analyzer.analyze(event_data, fields, self.check_required, event=event)
+        issues = result["issues"]
+        if not issues:
+            return
+
+        stratum.issue_payloads += 1
+        if result["status"] == "error":
+            stratum.error_payloads += 1
+        for issue_type in {issue["type"] for issue in issues}:
+            stratum.issue_types[issue_type] = stratum.issue_types.get(issue_type, 0) + 1
+        for issue in issues:
+            issue_type = issue["type"]
+            field_name = issue.get("field", "")
+            if issue_type == "unknown_field":
+                self._sketches[issue_type].add(event + _KEY_SEPARATOR + field_name)
+            else:
+                key = (issue_type, field_name)
+                stratum.issue_fields[key] = stratum.issue_fields.get(key, 0) + 1
+                if issue_type == "invalid_enum":
+                    value = str(issue.get("value"))[:MAX_VALUE_CHARS]
+                    self._sketches[issue_type].add(_KEY_SEPARATOR.join((event, field_name, value)))
+            self._keep_example(issue, event, event_data)
+
+    def _fields(self, event: str) -> Optional[Dict[str, Any]]:
+        """获取字段定义（每个事件只获取一次，失败也只尝试一次）"""
+        fields = self._definitions.get(event)
+        if fields is not None or event in self._definition_errors:
+            return fields
+        try:
+            fields = self._definitions[event] = self.get_fields(event)
+        except Exception as e:
+            self._definition_errors[event] = str(e)
+        return fields
+
+    def _keep_example(self, issue: Dict[str, Any], event: str, event_data: Dict[str, Any]):
+        """蓄水池抽样：每种问题类型等概率保留 reservoir_size 条示例"""
+        if self.reservoir_size == 0:
+            return
+        count, examples = self._reservoirs.get(issue["type"], (0, []))
+        count += 1
+        example = None
+        if len(examples) < self.reservoir_size:
+            example = len(examples)
+            examples.append(None)
+        else:
+            slot = self._rng.randrange(count)
+            if slot < self.reservoir_size:
+                example = slot
+        if example is not None:
+            examples[example] = {
+                "event": event,
+                "field": issue.get("field"),
+                "message": issue.get("message"),
+                "payload": event_data,
+            }
+        self._reservoirs[issue["type"]] = (count, examples)
+
+    # ---------------------------------------------------------------- 报告
+
+    def _stratified(self, counts: Dict[str, int]) -> Dict[str, float]:
+        """
+        分层估计整体比例：各层比例按数据量加权，方差带有限总体校正
+
+        Args:
+            counts: 事件名称 -> 该层命中条数
+
+        Returns:
+            {"estimate", "low", "high"}
+        """
+        total = sum(s.seen for s in self._strata.values() if s.sampled > s.skipped)
+        if total == 0:
+            return {"estimate": 0.0, "low": 0.0, "high": 1.0}
+
+        estimate = 0.0
+        variance = 0.0
+        for event, stratum in self._strata.items():
+            checked = stratum.sampled - stratum.skipped
+            if checked <= 0:
+                continue
+            weight = stratum.seen / total
+            p = counts.get(event, 0) / checked
+            estimate += weight * p
+            if checked > 1:
+                fpc = max(0.0, 1 - checked / stratum.seen)
+                variance += weight * weight * p * (1 - p) / (checked - 1) * fpc
+
+        margin = self._z * math.sqrt(variance)
+        return {
+            "estimate": round(estimate, 6),
+            "low": round(max(0.0, estimate - margin), 6),
+            "high": round(min(1.0, estimate + margin), 6),
+        }
+
+    def _approximate(self) -> Dict[str, Any]:
+        """未知字段和非法枚举值的汇总：出现次数、不同值个数（估计）和出现最多的值"""
+        result = {}
+        for issue_type, sketch in self._sketches.items():
+            top = []
+            for key, count, min_count in sketch.top():
+                parts = key.split(_KEY_SEPARATOR)
+                item = {"event": parts[0], "field": parts[1], "count": count, "min_count": min_count}
+                if issue_type == "invalid_enum":
+                    item["value"] = parts[2]
+                elif parts[0] in self._definitions:
+                    suggestions = self.event_analyzer.suggest_fields(parts[0], parts[1], self._definitions[parts[0]])
+                    if suggestions:
+                        item["suggestions"] = suggestions
+                top.append(item)
+            result[issue_type] = dict(sketch.summary(), top=top)
+        return result
+
+    def report(self, max_events: int = 50, top_fields: int = 10) -> Dict[str, Any]:
+        """
+        生成分析报告
+
+        Args:
+            max_events: 最多列出的事件数（按数据量排序）
+            top_fields: 每个事件列出的问题最多的字段数
+
+        Returns:
+            整体和每个事件的错误率（含置信区间）、问题类型分布、示例数据
+        """
+        z = self._z
+        approximate = self._approximate()
+        unknown_by_event: Dict[str, List[Dict[str, Any]]] = {}
+        for item in approximate["unknown_field"]["top"]:
+            unknown_by_event.setdefault(item["event"], []).append(item)
+
+        events = []
+        for event, stratum in sorted(self._strata.items(), key=lambda item: -item[1].seen):
+            checked = stratum.sampled - stratum.skipped
+            error_rate = _rate(stratum.error_payloads, checked, z)
+            entry = {
+                "event": event,
+                "seen": stratum.seen,
+                "sampled": stratum.sampled,
+                "checked": checked,
+                "sample_rate": round(stratum.sampled / stratum.seen, 6),
+                "error_rate": error_rate,
+                "issue_rate": _rate(stratum.issue_payloads, checked, z),
+                "estimated_error_payloads": {
+                    key: round(value * stratum.seen) for key, value in error_rate.items()
+                },
+                "issue_types": {
+                    issue_type: dict(_rate(count, checked, z), payloads=count)
+                    for issue_type, count in sorted(stratum.issue_types.items(), key=lambda item: -item[1])
+                },
+                "top_fields": sorted(
+                    [
+                        {"type": issue_type, "field": field_name, "count": count}
+                        for (issue_type, field_name), count in stratum.issue_fields.items()
+                    ] + [
+                        dict(
+                            {"type": "unknown_field", "field": item["field"], "count": item["count"], "approximate": True},
+                            **({"suggestions": item["suggestions"]} if "suggestions" in item else {})
+                        )
+                        for item in unknown_by_event.get(event, [])
+                    ],
+                    key=lambda item: -item["count"]
+                )[:top_fields],
+            }
+            if stratum.skipped:
+                entry["skipped"] = stratum.skipped
+            if event in self._definition_errors:
+                entry["definition_error"] = self._definition_errors[event]
+            events.append(entry)
+
+        total_seen = sum(s.seen for s in self._strata.values())
+        total_sampled = sum(s.sampled for s in self._strata.values())
+        result = {
+            "sample_rate": self.sample_rate,
+            "confidence": self.confidence,
+            "total_payloads": total_seen,
+            "sampled_payloads": total_sampled,
+            "checked_payloads": total_sampled - sum(s.skipped for s in self._strata.values()),
+            "effective_sample_rate": round(total_sampled / total_seen, 6) if total_seen else 0.0,
+            "decode_errors": self._decode_errors,
+            "error_rate": self._stratified({e: s.error_payloads for e, s in self._strata.items()}),
+            "issue_rate": self._stratified({e: s.issue_payloads for e, s in self._strata.items()}),
+            "total_events": len(events),
+            "events": events[:max_events],
+            "approximate": approximate,
+            "examples": {
+                issue_type: {"occurrences": count, "samples": examples}
+                for issue_type, (count, examples) in self._reservoirs.items()
+            },
+            "elapsed_ms": round((time.perf_counter() - self._started) * 1000, 2),
+        }
+        return result
+
+
+def iter_payloads(text: str) -> Iterator[Payload]:
+    """
+    把批量输入拆成单条数据
+
+    支持 JSON 数组（元素为对象或 Base64 字符串），或每行一条（JSON 或 Base64）
+
+    Args:
+        text: 批量输入
+
+    Returns:
+        单条数据的迭代器
+    """
+    stripped = text.lstrip()
+    if stripped.startswith("["):
+        items = json.loads(stripped)
+        if not isinstance(items, list):
+            raise ValueError("批量数据必须是 JSON 数组或每行一条")
+        yield from items
+        return
+    for line in text.splitlines():
+        line = line.strip()
+        if line:
+            yield line
+
+
+def iter_payload_file(path: str) -> Iterator[Payload]:
+    """
+    逐行读取批量数据文件（不一次性读入内存）；文件以 [ 开头时按 JSON 数组读取
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        单条数据的迭代器
+    """
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("["):
+                yield from iter_payloads(line + f.read())
+                return
+            yield line
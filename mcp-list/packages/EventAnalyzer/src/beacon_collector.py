@@ -0,0 +1,503 @@
+"""Beacon Collector
+HTTP 模式下接收测试设备直接上报的埋点（把 SDK 的上报地址指向 /collect），异步校验，
+并按事件统计最近一段时间的问题
+
+- 上报请求只做解析和入队，立即返回；队列满时返回 429（Retry-After），由 SDK 重试
+- 后台任务成批取出数据，在线程中解码、获取定义和校验，不阻塞事件循环
+- 每个事件的统计保存在环形缓冲区中：固定个数的时间桶（默认 10 秒一个，保留 1 小时），
+  桶在第一次写入时才创建，过期的桶在下次写入时直接复用；查询最近 N 分钟只需合并
+  N 分钟对应的桶，与上报量无关，内存也不随上报量增长
+- 获取不到定义的事件（拼错的、乱填的事件名）不单独统计，归入 UNKNOWN_EVENT；
+  获取失败的结果缓存一段时间，不会每条上报都请求一次上游。超过保留时长没有上报的事件被清除
+"""
+
+import asyncio
+import base64
+import gzip
+import json
+import math
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from src.utils.base64_decoder import Base64Decoder
+from src.utils.sketches import SpaceSaving
+
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_BUCKET_SECONDS = 10
+DEFAULT_WINDOW_SECONDS = 3600
+DEFAULT_MAX_BODY = 1024 * 1024
+
+# 每次从队列取出后一起校验的最多条数
+BATCH_SIZE = 256
+# 每个时间桶跟踪的（问题类型, 字段）个数
+FIELD_CAPACITY = 32
+# 每个事件保留的最近问题示例条数
+RECENT_EXAMPLES = 5
+# 最多统计的事件数，超出的归入 OTHER_EVENT（避免乱填的事件名撑大内存）
+MAX_EVENTS = 1000
+# 获取定义失败后多久再重试（秒），期间该事件的上报直接归入 UNKNOWN_EVENT
+DEFINITION_RETRY_SECONDS = 300
+# 记住的获取失败的事件数 / status() 中列出的失败原因数
+MAX_FAILED_EVENTS = 10000
+MAX_DEFINITION_ERRORS = 50
+
+UNKNOWN_EVENT = "(unknown)"
+OTHER_EVENT = "(other)"
+_KEY_SEPARATOR = "\x1f"
+
+# 1x1 透明 GIF（SDK 用图片方式上报时的响应）
+_PIXEL = base64.b64decode("R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7")
+
+
+def decode_beacon(raw: str, compressed: bool = False) -> List[Dict[str, Any]]:
+    """
+    解码一次上报的数据（可能是一条，也可能是数组）
+
+    Args:
+        raw: URL 编码 + Base64 字符串或 JSON 字符串
+        compressed: 是否 gzip 压缩后再 Base64 编码（神策 SDK 的 gzip=1）
+
+    Returns:
+        埋点数据列表
+
+    Raises:
+        ValueError: 解码失败
+    """
+    if compressed:
+        try:
+            data = json.loads(gzip.decompress(base64.b64decode(raw)).decode("utf-8"))
+        except Exception as e:
+            raise ValueError(f"解码失败: {str(e)}")
+    else:
+        data = Base64Decoder.decode_flexible(raw)
+    items = data if isinstance(data, list) else [data]
+    return [item for item in items if isinstance(item, dict)]
+
+
+class _Bucket:
+    """一个时间桶内单个事件的计数"""
+
+    __slots__ = ("epoch", "received", "checked", "error_payloads", "issue_payloads",
+                 "issue_types", "fields")
+
+    def __init__(self):
+        self.reset(-1)
+
+    def reset(self, epoch: int):
+        self.epoch = epoch
+        self.received = 0
+        self.checked = 0
+        self.error_payloads = 0
+        self.issue_payloads = 0
+        self.issue_types: Dict[str, int] = {}
+        # (问题类型, 字段) 出现最多的若干个，固定内存
+        self.fields: Optional[SpaceSaving] = None
+
+
+class _EventWindow:
+    """单个事件的环形缓冲区（桶在第一次写入时创建）"""
+
+    __slots__ = ("size", "buckets", "latest", "recent")
+
+    def __init__(self, size: int):
+        self.size = size
+        # 槽位 (epoch % size) -> 桶
+        self.buckets: Dict[int, _Bucket] = {}
+        # 最近写入的时间桶编号
+        self.latest = -1
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=RECENT_EXAMPLES)
+
+    def bucket(self, epoch: int) -> _Bucket:
+        slot = epoch % self.size
+        bucket = self.buckets.get(slot)
+        if bucket is None:
+            bucket = self.buckets[slot] = _Bucket()
+        if bucket.epoch != epoch:
+            bucket.reset(epoch)
+        if epoch > self.latest:
+            self.latest = epoch
+        return bucket
+
+    def get(self, epoch: int) -> Optional[_Bucket]:
+        """该时间桶的计数（没有数据时为 None）"""
+        bucket = self.buckets.get(epoch % self.size)
+        if bucket is None or bucket.epoch != epoch:
+            return None
+        return bucket
+
+
+class BeaconCollector:
+    """埋点上报收集器"""
+
+    def __init__(
+        self,
+        get_event_analyzer: Callable[[], Any],
+        get_fields: Callable[[str], Dict[str, Any]],
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        bucket_seconds: int = DEFAULT_BUCKET_SECONDS,
+        window_seconds: int = DEFAULT_WINDOW_SECONDS
+    ):
+        """
+        初始化收集器
+
+        Args:
+            get_event_analyzer: 返回 EventAnalyzer 的函数（第一次校验时才调用）
+            get_fields: 获取事件字段定义的函数
+            queue_size: 待校验队列长度上限
+            bucket_seconds: 时间桶长度（秒）
+            window_seconds: 保留的统计时长（秒）
+        """
+        self.get_event_analyzer = get_event_analyzer
+        self.get_fields = get_fields
+        self.queue_size = queue_size
+        self.bucket_seconds = max(int(bucket_seconds), 1)
+        self.window_seconds = max(int(window_seconds), self.bucket_seconds)
+        self._size = math.ceil(self.window_seconds / self.bucket_seconds)
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._windows: Dict[str, _EventWindow] = {}
+        self._lock = threading.Lock()
+        self._started_at = time.time()
+
+        self.accepted = 0
+        self.rejected = 0
+        self.processed = 0
+        self.decode_errors = 0
+        # 获取定义失败的事件 -> 失败时间（在 DEFINITION_RETRY_SECONDS 内不再重试）
+        self._failed: "OrderedDict[str, float]" = OrderedDict()
+        # 最近的失败原因（最多 MAX_DEFINITION_ERRORS 个事件）
+        self.definition_errors: "OrderedDict[str, str]" = OrderedDict()
+        self.definition_error_count = 0
+        # 上次清除过期事件时的时间桶编号
+        self._swept_epoch = 0
+
+    # ---------------------------------------------------------------- 入队
+
+    def submit(self, items: List[Tuple[str, bool]]) -> bool:
+        """
+        提交一次请求中的上报数据（在事件循环中调用，不等待校验）
+
+        全部入队或全部拒绝：部分入队后返回 429，SDK 重试时会重复上报
+
+        Args:
+            items: [(上报的数据, 是否 gzip 压缩)]
+
+        Returns:
+            是否已入队；队列放不下时返回 False（调用方应返回 429）
+        """
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._consume())
+        if self._queue.maxsize - self._queue.qsize() < len(items):
+            self.rejected += len(items)
+            return False
+        received_at = time.time()
+        for raw, compressed in items:
+            self._queue.put_nowait((received_at, raw, compressed))
+        self.accepted += len(items)
+        return True
+
+    async def _consume(self):
+        """后台任务：成批取出数据，在线程中校验"""
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < BATCH_SIZE and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await asyncio.to_thread(self._process, batch)
+            except Exception as e:
+                # 单批失败不影响后续上报
+                print(f"校验上报数据失败: {str(e)}", file=sys.stderr)
+
+    # ---------------------------------------------------------------- 校验
+
+    def _process(self, batch: List[Tuple[float, str, bool]]):
+        analyzer = self.get_event_analyzer()
+        for received_at, raw, compressed in batch:
+            try:
+                payloads = decode_beacon(raw, compressed)
+            except ValueError:
+                self.decode_errors += 1
+                continue
+            epoch = int(received_at // self.bucket_seconds)
+            if epoch > self._swept_epoch:
+                self._evict_expired(epoch)
+            for payload in payloads:
+                self._check(analyzer, payload, epoch, received_at)
+            self.processed += 1
+
+    def _check(self, analyzer, payload: Dict[str, Any], epoch: int, received_at: float):
+        event = payload.get("event")
+        if not isinstance(event, str) or not event:
+            event = UNKNOWN_EVENT
+        result = None
+        if event != UNKNOWN_EVENT:
+            fields = self._fields(event, received_at)
+            if fields:
+                result = analyzer.analyze(payload, fields, event=event)
+            else:
+                # 没有定义的事件不单独开窗口，避免乱填的事件名占满 MAX_EVENTS
+                event = UNKNOWN_EVENT
+
+        with self._lock:
+            window = self._window(event)
+            bucket = window.bucket(epoch)
+            bucket.received += 1
+            if result is None:
+                return
+            bucket.checked += 1
+            issues = result["issues"]
+            if not issues:
+                return
+            bucket.issue_payloads += 1
+            if result["status"] == "error":
+                bucket.error_payloads += 1
+            for issue_type in {issue["type"] for issue in issues}:
+                bucket.issue_types[issue_type] = bucket.issue_types.get(issue_type, 0) + 1
+            if bucket.fields is None:
+                bucket.fields = SpaceSaving(FIELD_CAPACITY)
+            for issue in issues:
+                bucket.fields.add(issue["type"] + _KEY_SEPARATOR + issue.get("field", ""))
+            window.recent.append({
+                "time": received_at,
+                "issues": [
+                    {key: issue[key] for key in ("type", "field", "message", "suggestions") if key in issue}
+                    for issue in issues
+                ],
+                "payload": payload,
+            })
+
+    def _fields(self, event: str, now: float) -> Optional[Dict[str, Any]]:
+        """
+        获取字段定义；失败的事件在 DEFINITION_RETRY_SECONDS 内直接返回 None，不再请求上游
+
+        Args:
+            event: 事件名称
+            now: 当前时间
+
+        Returns:
+            字段定义，获取失败或没有定义时为 None
+        """
+        failed_at = self._failed.get(event)
+        if failed_at is not None:
+            if now - failed_at < DEFINITION_RETRY_SECONDS:
+                return None
+            del self._failed[event]
+        try:
+            fields = self.get_fields(event)
+            error = None if fields else "没有字段定义"
+        except Exception as e:
+            fields, error = None, str(e)
+        if error is None:
+            return fields
+
+        self._failed[event] = now
+        while len(self._failed) > MAX_FAILED_EVENTS:
+            self._failed.popitem(last=False)
+        with self._lock:
+            self.definition_error_count += 1
+            self.definition_errors.pop(event, None)
+            self.definition_errors[event] = error
+            while len(self.definition_errors) > MAX_DEFINITION_ERRORS:
+                self.definition_errors.popitem(last=False)
+        return None
+
+    def _window(self, event: str) -> _EventWindow:
+        window = self._windows.get(event)
+        if window is None:
+            if len(self._windows) >= MAX_EVENTS:
+                event = OTHER_EVENT
+                window = self._windows.get(event)
+            if window is None:
+                window = self._windows[event] = _EventWindow(self._size)
+        return window
+
+    def _evict_expired(self, epoch: int):
+        """清除最近一个桶已超出保留时长的事件（每个时间桶最多检查一次）"""
+        self._swept_epoch = epoch
+        with self._lock:
+            expired = [name for name, window in self._windows.items() if window.latest <= epoch - self._size]
+            for name in expired:
+                del self._windows[name]
+
+    # ---------------------------------------------------------------- 查询
+
+    def recent_issues(self, minutes: float = 5, event: Optional[str] = None, top: int = 10) -> Dict[str, Any]:
+        """
+        最近一段时间的问题统计（只合并对应的时间桶，开销与上报量无关）
+
+        Args:
+            minutes: 统计最近多少分钟（不超过保留时长）
+            event: 只看该事件（可选）
+            top: 每个事件列出的问题最多的字段数
+
+        Returns:
+            按出错数据量排序的事件列表和收集器状态
+        """
+        now_epoch = int(time.time() // self.bucket_seconds)
+        count = min(max(math.ceil(minutes * 60 / self.bucket_seconds), 1), self._size)
+        epochs = range(now_epoch - count + 1, now_epoch + 1)
+
+        events = []
+        with self._lock:
+            names = [event] if event else list(self._windows)
+            for name in names:
+                window = self._windows.get(name)
+                if window is None:
+                    continue
+                summary = dict(event=name, **self._summarize(window, epochs, top))
+                if summary["received"]:
+                    events.append(summary)
+
+        events.sort(key=lambda e: (-e["error_payloads"], -e["issue_payloads"], -e["received"]))
+        return {
+            "minutes": round(count * self.bucket_seconds / 60, 2),
+            "total_received": sum(e["received"] for e in events),
+            "total_error_payloads": sum(e["error_payloads"] for e in events),
+            "events": events,
+            "collector": self.status(),
+        }
+
+    def _summarize(self, window: _EventWindow, epochs: range, top: int) -> Dict[str, Any]:
+        received = checked = error_payloads = issue_payloads = 0
+        issue_types: Dict[str, int] = {}
+        fields = SpaceSaving(FIELD_CAPACITY)
+        for epoch in epochs:
+            bucket = window.get(epoch)
+            if bucket is None:
+                continue
+            received += bucket.received
+            checked += bucket.checked
+            error_payloads += bucket.error_payloads
+            issue_payloads += bucket.issue_payloads
+            for issue_type, n in bucket.issue_types.items():
+                issue_types[issue_type] = issue_types.get(issue_type, 0) + n
+            if bucket.fields is not None:
+                fields.merge(bucket.fields)
+
+        since = epochs.start * self.bucket_seconds
+        return {
+            "received": received,
+            "checked": checked,
+            "error_payloads": error_payloads,
+            "issue_payloads": issue_payloads,
+            "error_rate": round(error_payloads / checked, 4) if checked else 0.0,
+            "issue_types": dict(sorted(issue_types.items(), key=lambda item: -item[1])),
+            "top_fields": [
+                dict(zip(("type", "field"), key.split(_KEY_SEPARATOR, 1)), count=n)
+                for key, n, _ in fields.top(top)
+            ],
+            "recent_examples": [example for example in window.recent if example["time"] >= since],
+        }
+
+    def status(self) -> Dict[str, Any]:
+        """收集器状态：队列长度、入队/拒绝/已校验的上报条数"""
+        with self._lock:
+            definition_errors = dict(self.definition_errors)
+            tracked_events = len(self._windows)
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "queue_size": self.queue_size,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "processed": self.processed,
+            "decode_errors": self.decode_errors,
+            "definition_error_count": self.definition_error_count,
+            "definition_errors": definition_errors,
+            "tracked_events": tracked_events,
+            "bucket_seconds": self.bucket_seconds,
+            "window_seconds": self.window_seconds,
+            "uptime_s": round(time.time() - self._started_at, 1),
+        }
+
+
+def create_collect_endpoint(collector: BeaconCollector, max_body: int = DEFAULT_MAX_BODY):
+    """
+    上报接口（Starlette 路由处理函数）
+
+    支持神策等 SDK 的常见格式：
+    - GET ?data=<Base64>（图片方式）
+    - POST 表单 data=<Base64> 或 data_list=<Base64 数组>，gzip=1 表示先 gzip 压缩
+    - POST JSON 对象 / 数组，或每行一条的文本
+
+    Returns:
+        async 处理函数
+    """
+    from urllib.parse import parse_qs
+
+    from starlette.requests import Request
+    from starlette.responses import Response
+
+    cors = {"Access-Control-Allow-Origin": "*"}
+
+    async def handle_collect(request: Request) -> Response:
+        if request.method == "OPTIONS":
+            return Response(status_code=204, headers=dict(cors, **{
+                "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
+                "Access-Control-Allow-Headers": "Content-Type",
+            }))
+
+        if request.method == "GET":
+            params = {key: [value] for key, value in request.query_params.items()}
+            items = form_items(params)
+        else:
+            body = await request.body()
+            if len(body) > max_body:
+                return Response("payload too large", status_code=413, headers=cors)
+            text = body.decode("utf-8", "replace")
+            content_type = request.headers.get("content-type", "")
+            if "form-urlencoded" in content_type or text.startswith(("data=", "data_list=")):
+                items = form_items(parse_qs(text))
+            elif text.lstrip().startswith("[") or (text.lstrip().startswith("{") and "\n{" not in text):
+                # JSON 数组或单个（可能带缩进的）JSON 对象
+                items = [(text, False)]
+            else:
+                items = [(line.strip(), False) for line in text.splitlines() if line.strip()]
+
+        if not items:
+            return Response("missing data", status_code=400, headers=cors)
+        if not collector.submit(items):
+            return Response("busy", status_code=429, headers=dict(cors, **{"Retry-After": "1"}))
+
+        if request.method == "GET":
+            return Response(_PIXEL, media_type="image/gif", headers=cors)
+        return Response("ok", media_type="text/plain", headers=cors)
+
+    return handle_collect
+
+
+def form_items(params: Dict[str, List[str]]) -> List[Tuple[str, bool]]:
+    """
+    从查询参数 / 表单中取出上报数据（data、data_list，gzip=1 表示压缩）
+
+    Args:
+        params: {参数名: [值]}（parse_qs 的结果）
+
+    Returns:
+        [(上报的数据, 是否 gzip 压缩)]
+    """
+    compressed = params.get("gzip", ["0"])[0] == "1"
+    return [
+        (value, compressed)
+        for key in ("data", "data_list")
+        for value in params.get(key, [])
+        if value
+    ]
+
+
+def collector_settings() -> Dict[str, Any]:
+    """从环境变量读取收集器配置"""
+    return {
+        "enabled": os.getenv("COLLECTOR_ENABLED", "false").lower() in ("1", "true", "yes"),
+        "path": os.getenv("COLLECTOR_PATH", "/collect"),
+        "queue_size": int(os.getenv("COLLECTOR_QUEUE_SIZE", str(DEFAULT_QUEUE_SIZE))),
+        "bucket_seconds": int(os.getenv("COLLECTOR_BUCKET_SECONDS", str(DEFAULT_BUCKET_SECONDS))),
+        "window_seconds": int(os.getenv("COLLECTOR_WINDOW_SECONDS", str(DEFAULT_WINDOW_SECONDS))),
+        "max_body": int(os.getenv("COLLECTOR_MAX_BODY", str(DEFAULT_MAX_BODY))),
+    }
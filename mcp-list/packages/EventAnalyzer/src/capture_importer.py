@@ -0,0 +1,365 @@
+"""Capture Importer
+从抓包文件（HAR、Charles .chlsj、mitmproxy 流量文件）中流式提取埋点请求并分析
+
+抓包文件动辄几百 MB（大部分是响应内容），这里从不整体读入：
+- HAR / Charles 是 JSON，按请求逐条解析（安装了 ijson 时使用 ijson，否则按块读取、用
+  json.JSONDecoder.raw_decode 逐个解析数组元素），内存只与单条请求的大小有关
+- mitmproxy 流量文件是逐条拼接的 tnetstring，逐条读取
+- URL 匹配埋点上报地址的请求，取出其中的上报数据（与 /collect 接口相同的格式），
+  解码后交给 BatchAnalyzer 按事件汇总
+"""
+
+import base64
+import json
+import re
+from typing import Any, Dict, IO, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from src.batch_analyzer import BatchAnalyzer
+from src.beacon_collector import decode_beacon, form_items
+
+try:
+    import ijson
+except ImportError:  # 可选依赖
+    ijson = None
+
+# 默认的埋点上报地址（正则，匹配完整 URL）：神策 /sa、/sa.gif，以及常见的 /collect、/track
+DEFAULT_URL_PATTERNS = (
+    r"/sa(\.gif)?(\?|$)",
+    r"sensorsdata",
+    r"/collect(\?|$)",
+    r"/track(\?|$)",
+)
+
+# 未标明 Content-Type 的表单请求体（Base64 末尾的 = 不能当作表单判断依据）
+FORM_BODY = re.compile(r"(\w+=[^&]*&)*(data|data_list)=")
+
+FORMATS = ("har", "charles", "mitmproxy")
+
+CHUNK_SIZE = 1 << 20
+
+# 一条请求：方法、URL、请求体、Content-Type
+CapturedRequest = Dict[str, str]
+
+
+class _JSONArrayReader:
+    """
+    按块读取 JSON 文本，逐个解析某个数组的元素
+
+    只保留当前元素所在的一段缓冲区；单个元素超过缓冲区时按倍数扩大读取量。
+    """
+
+    def __init__(self, f: IO[str], chunk_size: int = CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self, size: int) -> bool:
+        """再读入 size 个字符，顺便丢弃已解析的部分；文件读完时返回 False"""
+        if self.eof:
+            return False
+        chunk = self.f.read(size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def seek_array(self, key: Optional[str]) -> bool:
+        """
+        定位到数组开头
+
+        Args:
+            key: 数组所在的键（如 HAR 的 "entries"），None 表示第一个 [
+
+        Returns:
+            是否找到
+        """
+        pattern = re.compile(r'"%s"\s*:\s*\[' % re.escape(key) if key else r"\[")
+        while True:
+            match = pattern.search(self.buffer, self.pos)
+            if match:
+                self.pos = match.end()
+                return True
+            # 保留末尾一小段，避免键名被块边界截断
+            self.pos = max(self.pos, len(self.buffer) - 64)
+            if not self._fill(self.chunk_size):
+                return False
+
+    def items(self) -> Iterator[Any]:
+        """逐个解析数组元素，直到数组结束"""
+        whitespace = re.compile(r"[\s,]*")
+        read_size = self.chunk_size
+        while True:
+            self.pos = whitespace.match(self.buffer, self.pos).end()
+            if self.pos >= len(self.buffer):
+                if not self._fill(self.chunk_size):
+                    raise ValueError("抓包文件不完整：数组没有结束")
+                continue
+            if self.buffer[self.pos] == "]":
+                return
+            try:
+                item, end = self._decoder.raw_decode(self.buffer, self.pos)
+                complete = end < len(self.buffer) or self.eof
+            except json.JSONDecodeError:
+                complete = False
+                if self.eof:
+                    raise ValueError(f"抓包文件格式错误（第 {self.pos} 个字符附近）")
+            if not complete:
+                # 元素没读完整：扩大读取量再试
+                self._fill(read_size)
+                read_size *= 2
+                continue
+            read_size = self.chunk_size
+            self.pos = end
+            yield item
+
+
+def iter_json_array(f: IO, key: Optional[str], ijson_prefix: str) -> Iterator[Any]:
+    """
+    流式读取 JSON 文件中的数组元素
+
+    Args:
+        f: 以二进制方式打开的文件
+        key: 数组所在的键（内置解析器使用）
+        ijson_prefix: ijson 的路径前缀（如 "log.entries.item"）
+
+    Returns:
+        数组元素的迭代器
+    """
+    if ijson is not None:
+        yield from ijson.items(f, ijson_prefix, use_float=True)
+        return
+
+    import io
+
+    reader = _JSONArrayReader(io.TextIOWrapper(f, encoding="utf-8", errors="replace"))
+    if reader.seek_array(key):
+        yield from reader.items()
+
+
+def _har_request(entry: Dict[str, Any]) -> CapturedRequest:
+    request = entry.get("request") or {}
+    post_data = request.get("postData") or {}
+    body = post_data.get("text") or ""
+    if not body and post_data.get("params"):
+        body = "&".join(f"{p.get('name')}={p.get('value', '')}" for p in post_data["params"])
+    return {
+        "method": request.get("method", "GET"),
+        "url": request.get("url", ""),
+        "body": body,
+        "content_type": post_data.get("mimeType", ""),
+    }
+
+
+def _charles_request(entry: Dict[str, Any]) -> CapturedRequest:
+    url = f"{entry.get('scheme', 'http')}://{entry.get('host', '')}{entry.get('path', '')}"
+    if entry.get("query"):
+        url += "?" + entry["query"]
+    request = entry.get("request") or {}
+    body_info = request.get("body") or {}
+    body = body_info.get("text") or ""
+    if not body and body_info.get("encoded"):
+        body = base64.b64decode(body_info["encoded"]).decode("utf-8", "replace")
+    return {
+        "method": entry.get("method", "GET"),
+        "url": url,
+        "body": body,
+        "content_type": request.get("mimeType") or "",
+    }
+
+
+def iter_json_requests(path: str, fmt: str) -> Iterator[CapturedRequest]:
+    """逐条读取 HAR / Charles 抓包中的请求"""
+    with open(path, "rb") as f:
+        if fmt == "har":
+            for entry in iter_json_array(f, "entries", "log.entries.item"):
+                yield _har_request(entry)
+        else:
+            for entry in iter_json_array(f, None, "item"):
+                yield _charles_request(entry)
+
+
+# ---------------------------------------------------------------- mitmproxy
+
+def _parse_tnetstring(data: bytes, pos: int = 0) -> Tuple[Any, int]:
+    """解析 data[pos:] 开头的一个 tnetstring，返回 (值, 结束位置)"""
+    colon = data.index(b":", pos)
+    length = int(data[pos:colon])
+    start = colon + 1
+    end = start + length
+    payload, kind = data[start:end], data[end:end + 1]
+    if kind == b",":
+        value: Any = payload
+    elif kind == b";":
+        value = payload.decode("utf-8", "replace")
+    elif kind == b"#":
+        value = int(payload)
+    elif kind == b"^":
+        value = float(payload)
+    elif kind == b"!":
+        value = payload == b"true"
+    elif kind == b"~":
+        value = None
+    elif kind == b"]":
+        value = []
+        i = start
+        while i < end:
+            item, i = _parse_tnetstring(data, i)
+            value.append(item)
+    elif kind == b"}":
+        value = {}
+        i = start
+        while i < end:
+            name, i = _parse_tnetstring(data, i)
+            item, i = _parse_tnetstring(data, i)
+            value[name.decode("utf-8", "replace") if isinstance(name, bytes) else name] = item
+    else:
+        raise ValueError(f"未知的 tnetstring 类型: {kind!r}")
+    return value, end + 1
+
+
+def _text(value: Any) -> str:
+    if isinstance(value, bytes):
+        return value.decode("utf-8", "replace")
+    return "" if value is None else str(value)
+
+
+def iter_mitmproxy_requests(path: str) -> Iterator[CapturedRequest]:
+    """逐条读取 mitmproxy 流量文件（mitmdump -w 的输出）中的 HTTP 请求"""
+    with open(path, "rb") as f:
+        while True:
+            prefix = b""
+            while True:
+                char = f.read(1)
+                if not char:
+                    if prefix.strip():
+                        raise ValueError("mitmproxy 流量文件不完整")
+                    return
+                if char == b":":
+                    break
+                prefix += char
+            length = int(prefix)
+            data = prefix + b":" + f.read(length + 1)
+            flow, _ = _parse_tnetstring(data)
+            request = flow.get("request") if isinstance(flow, dict) else None
+            if not request:
+                continue
+            headers = {
+                _text(name).lower(): _text(value)
+                for name, value in (request.get("headers") or [])
+            }
+            scheme = _text(request.get("scheme")) or "http"
+            host = _text(request.get("host"))
+            port = request.get("port")
+            netloc = host if port in (None, 80, 443) else f"{host}:{port}"
+            yield {
+                "method": _text(request.get("method")) or "GET",
+                "url": f"{scheme}://{netloc}{_text(request.get('path'))}",
+                "body": _text(request.get("content")),
+                "content_type": headers.get("content-type", ""),
+            }
+
+
+# ---------------------------------------------------------------- 提取与分析
+
+def detect_format(path: str) -> str:
+    """根据扩展名或文件开头判断抓包格式"""
+    lower = path.lower()
+    if lower.endswith(".har"):
+        return "har"
+    if lower.endswith((".chlsj", ".chls.json")):
+        return "charles"
+    if lower.endswith((".mitm", ".flow", ".flows", ".dump")):
+        return "mitmproxy"
+    with open(path, "rb") as f:
+        head = f.read(256).lstrip(b"\xef\xbb\xbf \t\r\n")
+    if head.startswith(b"{"):
+        return "har"
+    if head.startswith(b"["):
+        return "charles"
+    if head[:1].isdigit():
+        return "mitmproxy"
+    raise ValueError(f"无法识别抓包格式: {path}")
+
+
+def iter_requests(path: str, fmt: str = "auto") -> Iterator[CapturedRequest]:
+    """逐条读取抓包中的请求"""
+    if fmt == "auto":
+        fmt = detect_format(path)
+    if fmt not in FORMATS:
+        raise ValueError(f"不支持的抓包格式: {fmt}，可选: {', '.join(FORMATS)}")
+    if fmt == "mitmproxy":
+        return iter_mitmproxy_requests(path)
+    return iter_json_requests(path, fmt)
+
+
+def extract_beacons(request: CapturedRequest) -> List[Tuple[str, bool]]:
+    """
+    取出一条请求中的上报数据
+
+    Args:
+        request: 抓包中的请求
+
+    Returns:
+        [(上报的数据, 是否 gzip 压缩)]
+    """
+    items = form_items(parse_qs(urlsplit(request["url"]).query))
+    body = request.get("body") or ""
+    if body:
+        stripped = body.lstrip()
+        if stripped.startswith(("{", "[")):
+            items.append((body, False))
+        elif "form-urlencoded" in request.get("content_type", "") or FORM_BODY.match(body):
+            items.extend(form_items(parse_qs(body)))
+        else:
+            items.extend((line.strip(), False) for line in body.splitlines() if line.strip())
+    return items
+
+
+def import_capture(
+    path: str,
+    batch: BatchAnalyzer,
+    fmt: str = "auto",
+    url_patterns: Sequence[str] = DEFAULT_URL_PATTERNS
+) -> Dict[str, Any]:
+    """
+    流式分析抓包文件中的埋点请求
+
+    Args:
+        path: 抓包文件路径
+        batch: 汇总结果的 BatchAnalyzer
+        fmt: 抓包格式（auto / har / charles / mitmproxy）
+        url_patterns: 埋点上报地址的正则（匹配任意一个即可）
+
+    Returns:
+        BatchAnalyzer 的报告，附带抓包统计（capture）
+    """
+    patterns = [re.compile(p) for p in url_patterns]
+    stats = {"requests": 0, "matched_requests": 0, "beacons": 0, "decode_errors": 0, "hosts": {}}
+
+    for request in iter_requests(path, fmt):
+        stats["requests"] += 1
+        url = request["url"]
+        if not any(p.search(url) for p in patterns):
+            continue
+        stats["matched_requests"] += 1
+        host = urlsplit(url).netloc
+        stats["hosts"][host] = stats["hosts"].get(host, 0) + 1
+        for raw, compressed in extract_beacons(request):
+            try:
+                payloads = decode_beacon(raw, compressed)
+            except ValueError:
+                stats["decode_errors"] += 1
+                continue
+            for payload in payloads:
+                stats["beacons"] += 1
+                batch.feed(payload)
+
+    report = batch.report()
+    report["capture"] = dict(stats, path=path, parser="ijson" if ijson is not None else "builtin")
+    return report
@@ -1,11 +1,26 @@
 """Code Searcher
 在项目代码中搜索字段实现
+
+遍历项目时跳过（均可按次调用关闭或调整）：
+- .gitignore / .ignore / .git/info/exclude 忽略的文件和目录（规则编译后缓存，见 src/utils/ignore_rules.py）
+- 二进制文件（开头有 NUL 字节）和压缩后的代码（.min.js 或开头部分平均行长过长）
+- 超过大小上限的文件
+目录列表按目录修改时间缓存，重复搜索同一项目时只需 stat 每个目录。
+
+单个文件的搜索结果按 git blob 哈希缓存（LRU）：已提交且未修改的文件从 git ls-files -s 取得哈希，
+不用读取；修改过的和未跟踪的文件读取后按 git 的方式计算哈希。内容相同的文件在不同分支、
+worktree 和重复的搜索之间只扫描一次。只调用本地 git，不可用时退化为计算内容哈希。
 """
 
+import hashlib
 import os
 import re
-from pathlib import Path
-from typing import List, Dict, Any
+import subprocess
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Set, Tuple
+
+from src.utils.ignore_rules import IgnoreRules
 
 
 class CodeSearcher:
@@ -20,11 +35,57 @@ class CodeSearcher:
         'venv', 'vendor', '.next', '.nuxt', 'coverage'
     }
 
+    # 规则文件（同一目录中后面的优先）
+    IGNORE_FILES = ('.gitignore', '.ignore')
+
+    # 单个文件大小上限（字节）
+    DEFAULT_MAX_FILE_SIZE = 1024 * 1024
+
+    # 判断二进制 / 压缩代码时读取的开头部分
+    SNIFF_BYTES = 8192
+
+    # 开头部分的平均行长超过此值视为压缩代码
+    MINIFIED_LINE_LENGTH = 300
+
+    # 缓存的目录数上限
+    DIR_CACHE_SIZE = 200000
+
+    # 按 blob 缓存的单文件搜索结果数上限
+    RESULT_CACHE_SIZE = 100000
+
+    # git 命令超时（秒）
+    GIT_TIMEOUT = 30
+
+    def __init__(self, result_cache_size: int = RESULT_CACHE_SIZE):
+        """
+        初始化
+
+        Args:
+            result_cache_size: 按 blob 缓存的单文件搜索结果数上限，0 表示不缓存
+        """
+        # 目录 -> (修改时间, 子目录名, 文件名)
+        self._dir_cache: Dict[str, Tuple[int, List[str], List[str]]] = {}
+        # 规则文件 -> (修改时间, 编译后的规则)
+        self._rules_cache: Dict[str, Tuple[int, IgnoreRules]] = {}
+        # 搜索目录 -> git 索引文件路径（不在 git 仓库中时为 None）
+        self._index_paths: Dict[str, Optional[str]] = {}
+        # 搜索目录 -> (索引文件的修改时间和大小, {相对路径: blob 哈希})
+        self._index_cache: Dict[str, Tuple[Tuple[int, int], Dict[str, str]]] = {}
+        # (blob 哈希, 字段名, 跳过选项) -> (跳过原因, 匹配结果)
+        self.result_cache_size = result_cache_size
+        self._result_cache: "OrderedDict[tuple, Tuple[Optional[str], List[Dict[str, Any]]]]" = OrderedDict()
+        # 服务中多个搜索可能同时在线程中执行
+        self._cache_lock = threading.Lock()
+
     def find_field(
         self,
         field_name: str,
         project_path: str,
-        max_results: int = 50
+        max_results: int = 50,
+        respect_ignore: bool = True,
+        skip_binary: bool = True,
+        skip_minified: bool = True,
+        max_file_size: Optional[int] = DEFAULT_MAX_FILE_SIZE
     ) -> Dict[str, Any]:
         """
         在项目中搜索字段实现
@@ -33,6 +94,10 @@ class CodeSearcher:
             field_name: 字段名称
             project_path: 项目路径
             max_results: 最大结果数
+            respect_ignore: 是否跳过 .gitignore / .ignore 忽略的文件
+            skip_binary: 是否跳过二进制文件
+            skip_minified: 是否跳过压缩后的代码
+            max_file_size: 单个文件大小上限（字节），None 或 0 表示不限制
 
         Returns:
             搜索结果
@@ -46,23 +111,48 @@ class CodeSearcher:
             }
 
         matches = []
+        skipped = {'ignored': 0, 'too_large': 0, 'binary': 0, 'minified': 0}
+        cache_hits = 0
 
         # 搜索模式
         patterns = self._build_search_patterns(field_name)
+        options = (field_name, skip_binary, skip_minified, max_file_size or 0)
+
+        # 已提交且未修改的文件的 blob 哈希
+        root = os.path.abspath(project_path)
+        blobs, modified = self._git_blobs(root) if self.result_cache_size else ({}, set())
+        # SHA-256 格式的仓库（git init --object-format=sha256）哈希为 64 位
+        sha256 = any(len(blob) == 64 for blob in blobs.values())
 
         # 遍历项目文件
-        for file_path in self._iter_project_files(project_path):
+        for file_path in self._iter_project_files(project_path, respect_ignore, skipped):
             if len(matches) >= max_results:
                 break
 
-            file_matches = self._search_in_file(file_path, patterns, field_name)
-            matches.extend(file_matches)
+            if skip_minified and '.min.' in os.path.basename(file_path):
+                skipped['minified'] += 1
+                continue
+
+            relative = file_path[len(root) + 1:].replace(os.sep, '/')
+            blob = blobs.get(relative) if relative not in modified else None
+            scanned = self._scan_file(file_path, blob, options, patterns, sha256)
+            if scanned is None:
+                continue  # 读取失败
+
+            (reason, found), hit = scanned
+            cache_hits += hit
+            if reason is not None:
+                skipped[reason] += 1
+            else:
+                matches.extend({"file": file_path, **match} for match in found)
 
         return {
             "field": field_name,
             "found_locations": matches[:max_results],
             "total_matches": len(matches),
-            "truncated": len(matches) > max_results
+            "truncated": len(matches) > max_results,
+            "skipped_files": skipped,
+            "cache_hits": cache_hits
         }
 
     def _build_search_patterns(self, field_name: str) -> List[re.Pattern]:
@@ -94,65 +184,366 @@ class CodeSearcher:
 
         return patterns
 
-    def _iter_project_files(self, project_path: str):
+    def _iter_project_files(
+        self,
+        project_path: str,
+        respect_ignore: bool = True,
+        skipped: Optional[Dict[str, int]] = None
+    ):
         """
         迭代项目中的所有支持的文件
 
         Args:
             project_path: 项目路径
+            respect_ignore: 是否应用 .gitignore / .ignore 规则
+            skipped: 统计被规则忽略的文件和目录数（可选）
 
         Yields:
             文件路径
         """
-        for root, dirs, files in os.walk(project_path):
-            # 排除指定目录
-            dirs[:] = [d for d in dirs if d not in self.EXCLUDED_DIRS]
+        root = os.path.abspath(project_path)
+        # 栈中每项：(目录, 生效的规则 [(规则所在目录, 规则)]，越深的越靠后)
+        stack = [(root, self._parent_rules(root) if respect_ignore else [])]
+
+        while stack:
+            directory, rules = stack.pop()
+            dirs, files = self._list_dir(directory)
+
+            if respect_ignore:
+                own = [
+                    (directory, self._load_rules(os.path.join(directory, name)))
+                    for name in self.IGNORE_FILES if name in files
+                ]
+                if directory == root:
+                    exclude = os.path.join(root, '.git', 'info', 'exclude')
+                    if os.path.isfile(exclude):
+                        own.insert(0, (root, self._load_rules(exclude)))
+                own = [(base, r) for base, r in own if r]
+                if own:
+                    rules = rules + own
 
             for file in files:
-                if file.endswith(self.SUPPORTED_EXTENSIONS):
-                    yield os.path.join(root, file)
+                if not file.endswith(self.SUPPORTED_EXTENSIONS):
+                    continue
+                path = os.path.join(directory, file)
+                if rules and self._is_ignored(path, False, rules):
+                    if skipped is not None:
+                        skipped['ignored'] += 1
+                    continue
+                yield path
+
+            # 倒序入栈，保持与 os.walk 相同的遍历顺序
+            for name in reversed(dirs):
+                if name in self.EXCLUDED_DIRS:
+                    continue
+                path = os.path.join(directory, name)
+                if rules and self._is_ignored(path, True, rules):
+                    if skipped is not None:
+                        skipped['ignored'] += 1
+                    continue
+                stack.append((path, rules))
+
+    @staticmethod
+    def _is_ignored(path: str, is_dir: bool, rules: List[Tuple[str, IgnoreRules]]) -> bool:
+        """按规则判断路径是否被忽略（越深的规则文件优先）"""
+        for base, rule in reversed(rules):
+            relative = path[len(base) + 1:]
+            if os.sep != '/':
+                relative = relative.replace(os.sep, '/')
+            result = rule.match(relative, is_dir)
+            if result is not None:
+                return result
+        return False
+
+    def _parent_rules(self, root: str) -> List[Tuple[str, IgnoreRules]]:
+        """
+        搜索目录在 git 仓库的子目录中时，仓库根目录到搜索目录之间的规则同样生效
+
+        Args:
+            root: 搜索目录（绝对路径）
+
+        Returns:
+            [(规则所在目录, 规则)]，越深的越靠后
+        """
+        parents = []
+        directory = root
+        while True:
+            parent = os.path.dirname(directory)
+            if parent == directory or os.path.exists(os.path.join(directory, '.git')):
+                break
+            directory = parent
+            parents.append(directory)
+        if not parents or not os.path.exists(os.path.join(parents[-1], '.git')):
+            return []
+
+        rules = []
+        exclude = os.path.join(parents[-1], '.git', 'info', 'exclude')
+        if os.path.isfile(exclude):
+            rules.append((parents[-1], self._load_rules(exclude)))
+        for directory in reversed(parents):
+            for name in self.IGNORE_FILES:
+                path = os.path.join(directory, name)
+                if os.path.isfile(path):
+                    rules.append((directory, self._load_rules(path)))
+        return [(base, r) for base, r in rules if r]
+
+    def _list_dir(self, directory: str) -> Tuple[List[str], List[str]]:
+        """
+        列出目录（按目录修改时间缓存）
+
+        Args:
+            directory: 目录路径
+
+        Returns:
+            (子目录名, 文件名)，不跟随指向目录的符号链接
+        """
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            return [], []
+        cached = self._dir_cache.get(directory)
+        if cached is not None and cached[0] == mtime:
+            return cached[1], cached[2]
+
+        dirs, files = [], []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            dirs.append(entry.name)
+                        elif entry.is_file():
+                            files.append(entry.name)
+                    except OSError:
+                        continue
+        except OSError:
+            return [], []
+
+        if len(self._dir_cache) >= self.DIR_CACHE_SIZE:
+            self._dir_cache.clear()
+        self._dir_cache[directory] = (mtime, dirs, files)
+        return dirs, files
+
+    def _load_rules(self, path: str) -> IgnoreRules:
+        """读取并编译规则文件（按文件修改时间缓存）"""
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return IgnoreRules([])
+        cached = self._rules_cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        try:
+            rules = IgnoreRules.from_file(path)
+        except (OSError, re.error):
+            rules = IgnoreRules([])
+        self._rules_cache[path] = (mtime, rules)
+        return rules
 
-    def _search_in_file(
+    def _scan_file(
         self,
         file_path: str,
+        blob: Optional[str],
+        options: tuple,
         patterns: List[re.Pattern],
-        field_name: str
-    ) -> List[Dict[str, Any]]:
+        sha256: bool
+    ) -> Optional[Tuple[Tuple[Optional[str], List[Dict[str, Any]]], bool]]:
         """
-        在单个文件中搜索
+        搜索单个文件（先查 blob 缓存）
 
         Args:
             file_path: 文件路径
+            blob: 索引中的 blob 哈希（未知时为 None，读取后计算）
+            options: (字段名, skip_binary, skip_minified, max_file_size)
             patterns: 搜索模式列表
-            field_name: 字段名称
+            sha256: 仓库是否使用 SHA-256 哈希
 
         Returns:
-            匹配结果列表
+            ((跳过原因, 匹配结果), 是否命中缓存)，读取失败时为 None
         """
-        matches = []
+        cached = self._cache_get(blob, options)
+        if cached is not None:
+            return cached, True
+
+        _, skip_binary, skip_minified, max_file_size = options
+        reason, data = self._read_bytes(file_path, max_file_size)
+        if data is not None:
+            if blob is None and self.result_cache_size:
+                blob = self._hash_blob(data, sha256)
+                cached = self._cache_get(blob, options)
+                if cached is not None:
+                    return cached, True
+            reason = self._sniff(data, skip_binary, skip_minified)
+        elif reason is None:
+            return None
+
+        found = self._search_in_lines(self._split_lines(data), patterns) if reason is None else []
+        self._cache_put(blob, options, (reason, found))
+        return (reason, found), False
+
+    def _git_blobs(self, root: str) -> Tuple[Dict[str, str], Set[str]]:
+        """
+        从 git 索引取得搜索目录下各文件的 blob 哈希
+
+        Args:
+            root: 搜索目录（绝对路径）
+
+        Returns:
+            ({相对路径: blob 哈希}, 工作区中修改过的文件)，不在 git 仓库中时都为空
+        """
+        if root not in self._index_paths:
+            output = self._git(root, 'rev-parse', '--git-path', 'index')
+            self._index_paths[root] = os.path.join(root, output.strip()) if output else None
+        index_path = self._index_paths[root]
+        if index_path is None:
+            return {}, set()
 
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                lines = f.readlines()
-
-            for line_num, line in enumerate(lines, 1):
-                for pattern in patterns:
-                    if pattern.search(line):
-                        # 获取上下文（前后各1行）
-                        context_lines = []
-                        for i in range(max(0, line_num - 2), min(len(lines), line_num + 1)):
-                            context_lines.append(lines[i].rstrip())
-
-                        matches.append({
-                            "file": file_path,
-                            "line": line_num,
-                            "code": line.strip(),
-                            "context": "\\n".join(context_lines)
-                        })
-                        break  # 每行只记录一次
-
-        except Exception as e:
-            # 忽略读取错误
-            pass
+            stat = os.stat(index_path)
+        except OSError:
+            return {}, set()
+        version = (stat.st_mtime_ns, stat.st_size)
+        cached = self._index_cache.get(root)
+        if cached is not None and cached[0] == version:
+            blobs = cached[1]
+        else:
+            output = self._git(root, 'ls-files', '-s', '-z')
+            if output is None:
+                return {}, set()
+            blobs = {}
+            for record in output.split('\0'):
+                # <mode> <哈希> <stage>\t<路径>
+                info, _, path = record.partition('\t')
+                parts = info.split(' ')
+                # 只要普通文件；跳过符号链接（120000）、子模块（160000）和冲突中的文件
+                if len(parts) == 3 and parts[2] == '0' and parts[0] in ('100644', '100755'):
+                    blobs[path] = parts[1]
+            self._index_cache[root] = (version, blobs)
+
+        # 工作区的修改不会更新索引，需要每次检查
+        output = self._git(root, 'ls-files', '-m', '-z')
+        if output is None:
+            return {}, set()
+        return blobs, set(filter(None, output.split('\0')))
+
+    def _git(self, root: str, *args: str) -> Optional[str]:
+        """在搜索目录中执行 git 命令，失败（未安装 git、不是仓库等）时返回 None"""
+        try:
+            result = subprocess.run(
+                ['git', '-C', root, *args],
+                capture_output=True,
+                timeout=self.GIT_TIMEOUT,
+                # 不刷新索引、不加锁，避免与用户的 git 操作冲突
+                env=dict(os.environ, GIT_OPTIONAL_LOCKS='0')
+            )
+        except (OSError, subprocess.SubprocessError):
+            return None
+        if result.returncode != 0:
+            return None
+        return result.stdout.decode('utf-8', errors='surrogateescape')
+
+    @staticmethod
+    def _hash_blob(data: bytes, sha256: bool = False) -> str:
+        """与 git hash-object 相同的 blob 哈希"""
+        digest = hashlib.sha256() if sha256 else hashlib.sha1()
+        digest.update(b'blob %d\0' % len(data))
+        digest.update(data)
+        return digest.hexdigest()
+
+    def _cache_get(self, blob: Optional[str], options: tuple):
+        if blob is None or not self.result_cache_size:
+            return None
+        key = (blob,) + options
+        with self._cache_lock:
+            cached = self._result_cache.get(key)
+            if cached is not None:
+                self._result_cache.move_to_end(key)
+        return cached
+
+    def _cache_put(self, blob: Optional[str], options: tuple, value):
+        if blob is None or not self.result_cache_size:
+            return
+        with self._cache_lock:
+            self._result_cache[(blob,) + options] = value
+            while len(self._result_cache) > self.result_cache_size:
+                self._result_cache.popitem(last=False)
+
+    @staticmethod
+    def _read_bytes(file_path: str, max_file_size: Optional[int]) -> Tuple[Optional[str], Optional[bytes]]:
+        """
+        读取文件内容
+
+        Args:
+            file_path: 文件路径
+            max_file_size: 文件大小上限（字节）
+
+        Returns:
+            (跳过原因, 内容)：超过大小上限时为 ('too_large', None)，读取失败时为 (None, None)
+        """
+        try:
+            with open(file_path, 'rb') as f:
+                if max_file_size and os.fstat(f.fileno()).st_size > max_file_size:
+                    return 'too_large', None
+                return None, f.read()
+        except OSError:
+            return None, None
+
+    def _sniff(self, data: bytes, skip_binary: bool, skip_minified: bool) -> Optional[str]:
+        """
+        根据开头部分判断是否为二进制文件或压缩后的代码
+
+        Returns:
+            跳过原因（'binary' / 'minified'），不需要跳过时为 None
+        """
+        head = data[:self.SNIFF_BYTES]
+        if skip_binary and b'\0' in head:
+            return 'binary'
+        if skip_minified and len(head) >= 2 * self.MINIFIED_LINE_LENGTH:
+            if len(head) / (head.count(b'\n') + 1) > self.MINIFIED_LINE_LENGTH:
+                return 'minified'
+        return None
+
+    @staticmethod
+    def _split_lines(data: bytes) -> List[str]:
+        """解码并按行拆分（与文本模式读取一致：CRLF 和 CR 都算换行）"""
+        text = data.decode('utf-8', errors='ignore')
+        if '\r' in text:
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
+        lines = text.split('\n')
+        if lines[-1] == '':
+            lines.pop()
+        return lines
+
+    def _search_in_lines(
+        self,
+        lines: List[str],
+        patterns: List[re.Pattern]
+    ) -> List[Dict[str, Any]]:
+        """
+        在单个文件的内容中搜索
+
+        Args:
+            lines: 文件各行
+            patterns: 搜索模式列表
+
+        Returns:
+            匹配结果列表（不含文件路径，同一内容的结果可用于多个文件）
+        """
+        matches = []
+
+        for line_num, line in enumerate(lines, 1):
+            for pattern in patterns:
+                if pattern.search(line):
+                    # 获取上下文（前后各1行）
+                    context_lines = []
+                    for i in range(max(0, line_num - 2), min(len(lines), line_num + 1)):
+                        context_lines.append(lines[i].rstrip())
+
+                    matches.append({
+                        "line": line_num,
+                        "code": line.strip(),
+                        "context": "\\n".join(context_lines)
+                    })
+                    break  # 每行只记录一次
 
         return matches
@@ -0,0 +1,240 @@
+"""Definition Snapshot
+事件字段定义的离线快照：导出为一个紧凑的二进制文件，启动时 mmap 打开，只解码用到的事件
+
+文件格式（整数均为小端）:
+    MAGIC (8 字节) | 索引长度 (uint32) | 索引 JSON | 各事件数据块
+索引: {"version": 1, "created_at": 时间戳, "source": 上游地址,
+       "events": {事件名称: [数据块偏移, 长度, 字段数]}}
+数据块: zlib 压缩的紧凑 JSON（字段定义字典），偏移相对于索引之后的数据区
+
+用法:
+    python -m src.definition_snapshot export data/definitions.snap --events LlwResExposure,LlwResDownBtnClick
+    python -m src.definition_snapshot import data/definitions.snap
+    python -m src.definition_snapshot info data/definitions.snap
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+MAGIC = b"EASNAP\x00\x01"
+SNAPSHOT_VERSION = 1
+DEFAULT_SNAPSHOT_PATH = str(Path(__file__).resolve().parent.parent / "data" / "definitions.snap")
+
+_HEADER = struct.Struct("<8sI")
+
+
+def write_snapshot(path: str, definitions: Dict[str, Dict[str, Any]], source: str = "") -> Dict[str, Any]:
+    """
+    把事件定义写入快照文件（先写临时文件再替换，读取中的进程不受影响）
+
+    Args:
+        path: 快照文件路径
+        definitions: {事件名称: 字段定义字典}
+        source: 定义来源（上游地址）
+
+    Returns:
+        快照信息（事件数、文件大小）
+    """
+    blobs = []
+    entries = {}
+    offset = 0
+    for event in sorted(definitions):
+        fields = definitions[event]
+        blob = zlib.compress(
+            json.dumps(fields, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6
+        )
+        blobs.append(blob)
+        entries[event] = [offset, len(blob), len(fields)]
+        offset += len(blob)
+
+    index = json.dumps({
+        "version": SNAPSHOT_VERSION,
+        "created_at": time.time(),
+        "source": source,
+        "events": entries,
+    }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, len(index)))
+        f.write(index)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp_path, path)
+
+    return {"path": path, "events": len(entries), "size_bytes": os.path.getsize(path)}
+
+
+class DefinitionSnapshot:
+    """
+    只读的定义快照
+
+    打开时只读取索引，get() 时才解压对应事件的数据块；文件通过 mmap 映射，
+    多个 worker 进程共享同一份页缓存。
+    """
+
+    def __init__(self, path: str):
+        """
+        打开快照文件
+
+        Args:
+            path: 快照文件路径
+
+        Raises:
+            ValueError: 文件格式不正确
+        """
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"快照文件为空: {path}")
+
+        if len(self._mmap) < _HEADER.size:
+            self.close()
+            raise ValueError(f"不是有效的定义快照: {path}")
+        magic, index_length = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"不是有效的定义快照: {path}")
+
+        self._data_start = _HEADER.size + index_length
+        index = json.loads(self._mmap[_HEADER.size:self._data_start].decode("utf-8"))
+        self.created_at: float = index.get("created_at", 0)
+        self.source: str = index.get("source", "")
+        self._events: Dict[str, List[int]] = index["events"]
+
+    def __contains__(self, event: str) -> bool:
+        return event in self._events
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def events(self) -> List[str]:
+        """快照中的事件名称"""
+        return list(self._events)
+
+    def get(self, event: str) -> Optional[Dict[str, Any]]:
+        """
+        解码单个事件的字段定义
+
+        Args:
+            event: 事件名称
+
+        Returns:
+            字段定义字典，快照中没有该事件时返回 None
+        """
+        entry = self._events.get(event)
+        if entry is None:
+            return None
+        offset, length, _ = entry
+        offset += self._data_start
+        return json.loads(zlib.decompress(self._mmap[offset:offset + length]).decode("utf-8"))
+
+    def info(self) -> Dict[str, Any]:
+        """快照概况"""
+        return {
+            "path": self.path,
+            "created_at": self.created_at,
+            "source": self.source,
+            "events": len(self._events),
+            "fields": sum(entry[2] for entry in self._events.values()),
+            "size_bytes": len(self._mmap),
+        }
+
+    def close(self):
+        if getattr(self, "_mmap", None) is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+
+def open_definition_snapshot() -> Optional[DefinitionSnapshot]:
+    """
+    根据环境变量打开快照
+
+    EVENT_SNAPSHOT_PATH 为快照路径；文件不存在时返回 None（离线模式下由调用方报错）
+    """
+    path = os.getenv("EVENT_SNAPSHOT_PATH")
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        return DefinitionSnapshot(path)
+    except ValueError as e:
+        print(f"忽略定义快照: {str(e)}", file=sys.stderr)
+        return None
+
+
+def collect_definitions(client, events: Iterable[str] = ()) -> Dict[str, Dict[str, Any]]:
+    """
+    收集要导出的定义：客户端已缓存的全部事件，加上额外指定的事件（未缓存时请求上游）
+
+    Args:
+        client: EventAPIClient
+        events: 额外导出的事件名称
+
+    Returns:
+        {事件名称: 字段定义字典}
+    """
+    definitions = client.cached_definitions()
+    for event in events:
+        if event and event not in definitions:
+            definitions[event] = client.get_event_fields(event)
+    return definitions
+
+
+def main(argv=None):
+    from src.api_client import EventAPIClient
+    from src.definition_store import DEFAULT_STORE_PATH, DefinitionStore
+
+    parser = argparse.ArgumentParser(description="导出/导入事件定义快照")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = sub.add_parser("export", help="导出已缓存的定义（和指定事件）到快照")
+    export_parser.add_argument("path", nargs="?", default=DEFAULT_SNAPSHOT_PATH)
+    export_parser.add_argument("--events", default="", help="额外导出的事件，逗号分隔")
+    export_parser.add_argument("--events-file", help="每行一个事件名称的文件")
+
+    import_parser = sub.add_parser("import", help="把快照写入共享缓存（EVENT_CACHE_PATH）")
+    import_parser.add_argument("path", nargs="?", default=DEFAULT_SNAPSHOT_PATH)
+
+    info_parser = sub.add_parser("info", help="查看快照内容")
+    info_parser.add_argument("path", nargs="?", default=DEFAULT_SNAPSHOT_PATH)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        os.environ.setdefault("EVENT_CACHE_PATH", DEFAULT_STORE_PATH)
+        client = EventAPIClient()
+        events = [e.strip() for e in args.events.split(",")]
+        if args.events_file:
+            with open(args.events_file, encoding="utf-8") as f:
+                events += [line.strip() for line in f]
+        definitions = collect_definitions(client, events)
+        result = write_snapshot(args.path, definitions, client.BASE_URL)
+    elif args.command == "import":
+        snapshot = DefinitionSnapshot(args.path)
+        store = DefinitionStore(os.getenv("EVENT_CACHE_PATH", DEFAULT_STORE_PATH))
+        for event in snapshot.events():
+            store.put(event, snapshot.get(event))
+        result = {"path": store.path, "events": len(snapshot)}
+    else:
+        snapshot = DefinitionSnapshot(args.path)
+        result = dict(snapshot.info(), event_names=snapshot.events())
+
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""Definition Store
+事件字段定义的本地共享缓存（SQLite），多个 worker 进程共用
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+DEFAULT_STORE_PATH = str(Path(__file__).resolve().parent.parent / "data" / "event_definitions.db")
+DEFAULT_TTL = 600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS event_definitions (
+    event TEXT PRIMARY KEY,
+    fields TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+"""
+
+
+class DefinitionStore:
+    """
+    事件字段定义的共享缓存
+
+    使用 SQLite WAL 模式，多个进程可以同时读写：
+    一个 worker 从 API 获取的定义，其他 worker 直接复用；worker 重启后缓存仍在。
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH, ttl: float = DEFAULT_TTL):
+        """
+        初始化共享缓存
+
+        Args:
+            path: SQLite 文件路径
+            ttl: 缓存有效期（秒）
+        """
+        self.path = path
+        self.ttl = ttl
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def get(self, event: str) -> Optional[Dict[str, Any]]:
+        """
+        读取未过期的字段定义
+
+        Args:
+            event: 事件名称
+
+        Returns:
+            字段定义字典，不存在或已过期返回 None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fields, fetched_at FROM event_definitions WHERE event = ?",
+                (event,)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return json.loads(row[0])
+
+    def put(self, event: str, fields: Dict[str, Any]):
+        """
+        写入字段定义
+
+        Args:
+            event: 事件名称
+            fields: 字段定义字典
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO event_definitions (event, fields, fetched_at) VALUES (?, ?, ?)",
+                (event, json.dumps(fields, ensure_ascii=False), time.time())
+            )
+            self._conn.commit()
+
+    def all(self) -> Dict[str, Dict[str, Any]]:
+        """
+        读取全部字段定义（包括已过期的，用于导出快照）
+
+        Returns:
+            {事件名称: 字段定义字典}
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT event, fields FROM event_definitions").fetchall()
+        return {event: json.loads(fields) for event, fields in rows}
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._conn.execute("DELETE FROM event_definitions")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_definition_store() -> Optional[DefinitionStore]:
+    """
+    根据环境变量打开共享缓存
+
+    设置 EVENT_CACHE_PATH 时启用（多 worker 模式会自动设置），
+    EVENT_CACHE_TTL 为有效期（秒）
+    """
+    path = os.getenv("EVENT_CACHE_PATH")
+    if not path:
+        return None
+    return DefinitionStore(path, float(os.getenv("EVENT_CACHE_TTL", str(DEFAULT_TTL))))
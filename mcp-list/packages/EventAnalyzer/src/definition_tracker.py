@@ -0,0 +1,291 @@
+"""Definition Tracker
+检测上游事件定义的变化（字段增删、类型变化、枚举值变化），记录到本地变更日志
+
+每次获取到字段定义时计算内容哈希，与上次看到的版本比较：
+- 进程内保存每个字段的哈希，发现变化时通知监听者（按字段失效编译好的校验规则）
+- 上次版本的哈希同时保存在 SQLite 中，多个 worker 或重启后只记录一次同一变化
+- 变化以 JSON Lines 追加写入变更日志（只追加，不修改）
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+DEFAULT_CHANGE_LOG = str(Path(__file__).resolve().parent.parent / "data" / "definition_changes.jsonl")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS definition_hashes (
+    event TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    fields TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+# 监听者：(事件名称, 变化的字段列表)
+ChangeListener = Callable[[str, List[str]], None]
+
+
+def _digest(data: Any) -> str:
+    text = json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _enum_keys(field_def: Dict[str, Any]) -> Optional[List[str]]:
+    """枚举值的 key 列表，没有枚举或 trans 无法解析时返回 None"""
+    trans = field_def.get("trans")
+    if not trans:
+        return None
+    try:
+        enum_values = json.loads(trans)
+    except (TypeError, ValueError):
+        return None
+    return sorted(enum_values) if isinstance(enum_values, dict) else None
+
+
+def summarize_fields(fields: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    计算每个字段的摘要（哈希、类型、枚举 key）
+
+    Args:
+        fields: 字段定义字典
+
+    Returns:
+        {字段名: {"hash", "type", "enum_keys"}}
+    """
+    return {
+        name: {
+            "hash": _digest(field_def),
+            "type": field_def.get("type"),
+            "enum_keys": _enum_keys(field_def),
+        }
+        for name, field_def in fields.items()
+    }
+
+
+def diff_fields(old: Dict[str, Dict[str, Any]], new: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    比较两个版本的字段摘要
+
+    Args:
+        old: 旧版本摘要（summarize_fields 的结果）
+        new: 新版本摘要
+
+    Returns:
+        变化列表，kind 为 field_added / field_removed / type_changed / enum_changed / text_changed
+    """
+    changes = []
+    for name in sorted(new.keys() - old.keys()):
+        changes.append({"kind": "field_added", "field": name, "type": new[name]["type"]})
+    for name in sorted(old.keys() - new.keys()):
+        changes.append({"kind": "field_removed", "field": name, "type": old[name]["type"]})
+
+    for name in sorted(old.keys() & new.keys()):
+        before, after = old[name], new[name]
+        if before["hash"] == after["hash"]:
+            continue
+        changed = False
+        if before["type"] != after["type"]:
+            changes.append({"kind": "type_changed", "field": name, "old": before["type"], "new": after["type"]})
+            changed = True
+        old_keys = set(before["enum_keys"] or [])
+        new_keys = set(after["enum_keys"] or [])
+        if old_keys != new_keys:
+            changes.append({
+                "kind": "enum_changed",
+                "field": name,
+                "added": sorted(new_keys - old_keys),
+                "removed": sorted(old_keys - new_keys),
+            })
+            changed = True
+        if not changed:
+            # 只有说明文字或枚举值含义变化
+            changes.append({"kind": "text_changed", "field": name})
+    return changes
+
+
+class DefinitionTracker:
+    """
+    事件定义变化追踪器
+
+    observe() 在每次拿到新的字段定义时调用；整体哈希不变时直接返回，开销很小。
+    """
+
+    def __init__(self, log_path: Optional[str] = DEFAULT_CHANGE_LOG):
+        """
+        初始化追踪器
+
+        Args:
+            log_path: 变更日志路径（JSON Lines），None 表示只在进程内比较、不落盘
+        """
+        self.log_path = log_path
+        self._known: Dict[str, str] = {}
+        self._summaries: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._listeners: List[ChangeListener] = []
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+        if log_path:
+            Path(log_path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(
+                str(Path(log_path).with_suffix(".db")), timeout=5.0,
+                check_same_thread=False, isolation_level=None
+            )
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+
+    def add_listener(self, listener: ChangeListener):
+        """注册变化监听者"""
+        self._listeners.append(listener)
+
+    def observe(self, event: str, fields: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        记录一次获取到的字段定义，返回相对上一版本的变化
+
+        Args:
+            event: 事件名称
+            fields: 字段定义字典
+
+        Returns:
+            变化列表（没有变化或首次看到该事件时为空）
+        """
+        event_hash = _digest(fields)
+        if self._known.get(event) == event_hash:
+            return []
+
+        with self._lock:
+            if self._known.get(event) == event_hash:
+                return []
+            summary = summarize_fields(fields)
+            previous = self._summaries.get(event)
+            if self._conn is not None:
+                try:
+                    persisted = self._record(event, event_hash, summary)
+                except (sqlite3.Error, OSError) as e:
+                    # 写日志失败不影响查询，进程内仍然比较并通知监听者
+                    print(f"记录定义变化失败: {str(e)}", file=sys.stderr)
+                    persisted = None
+                if previous is None:
+                    previous = persisted
+            changes = diff_fields(previous, summary) if previous is not None else []
+            self._known[event] = event_hash
+            self._summaries[event] = summary
+
+        if changes:
+            changed_fields = sorted({c["field"] for c in changes})
+            for listener in self._listeners:
+                listener(event, changed_fields)
+        return changes
+
+    def _record(self, event: str, event_hash: str, summary: Dict[str, Dict[str, Any]]) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        与持久化的上一版本比较，有变化时追加变更日志
+
+        BEGIN IMMEDIATE 保证多个 worker 同时刷新时同一变化只记录一次
+
+        Returns:
+            持久化的上一版本摘要，没有记录时返回 None
+        """
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._conn.execute(
+                "SELECT hash, fields FROM definition_hashes WHERE event = ?", (event,)
+            ).fetchone()
+            previous = json.loads(row[1]) if row else None
+            if row is None or row[0] != event_hash:
+                if previous is not None:
+                    changes = diff_fields(previous, summary)
+                    if changes:
+                        self._append({
+                            "ts": time.time(),
+                            "event": event,
+                            "old_hash": row[0],
+                            "new_hash": event_hash,
+                            "changes": changes,
+                        })
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO definition_hashes (event, hash, fields, updated_at) VALUES (?, ?, ?, ?)",
+                    (event, event_hash, json.dumps(summary, ensure_ascii=False), time.time())
+                )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return previous
+
+    def _append(self, record: Dict[str, Any]):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    def recent_changes(self, event: Optional[str] = None, limit: int = 20, since: float = 0) -> List[Dict[str, Any]]:
+        """
+        读取最近的变更记录（从日志末尾向前读）
+
+        Args:
+            event: 只返回该事件的记录（可选）
+            limit: 最多返回的记录数
+            since: 只返回该时间戳之后的记录
+
+        Returns:
+            变更记录列表，最新的在前
+        """
+        if not self.log_path or not os.path.exists(self.log_path):
+            return []
+
+        records = []
+        for line in _reverse_lines(self.log_path):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("ts", 0) < since:
+                break
+            if event and record.get("event") != event:
+                continue
+            records.append(record)
+            if len(records) >= limit:
+                break
+        return records
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+
+
+def _reverse_lines(path: str, block_size: int = 65536):
+    """从文件末尾向前逐行读取"""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        remainder = b""
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            chunk = f.read(read_size) + remainder
+            lines = chunk.split(b"\n")
+            remainder = lines.pop(0)
+            for line in reversed(lines):
+                if line.strip():
+                    yield line.decode("utf-8")
+        if remainder.strip():
+            yield remainder.decode("utf-8")
+
+
+def open_definition_tracker() -> DefinitionTracker:
+    """
+    根据环境变量创建追踪器
+
+    EVENT_CHANGE_LOG 为变更日志路径（默认 data/definition_changes.jsonl），设为 off 时只在进程内比较
+    """
+    path = os.getenv("EVENT_CHANGE_LOG", DEFAULT_CHANGE_LOG)
+    if path.lower() in ("", "off", "false", "0", "none"):
+        return DefinitionTracker(None)
+    return DefinitionTracker(path)
@@ -2,8 +2,38 @@
 分析埋点数据，检测字段问题
 """
 
-from typing import Dict, Any, List
+import json
+from typing import Dict, Any, List, Optional, Tuple
 from src.utils.type_checker import TypeChecker, TypeName
+from src.utils.typo_index import TypoIndex
+
+# 编译后的字段校验规则：(期望类型, 枚举值 key 集合, 枚举值 key 列表)，没有枚举时后两项为 None
+FieldRule = Tuple[str, Optional[frozenset], Optional[Tuple[str, ...]]]
+
+
+def compile_field(field_def: Dict[str, Any]) -> FieldRule:
+    """
+    把字段定义编译成校验规则（只解析一次 trans）
+
+    Args:
+        field_def: 字段定义
+
+    Returns:
+        校验规则
+    """
+    enum_keys = None
+    if field_def.get("trans"):
+        try:
+            enum_values = json.loads(field_def["trans"])
+        except Exception:
+            enum_values = None
+        if isinstance(enum_values, dict):
+            enum_keys = tuple(enum_values.keys())
+    return (
+        field_def["type"],
+        frozenset(enum_keys) if enum_keys is not None else None,
+        enum_keys
+    )
 
 
 class EventAnalyzer:
@@ -11,12 +41,66 @@ class EventAnalyzer:
 
     def __init__(self):
         self.type_checker = TypeChecker()
+        # (事件, 字段) -> 校验规则，定义变化时按字段失效（见 invalidate）
+        self._rules: Dict[Tuple[str, str], FieldRule] = {}
+        # 事件 -> 字段名拼写纠错索引，定义变化时整体重建
+        self._typo_indexes: Dict[str, TypoIndex] = {}
+
+    def invalidate(self, event: str, fields: Optional[List[str]] = None):
+        """
+        失效编译好的校验规则
+
+        Args:
+            event: 事件名称
+            fields: 变化的字段，None 表示整个事件
+        """
+        self._typo_indexes.pop(event, None)
+        if fields is None:
+            for key in [k for k in self._rules if k[0] == event]:
+                self._rules.pop(key, None)
+        else:
+            for field_name in fields:
+                self._rules.pop((event, field_name), None)
+
+    def _rule(self, event: Optional[str], field_name: str, field_def: Dict[str, Any]) -> FieldRule:
+        if event is None:
+            return compile_field(field_def)
+        key = (event, field_name)
+        rule = self._rules.get(key)
+        if rule is None:
+            rule = self._rules[key] = compile_field(field_def)
+        return rule
+
+    def suggest_fields(
+        self,
+        event: str,
+        field_name: str,
+        field_definitions: Dict[str, Dict],
+        limit: int = 3
+    ) -> List[str]:
+        """
+        为未知字段找出最接近的已定义字段名（每个事件建一次索引）
+
+        Args:
+            event: 事件名称
+            field_name: 未知字段名
+            field_definitions: 字段定义
+            limit: 最多返回的个数
+
+        Returns:
+            字段名列表，没有足够接近的字段时为空
+        """
+        index = self._typo_indexes.get(event)
+        if index is None or len(index) != len(field_definitions):
+            index = self._typo_indexes[event] = TypoIndex(field_definitions)
+        return index.suggest(field_name, limit)
 
     def analyze(
         self,
         event_data: Dict[str, Any],
         field_definitions: Dict[str, Dict],
-        check_required: bool = False
+        check_required: bool = False,
+        event: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         分析埋点数据，检测问题
@@ -25,17 +109,24 @@ class EventAnalyzer:
             event_data: 埋点数据
             field_definitions: 字段定义（从 API 获取）
             check_required: 是否检查必填字段
+            event: 事件名称，指定时缓存编译好的校验规则（定义变化时需调用 invalidate），
+                并为未知字段附带拼写纠错建议（suggestions）
 
         Returns:
             分析结果
         """
         issues = []
         properties = event_data.get("properties", {})
+        rules = {
+            field_name: self._rule(event, field_name, field_definitions[field_name])
+            for field_name in properties
+            if field_name in field_definitions
+        }
 
         # 1. 检查类型匹配
         for field_name, value in properties.items():
-            if field_name in field_definitions:
-                expected_type = field_definitions[field_name]["type"]
+            if field_name in rules:
+                expected_type = rules[field_name][0]
                 actual_type = self.type_checker.infer_type(value)
 
                 if not self.type_checker.type_matches(expected_type, actual_type):
@@ -54,33 +145,32 @@ class EventAnalyzer:
             if field_name not in field_definitions:
                 # 跳过系统字段（以 $ 开头）
                 if not field_name.startswith("$"):
-                    issues.append({
+                    issue = {
                         "type": "unknown_field",
                         "field": field_name,
                         "severity": "warning",
                         "message": f"字段 {field_name} 不在字段定义中，可能是拼写错误或废弃字段"
-                    })
+                    }
+                    if event is not None:
+                        suggestions = self.suggest_fields(event, field_name, field_definitions)
+                        if suggestions:
+                            issue["suggestions"] = suggestions
+                            issue["message"] += f"，是否为 {', '.join(suggestions)}？"
+                    issues.append(issue)
 
         # 3. 检查枚举值（如果有 trans 定义）
         for field_name, value in properties.items():
-            if field_name in field_definitions:
-                field_def = field_definitions[field_name]
-                if field_def.get("trans"):
-                    try:
-                        import json
-                        enum_values = json.loads(field_def["trans"])
-                        str_value = str(value)
-                        if str_value not in enum_values:
-                            issues.append({
-                                "type": "invalid_enum",
-                                "field": field_name,
-                                "value": value,
-                                "valid_values": list(enum_values.keys()),
-                                "severity": "warning",
-                                "message": f"字段 {field_name} 的值 {value} 不在枚举值范围内"
-                            })
-                    except Exception:
-                        pass
+            if field_name in rules:
+                _, enum_keys, valid_values = rules[field_name]
+                if enum_keys is not None and str(value) not in enum_keys:
+                    issues.append({
+                        "type": "invalid_enum",
+                        "field": field_name,
+                        "value": value,
+                        "valid_values": list(valid_values),
+                        "severity": "warning",
+                        "message": f"字段 {field_name} 的值 {value} 不在枚举值范围内"
+                    })
 
         # 统计信息
         total_fields = len(field_definitions)
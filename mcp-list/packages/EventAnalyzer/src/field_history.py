@@ -0,0 +1,370 @@
+"""Field History
+在 git 历史中查找字段何时被加入 / 移出埋点代码
+
+每个提交只处理一次：用 git log -p --unified=0 取出改动的行，统计每个标识符在每个文件中
+新增和删除的行数，按 (仓库, 提交) 保存到 SQLite。之后的查询只处理新提交，
+同一仓库的多个 worktree 和分支共用已处理的提交。
+
+查询时按提交顺序累加字段的 新增 - 删除 行数：从 0 变为正数记为加入，从正数变为 0 记为移除。
+合并提交本身不产生改动（与 git log -p 相同），同一行在两个分支中都加入时会重复计数。
+"""
+
+import os
+import re
+import sqlite3
+import subprocess
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from src.code_searcher import CodeSearcher
+
+DEFAULT_HISTORY_PATH = str(Path(__file__).resolve().parent.parent / "data" / "field_history.db")
+
+# 单次查询最多处理的新提交数（首次查询大仓库时分多次完成）
+DEFAULT_MAX_COMMITS = 5000
+
+# 每批交给 git log 的提交数（每批处理完即写入，中断后不会重复处理）
+BATCH_SIZE = 200
+
+# 单个文件在一个提交中改动超过此行数时视为生成 / 引入的第三方代码，不计入
+MAX_FILE_LINES = 5000
+
+# 超过此长度的行视为压缩后的代码，不计入
+MAX_LINE_LENGTH = 1000
+
+GIT_TIMEOUT = 600
+
+TOKEN_PATTERN = re.compile(r"[A-Za-z_$][\w$]*")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history_commits (
+    repo TEXT NOT NULL,
+    sha TEXT NOT NULL,
+    time INTEGER,
+    author TEXT,
+    subject TEXT,
+    PRIMARY KEY (repo, sha)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS history_tokens (
+    repo TEXT NOT NULL,
+    token TEXT NOT NULL,
+    sha TEXT NOT NULL,
+    path TEXT NOT NULL,
+    added INTEGER NOT NULL,
+    removed INTEGER NOT NULL,
+    PRIMARY KEY (repo, token, sha, path)
+) WITHOUT ROWID;
+"""
+
+# 一个提交：(哈希, 时间, 作者, 标题, {(标识符, 文件): [新增行数, 删除行数]})
+ParsedCommit = Tuple[str, int, str, str, Dict[Tuple[str, str], List[int]]]
+
+
+def _git(repo_path: str, *args: str) -> str:
+    """执行 git 命令，失败时抛出 ValueError"""
+    try:
+        result = subprocess.run(
+            ["git", "-C", repo_path, *args],
+            capture_output=True,
+            timeout=GIT_TIMEOUT,
+            env=dict(os.environ, GIT_OPTIONAL_LOCKS="0")
+        )
+    except (OSError, subprocess.SubprocessError) as e:
+        raise ValueError(f"git 执行失败: {str(e)}")
+    if result.returncode != 0:
+        message = result.stderr.decode("utf-8", errors="replace").strip()
+        raise ValueError(f"git {args[0]} 失败: {message}")
+    return result.stdout.decode("utf-8", errors="replace")
+
+
+def _count_tokens(
+    counts: Dict[Tuple[str, str], List[int]],
+    path: str,
+    lines: Iterable[Tuple[bool, str]]
+):
+    """把一个文件的改动行计入 counts（每行中同一标识符只算一次）"""
+    for added, line in lines:
+        if len(line) > MAX_LINE_LENGTH:
+            continue
+        for token in set(TOKEN_PATTERN.findall(line)):
+            counter = counts.get((token, path))
+            if counter is None:
+                counter = counts[(token, path)] = [0, 0]
+            counter[0 if added else 1] += 1
+
+
+def parse_log(lines: Iterable[str]) -> Iterable[ParsedCommit]:
+    """
+    解析 git log -p --unified=0 --format=%x01%H%x00%at%x00%an%x00%s 的输出
+
+    Args:
+        lines: 输出的各行
+
+    Yields:
+        (哈希, 时间, 作者, 标题, {(标识符, 文件): [新增行数, 删除行数]})
+    """
+    header: Optional[List[str]] = None
+    counts: Dict[Tuple[str, str], List[int]] = {}
+    path: Optional[str] = None
+    changed: List[Tuple[bool, str]] = []
+    in_hunk = False
+
+    def flush_file():
+        if path is not None and len(changed) <= MAX_FILE_LINES:
+            _count_tokens(counts, path, changed)
+        changed.clear()
+
+    for line in lines:
+        line = line.rstrip("\n")
+        if line.startswith("\x01"):
+            flush_file()
+            if header is not None:
+                yield header[0], int(header[1] or 0), header[2], header[3], counts
+            header = (line[1:].split("\x00") + ["", "", ""])[:4]
+            counts = {}
+            path = None
+            in_hunk = False
+        elif line.startswith("diff --git "):
+            flush_file()
+            path = None
+            in_hunk = False
+        elif not in_hunk:
+            # 文件头：--- a/路径、+++ b/路径（删除的文件只有 --- 一侧有路径）
+            if line.startswith("+++ ") and line[4:] != "/dev/null":
+                path = line[6:] if line.startswith("+++ b/") else line[4:]
+            elif line.startswith("--- ") and line[4:] != "/dev/null":
+                path = line[6:] if line.startswith("--- a/") else line[4:]
+            elif line.startswith("@@"):
+                in_hunk = True
+        elif line.startswith("@@"):
+            continue
+        elif line.startswith("+"):
+            changed.append((True, line[1:]))
+        elif line.startswith("-"):
+            changed.append((False, line[1:]))
+
+    flush_file()
+    if header is not None:
+        yield header[0], int(header[1] or 0), header[2], header[3], counts
+
+
+class FieldHistory:
+    """
+    字段历史索引
+
+    提交按 (仓库, 哈希) 缓存在 SQLite 中（WAL 模式，多个 worker 可以共用）。
+    """
+
+    def __init__(self, path: str = DEFAULT_HISTORY_PATH):
+        """
+        初始化
+
+        Args:
+            path: SQLite 文件路径，":memory:" 表示只在进程内缓存
+        """
+        self.path = path
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        # 仓库 -> 已处理的提交
+        self._indexed: Dict[str, Set[str]] = {}
+        # (仓库, 提交) -> 从该提交可达的提交（按 git rev-list --topo-order 顺序）
+        self._reachable: Dict[Tuple[str, str], List[str]] = {}
+
+    def find_history(
+        self,
+        field_name: str,
+        project_path: str,
+        rev: str = "HEAD",
+        limit: int = 50,
+        max_commits: int = DEFAULT_MAX_COMMITS
+    ) -> Dict[str, Any]:
+        """
+        查找字段在代码中加入、移除的提交
+
+        Args:
+            field_name: 字段名称
+            project_path: 项目目录（git 仓库或其子目录）
+            rev: 从哪个提交 / 分支往前查找（默认 HEAD）
+            limit: 最多返回的改动提交数（最新的在前）
+            max_commits: 本次最多处理的新提交数
+
+        Returns:
+            字段的加入 / 移除记录和各次改动
+        """
+        if not os.path.isdir(project_path):
+            return {"field": field_name, "error": f"项目路径不存在: {project_path}"}
+        try:
+            # 同一仓库的各个 worktree 共用 common dir
+            common_dir = _git(project_path, "rev-parse", "--git-common-dir").strip()
+            repo = os.path.normpath(os.path.join(os.path.abspath(project_path), common_dir))
+            head = _git(project_path, "rev-parse", "--verify", f"{rev}^{{commit}}").strip()
+        except ValueError as e:
+            return {"field": field_name, "error": str(e)}
+
+        reachable = self._reachable_commits(project_path, repo, head)
+        indexed = self._indexed_commits(repo)
+        pending = [sha for sha in reachable if sha not in indexed]
+        processed = self._index(project_path, repo, pending[:max_commits])
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT t.sha, t.path, t.added, t.removed, c.time, c.author, c.subject "
+                "FROM history_tokens t JOIN history_commits c ON c.repo = t.repo AND c.sha = t.sha "
+                "WHERE t.repo = ? AND t.token = ?",
+                (repo, field_name)
+            ).fetchall()
+
+        # 按提交汇总，只保留 rev 可达的提交
+        order = {sha: i for i, sha in enumerate(reachable)}
+        commits: Dict[str, Dict[str, Any]] = {}
+        for sha, path, added, removed, time, author, subject in rows:
+            if sha not in order:
+                continue
+            commit = commits.get(sha)
+            if commit is None:
+                commit = commits[sha] = {
+                    "commit": sha,
+                    "time": time,
+                    "author": author,
+                    "subject": subject,
+                    "added_lines": 0,
+                    "removed_lines": 0,
+                    "files": []
+                }
+            commit["added_lines"] += added
+            commit["removed_lines"] += removed
+            commit["files"].append(path)
+
+        # 从最早的提交开始累加，找出加入和移除的时间点
+        changes = sorted(commits.values(), key=lambda c: order[c["commit"]], reverse=True)
+        balance = 0
+        events = []
+        for commit in changes:
+            commit["files"].sort()
+            previous = balance
+            balance = max(balance + commit["added_lines"] - commit["removed_lines"], 0)
+            if previous == 0 and balance > 0:
+                events.append({"action": "added", **commit})
+            elif previous > 0 and balance == 0:
+                events.append({"action": "removed", **commit})
+
+        changes.reverse()
+        return {
+            "field": field_name,
+            "rev": rev,
+            "head": head,
+            "present": balance > 0,
+            "introduced": events[0] if events and events[0]["action"] == "added" else None,
+            "events": list(reversed(events))[:limit],
+            "changes": changes[:limit],
+            "total_changes": len(changes),
+            "index": {
+                "commits": len(reachable),
+                "processed_now": processed,
+                "pending": len(pending) - processed
+            }
+        }
+
+    def _reachable_commits(self, project_path: str, repo: str, head: str) -> List[str]:
+        key = (repo, head)
+        if key not in self._reachable:
+            output = _git(project_path, "rev-list", "--topo-order", head)
+            if len(self._reachable) >= 16:
+                self._reachable.clear()
+            self._reachable[key] = output.split()
+        return self._reachable[key]
+
+    def _indexed_commits(self, repo: str) -> Set[str]:
+        indexed = self._indexed.get(repo)
+        if indexed is None:
+            with self._lock:
+                rows = self._conn.execute("SELECT sha FROM history_commits WHERE repo = ?", (repo,)).fetchall()
+            indexed = self._indexed[repo] = {sha for sha, in rows}
+        return indexed
+
+    def _index(self, project_path: str, repo: str, shas: List[str]) -> int:
+        """
+        处理提交并写入索引
+
+        Args:
+            project_path: 项目目录
+            repo: 仓库标识（git common dir）
+            shas: 待处理的提交
+
+        Returns:
+            处理的提交数
+        """
+        indexed = self._indexed_commits(repo)
+        pathspecs = [f"*{ext}" for ext in CodeSearcher.SUPPORTED_EXTENSIONS]
+        for start in range(0, len(shas), BATCH_SIZE):
+            batch = shas[start:start + BATCH_SIZE]
+            parsed = {}
+            process = subprocess.Popen(
+                ["git", "-c", "core.quotePath=false", "-C", project_path, "log", "--no-walk=unsorted", "--stdin",
+                 "-p", "--unified=0", "--no-color", "--no-ext-diff", "--no-textconv", "--no-renames",
+                 "--format=%x01%H%x00%at%x00%an%x00%s", "--", *pathspecs],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                env=dict(os.environ, GIT_OPTIONAL_LOCKS="0")
+            )
+            try:
+                # git log --stdin 读完全部输入后才开始输出，先写后读不会死锁
+                process.stdin.write(("\n".join(batch) + "\n").encode("ascii"))
+                process.stdin.close()
+                lines = (raw.decode("utf-8", errors="replace") for raw in process.stdout)
+                for commit in parse_log(lines):
+                    parsed[commit[0]] = commit
+            finally:
+                process.stdout.close()
+                if process.wait(timeout=GIT_TIMEOUT) != 0:
+                    raise ValueError("git log 执行失败")
+
+            with self._lock:
+                # 没有改动支持的文件类型的提交 git log 不会输出，同样记为已处理
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO history_commits (repo, sha, time, author, subject) VALUES (?, ?, ?, ?, ?)",
+                    [(repo, sha, *(parsed[sha][1:4] if sha in parsed else (None, None, None))) for sha in batch]
+                )
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO history_tokens (repo, token, sha, path, added, removed) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        (repo, token, sha, path, added, removed)
+                        for sha, _, _, _, counts in parsed.values()
+                        for (token, path), (added, removed) in counts.items()
+                    )
+                )
+                self._conn.commit()
+            indexed.update(batch)
+        return len(shas)
+
+    def stats(self) -> Dict[str, int]:
+        """索引中的提交数和记录数"""
+        with self._lock:
+            commits = self._conn.execute("SELECT COUNT(*) FROM history_commits").fetchone()[0]
+            tokens = self._conn.execute("SELECT COUNT(*) FROM history_tokens").fetchone()[0]
+        return {"commits": commits, "tokens": tokens}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_field_history() -> FieldHistory:
+    """
+    根据环境变量创建字段历史索引
+
+    FIELD_HISTORY_PATH 为 SQLite 文件路径（默认 data/field_history.db），设为 off 时只在进程内缓存
+    """
+    path = os.getenv("FIELD_HISTORY_PATH", DEFAULT_HISTORY_PATH)
+    if path.lower() in ("", "off", "false", "0", "none"):
+        return FieldHistory(":memory:")
+    return FieldHistory(path)
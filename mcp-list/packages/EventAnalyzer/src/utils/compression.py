@@ -0,0 +1,147 @@
+"""响应压缩
+HTTP 模式下按 Accept-Encoding 压缩响应（brotli 可选，默认 gzip）
+
+与 Starlette 自带的 GZipMiddleware 不同，每个响应分块都会刷新压缩流，
+SSE（text/event-stream）中的每条消息可以立即送达客户端，因此 SSE 模式也能压缩。
+"""
+
+import zlib
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DEFAULT_MINIMUM_SIZE = 500
+
+
+class _GzipStream:
+    encoding = "gzip"
+
+    def __init__(self, level: int):
+        # wbits=31 输出 gzip 格式
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        out = self._compressor.compress(data)
+        return out + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class _BrotliStream:
+    encoding = "br"
+
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        out = self._compressor.process(data)
+        return out + (self._compressor.finish() if final else self._compressor.flush())
+
+
+def _accepted_encodings(headers: List) -> Dict[str, float]:
+    """解析 Accept-Encoding（含 q 值）"""
+    value = ""
+    for name, raw in headers:
+        if name.lower() == b"accept-encoding":
+            value += raw.decode("latin-1") + ","
+    accepted = {}
+    for part in value.split(","):
+        token, _, params = part.strip().partition(";")
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token.strip().lower()] = q
+    return accepted
+
+
+class CompressionMiddleware:
+    """
+    ASGI 压缩中间件
+
+    优先 brotli（安装了 brotli 包且客户端支持时），其次 gzip。
+    单块且小于 minimum_size 的响应、已经编码过的响应不压缩。
+    """
+
+    def __init__(self, app: Callable, minimum_size: int = DEFAULT_MINIMUM_SIZE,
+                 gzip_level: int = 6, brotli_quality: int = 4):
+        """
+        初始化中间件
+
+        Args:
+            app: 被包装的 ASGI 应用
+            minimum_size: 单块响应的最小压缩大小（字节）
+            gzip_level: gzip 压缩级别
+            brotli_quality: brotli 压缩质量（流式压缩用较低质量换取速度）
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _choose(self, scope) -> Optional[Callable[[], Any]]:
+        accepted = _accepted_encodings(scope.get("headers") or [])
+        if brotli is not None and accepted.get("br", 0) > 0:
+            return lambda: _BrotliStream(self.brotli_quality)
+        if accepted.get("gzip", 0) > 0 or accepted.get("*", 0) > 0:
+            return lambda: _GzipStream(self.gzip_level)
+        return None
+
+    async def __call__(self, scope, receive, send):
+        factory = self._choose(scope) if scope["type"] == "http" else None
+        if factory is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Dict[str, Any]] = None
+        stream = None
+        passthrough = False
+
+        async def wrapped_send(message):
+            nonlocal start_message, stream, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                headers = {name.lower() for name, _ in message.get("headers", [])}
+                passthrough = b"content-encoding" in headers
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                if start_message is not None:
+                    await send(start_message)
+                    start_message = None
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if start_message is not None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    start_message = None
+                    await send(message)
+                    return
+                stream = factory()
+                headers = [
+                    (name, value) for name, value in start_message.get("headers", [])
+                    if name.lower() != b"content-length"
+                ]
+                headers.append((b"content-encoding", stream.encoding.encode("ascii")))
+                headers.append((b"vary", b"Accept-Encoding"))
+                await send(dict(start_message, headers=headers))
+                start_message = None
+
+            await send({
+                "type": "http.response.body",
+                "body": stream.compress(body, final=not more_body),
+                "more_body": more_body,
+            })
+
+        await self.app(scope, receive, wrapped_send)
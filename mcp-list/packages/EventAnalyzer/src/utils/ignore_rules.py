@@ -0,0 +1,144 @@
+""".gitignore 规则匹配
+把一个 .gitignore / .ignore 文件的全部规则编译成一个正则，每个路径只需匹配一次
+
+规则语义与 git 相同：
+- 空行和 # 开头的行忽略，! 开头表示重新包含，\\# \\! 转义
+- 以 / 结尾的规则只匹配目录
+- 规则中间或开头有 / 时相对于规则文件所在目录，否则匹配任意层级的文件名
+- * ? [...] 不匹配 /，**/ 匹配任意层目录，/** 匹配目录下的所有内容
+- 同一文件中后面的规则优先（编译时倒序排列，正则的第一个匹配分支就是最后一条规则）
+"""
+
+import re
+from typing import List, Optional, Tuple
+
+
+def _translate(pattern: str) -> str:
+    """把 glob 转换为正则（不含锚定）"""
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        char = pattern[i]
+        if char == "*":
+            if pattern.startswith("**/", i) and (i == 0 or pattern[i - 1] == "/"):
+                out.append("(?:.*/)?")
+                i += 3
+                continue
+            if pattern.startswith("**", i) and i + 2 == n and i > 0 and pattern[i - 1] == "/":
+                out.append(".*")
+                i += 2
+                continue
+            while i + 1 < n and pattern[i + 1] == "*":
+                i += 1
+            out.append("[^/]*")
+        elif char == "?":
+            out.append("[^/]")
+        elif char == "[":
+            end = pattern.find("]", i + 2 if pattern.startswith("[!", i) or pattern.startswith("[^", i) else i + 1)
+            if end < 0:
+                out.append(re.escape(char))
+            else:
+                body = pattern[i + 1:end]
+                if body[:1] in ("!", "^"):
+                    body = "^" + body[1:]
+                out.append("[" + body.replace("\\", "\\\\").replace("[", "\\[") + "]")
+                i = end
+        elif char == "\\" and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(char))
+        i += 1
+    return "".join(out)
+
+
+def parse_line(line: str) -> Optional[Tuple[str, bool, bool]]:
+    """
+    解析一行规则
+
+    Args:
+        line: 规则文件中的一行
+
+    Returns:
+        (正则, 是否重新包含, 是否只匹配目录)，空行和注释返回 None
+    """
+    line = line.rstrip("\n").rstrip("\r")
+    # 行尾空格忽略，除非用 \ 转义
+    stripped = line.rstrip(" ")
+    if stripped.endswith("\\") and len(stripped) < len(line):
+        stripped += " "
+    line = stripped
+    if not line or line.startswith("#"):
+        return None
+
+    negated = line.startswith("!")
+    if negated:
+        line = line[1:]
+    elif line.startswith(("\\#", "\\!")):
+        line = line[1:]
+
+    dir_only = line.endswith("/")
+    line = line.rstrip("/")
+    if not line:
+        return None
+
+    if "/" in line:
+        regex = _translate(line.lstrip("/"))
+    else:
+        regex = "(?:.*/)?" + _translate(line)
+    return regex, negated, dir_only
+
+
+class IgnoreRules:
+    """一个规则文件编译后的匹配器"""
+
+    def __init__(self, lines: List[str]):
+        """
+        编译规则
+
+        Args:
+            lines: 规则文件的各行
+        """
+        rules = [rule for rule in map(parse_line, lines) if rule]
+        self.size = len(rules)
+        # 倒序：正则从左到右尝试各分支，第一个匹配的就是文件中最后一条匹配的规则
+        rules.reverse()
+        self._dir_regex, self._dir_negated = self._compile(rules)
+        self._file_regex, self._file_negated = self._compile([r for r in rules if not r[2]])
+
+    @staticmethod
+    def _compile(rules: List[Tuple[str, bool, bool]]):
+        if not rules:
+            return None, []
+        regex = re.compile("|".join(f"({pattern})" for pattern, _, _ in rules), re.DOTALL)
+        return regex, [negated for _, negated, _ in rules]
+
+    @classmethod
+    def from_file(cls, path: str) -> "IgnoreRules":
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            return cls(f.readlines())
+
+    def __bool__(self) -> bool:
+        return self.size > 0
+
+    def match(self, relative_path: str, is_dir: bool) -> Optional[bool]:
+        """
+        判断路径是否被忽略
+
+        Args:
+            relative_path: 相对于规则文件所在目录的路径（/ 分隔）
+            is_dir: 是否为目录
+
+        Returns:
+            True 忽略，False 被 ! 规则重新包含，None 没有规则匹配
+        """
+        if is_dir:
+            regex, negated = self._dir_regex, self._dir_negated
+        else:
+            regex, negated = self._file_regex, self._file_negated
+        if regex is None:
+            return None
+        m = regex.fullmatch(relative_path)
+        if m is None:
+            return None
+        return not negated[m.lastindex - 1]
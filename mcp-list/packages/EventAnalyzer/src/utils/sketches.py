@@ -0,0 +1,252 @@
+"""概率计数结构
+大批量数据中，未知字段名、非法枚举值的种类没有上限，精确计数的内存会随数据量增长。
+这里的结构都使用固定内存，且同参数的实例可以合并（多个窗口、多个 worker 的结果汇总）：
+- CountMinSketch: 频率估计（只会高估，误差上界约为 总数 * e / width）
+- HyperLogLog: 不同值个数估计（相对误差约 1.04 / sqrt(2^precision)）
+- SpaceSaving: 出现最多的 top-k（heavy hitters）
+"""
+
+import hashlib
+import math
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+
+def hash64(key: str) -> int:
+    """稳定的 64 位哈希（不受 PYTHONHASHSEED 影响，不同进程的结果可以合并）"""
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class CountMinSketch:
+    """Count-Min Sketch：depth 行 width 列计数器，查询取各行最小值"""
+
+    def __init__(self, width: int = 2048, depth: int = 4):
+        """
+        初始化
+
+        Args:
+            width: 每行计数器数（越大误差越小）
+            depth: 行数（越大误差超出上界的概率越小）
+        """
+        self.width = width
+        self.depth = depth
+        self.total = 0
+        self._table = array("Q", bytes(8 * width * depth))
+
+    def _indexes(self, h: int) -> List[int]:
+        # 用两个 32 位哈希组合出 depth 个哈希（Kirsch-Mitzenmacher）
+        h1, h2 = h & 0xFFFFFFFF, h >> 32
+        width = self.width
+        return [row * width + (h1 + row * h2) % width for row in range(self.depth)]
+
+    def add(self, key: str, count: int = 1) -> int:
+        """
+        计数（保守更新：只增加当前最小的计数器，降低高估）
+
+        Returns:
+            计数后的频率估计
+        """
+        return self.add_hash(hash64(key), count)
+
+    def add_hash(self, h: int, count: int = 1) -> int:
+        """按 hash64 的结果计数（同一个值在多个结构中计数时只算一次哈希）"""
+        self.total += count
+        indexes = self._indexes(h)
+        table = self._table
+        estimate = min([table[i] for i in indexes]) + count
+        for i in indexes:
+            if table[i] < estimate:
+                table[i] = estimate
+        return estimate
+
+    def estimate(self, key: str) -> int:
+        """频率估计（不小于真实值）"""
+        table = self._table
+        return min([table[i] for i in self._indexes(hash64(key))])
+
+    def merge(self, other: "CountMinSketch"):
+        """合并同参数的 sketch（合并后估计仍不小于真实值）"""
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError("CountMinSketch 参数不同，无法合并")
+        table = self._table
+        for i, value in enumerate(other._table):
+            if value:
+                table[i] += value
+        self.total += other.total
+
+    @property
+    def memory_bytes(self) -> int:
+        return self._table.itemsize * len(self._table)
+
+
+class HyperLogLog:
+    """HyperLogLog：2^precision 个寄存器，估计不同值的个数"""
+
+    def __init__(self, precision: int = 12):
+        """
+        初始化
+
+        Args:
+            precision: 寄存器数的以 2 为底的对数（4~16），12 时约 4KB、误差约 1.6%
+        """
+        if not 4 <= precision <= 16:
+            raise ValueError(f"precision 必须在 4 和 16 之间: {precision}")
+        self.precision = precision
+        self._registers = bytearray(1 << precision)
+
+    def add(self, key: str):
+        self.add_hash(hash64(key))
+
+    def add_hash(self, h: int):
+        """按 hash64 的结果计数"""
+        rest_bits = 64 - self.precision
+        index = h >> rest_bits
+        rank = rest_bits - (h & ((1 << rest_bits) - 1)).bit_length() + 1
+        if rank > self._registers[index]:
+            self._registers[index] = rank
+
+    def count(self) -> int:
+        """不同值个数的估计"""
+        m = len(self._registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self._registers)
+        if estimate <= 2.5 * m:
+            # 小基数时用线性计数修正
+            zeros = self._registers.count(0)
+            if zeros:
+                estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def merge(self, other: "HyperLogLog"):
+        """合并同参数的 HyperLogLog（逐个寄存器取最大值）"""
+        if other.precision != self.precision:
+            raise ValueError("HyperLogLog 参数不同，无法合并")
+        self._registers = bytearray(map(max, self._registers, other._registers))
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self._registers)
+
+
+class SpaceSaving:
+    """
+    Space-Saving 算法：最多跟踪 capacity 个值，找出出现最多的值
+
+    满了之后新值替换计数最小的值，并继承它的计数（记为误差），
+    出现次数超过 总数 / capacity 的值一定在结果中。
+
+    add() 可以传入新值出现次数的上界（如 Count-Min 估计）：上界不超过当前最小计数时，
+    替换后它也只会是最小的那个，直接跳过，长尾的值不再每次都触发替换。
+    """
+
+    def __init__(self, capacity: int = 100):
+        """
+        初始化
+
+        Args:
+            capacity: 跟踪的值个数上限（取需要的 top-k 的几倍，结果更准确）
+        """
+        self.capacity = max(int(capacity), 1)
+        self.total = 0
+        # 值 -> [计数, 误差]
+        self._counters: Dict[str, List[int]] = {}
+        # 最小计数的下界（计数只增不减，上次替换时的最小值一直有效）
+        self._floor = 0
+
+    def add(self, key: str, count: int = 1, upper_bound: Optional[int] = None):
+        """
+        计数
+
+        Args:
+            key: 值
+            count: 次数
+            upper_bound: 该值累计出现次数的上界（可选，用于跳过不可能进入 top 的值）
+        """
+        self.total += count
+        counters = self._counters
+        counter = counters.get(key)
+        if counter is not None:
+            counter[0] += count
+        elif len(counters) < self.capacity:
+            counters[key] = [count, 0]
+        elif upper_bound is None or upper_bound > self._floor:
+            victim = min(counters, key=lambda k: counters[k][0])
+            floor = counters.pop(victim)[0]
+            counters[key] = [floor + count, floor]
+            self._floor = floor
+
+    def top(self, k: int = 10) -> List[Tuple[str, int, int]]:
+        """
+        出现最多的 k 个值
+
+        Returns:
+            [(值, 计数上界, 误差)]，真实计数在 [计数 - 误差, 计数] 之间
+        """
+        ranked = sorted(self._counters.items(), key=lambda item: -item[1][0])
+        return [(key, counter[0], counter[1]) for key, counter in ranked[:k]]
+
+    def merge(self, other: "SpaceSaving"):
+        """合并另一个实例的计数，只保留计数最大的 capacity 个值"""
+        for key, (count, error) in other._counters.items():
+            counter = self._counters.setdefault(key, [0, 0])
+            counter[0] += count
+            counter[1] += error
+        self.total += other.total
+        if len(self._counters) > self.capacity:
+            ranked = sorted(self._counters.items(), key=lambda item: -item[1][0])
+            self._counters = dict(ranked[:self.capacity])
+            self._floor = ranked[self.capacity - 1][1][0]
+
+
+class FrequencySketch:
+    """
+    一类值的固定内存汇总：总次数、不同值个数（HyperLogLog）、出现最多的值（SpaceSaving，
+    计数用 Count-Min 估计收紧）
+    """
+
+    def __init__(self, top_k: int = 20, width: int = 2048, depth: int = 4, precision: int = 12):
+        """
+        初始化
+
+        Args:
+            top_k: 报告的 heavy hitters 个数（内部跟踪 4 倍）
+            width: Count-Min 宽度
+            depth: Count-Min 深度
+            precision: HyperLogLog 精度
+        """
+        self.top_k = top_k
+        self.counts = CountMinSketch(width, depth)
+        self.distinct = HyperLogLog(precision)
+        self.heavy = SpaceSaving(max(top_k * 4, 16))
+
+    def add(self, key: str, count: int = 1):
+        h = hash64(key)
+        estimate = self.counts.add_hash(h, count)
+        self.distinct.add_hash(h)
+        self.heavy.add(key, count, estimate)
+
+    def merge(self, other: "FrequencySketch"):
+        self.counts.merge(other.counts)
+        self.distinct.merge(other.distinct)
+        self.heavy.merge(other.heavy)
+
+    def top(self, k: int = 0) -> List[Tuple[str, int, int]]:
+        """
+        出现最多的值
+
+        Returns:
+            [(值, 估计次数, 最少次数)]
+        """
+        result = []
+        for key, upper, error in self.heavy.top(k or self.top_k):
+            count = min(upper, self.counts.estimate(key))
+            result.append((key, count, max(upper - error, 0)))
+        result.sort(key=lambda item: -item[1])
+        return result
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            "occurrences": self.counts.total,
+            "distinct": self.distinct.count(),
+            "memory_bytes": self.counts.memory_bytes + self.distinct.memory_bytes
+        }
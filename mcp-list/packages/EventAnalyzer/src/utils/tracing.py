@@ -0,0 +1,320 @@
+"""Tracing
+按工具调用记录耗时分段（span），并可对慢调用做 cProfile / 采样分析
+
+环境变量:
+    TRACE_ENABLED          开启分段记录（默认关闭，关闭时 span 几乎没有开销）
+    TRACE_PROFILE          off / cprofile / sample，开启性能剖析
+    TRACE_SLOW_MS          慢调用阈值（毫秒），超过阈值的剖析结果才落盘，默认 500
+    TRACE_DIR              剖析结果目录，默认 ./traces
+    TRACE_SAMPLE_INTERVAL  采样间隔（毫秒），默认 5
+"""
+
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional
+
+PROFILE_MODES = ("off", "cprofile", "sample")
+
+
+class Trace:
+    """一次工具调用的分段记录"""
+
+    __slots__ = ("tool", "start", "end", "spans", "_depth")
+
+    def __init__(self, tool: str):
+        self.tool = tool
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.spans: List[Dict[str, Any]] = []
+        self._depth = 0
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "tool": self.tool,
+            "duration_ms": round(self.duration_ms, 3),
+            "spans": self.spans,
+        }
+
+    def chrome_events(self) -> List[Dict[str, Any]]:
+        """转换为 Chrome Trace Event 格式（可在 chrome://tracing 或 Perfetto 中查看）"""
+        events = [{
+            "name": self.tool, "ph": "X", "pid": 1, "tid": 1,
+            "ts": 0, "dur": round(self.duration_ms * 1000, 1),
+        }]
+        for span in self.spans:
+            events.append({
+                "name": span["name"], "ph": "X", "pid": 1, "tid": 1,
+                "ts": round(span["offset_ms"] * 1000, 1), "dur": round(span["duration_ms"] * 1000, 1),
+            })
+        return events
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+class StackSampler:
+    """
+    采样分析器
+
+    后台线程定时读取目标线程的调用栈（sys._current_frames），
+    按 "根;...;叶" 的折叠格式计数，可直接用于 flamegraph.pl 或 speedscope。
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="trace-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_file = __file__
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                if code.co_filename != own_file:
+                    names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if names:
+                key = ";".join(reversed(names))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+
+class Tracer:
+    """工具调用追踪器（进程内单例，见 get_tracer）"""
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        profile: str = "off",
+        slow_ms: float = 500.0,
+        out_dir: str = "traces",
+        sample_interval_ms: float = 5.0,
+        keep: int = 50
+    ):
+        self.enabled = enabled
+        self.profile = profile if profile in PROFILE_MODES else "off"
+        self.slow_ms = slow_ms
+        self.out_dir = Path(out_dir)
+        self.sample_interval_ms = sample_interval_ms
+        self.profile_remaining: Optional[int] = None  # None 表示不限次数
+        self.stats: Dict[str, Dict[str, Dict[str, float]]] = {}
+        self.slow_traces: Deque[Dict[str, Any]] = deque(maxlen=keep)
+        self.dumps: Deque[str] = deque(maxlen=keep)
+        self._profiling = threading.Lock()  # 同一时间只剖析一个调用
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        return cls(
+            enabled=os.getenv("TRACE_ENABLED", "false").lower() in ("1", "true", "yes"),
+            profile=os.getenv("TRACE_PROFILE", "off").lower(),
+            slow_ms=float(os.getenv("TRACE_SLOW_MS", "500")),
+            out_dir=os.getenv("TRACE_DIR", "traces"),
+            sample_interval_ms=float(os.getenv("TRACE_SAMPLE_INTERVAL", "5")),
+        )
+
+    # ------------------------------------------------------------ 配置
+
+    def configure(
+        self,
+        enabled: Optional[bool] = None,
+        profile: Optional[str] = None,
+        slow_ms: Optional[float] = None,
+        calls: Optional[int] = None
+    ):
+        """运行时调整（管理工具使用）；calls 为剖析的调用次数，0 表示不限"""
+        if profile is not None:
+            if profile not in PROFILE_MODES:
+                raise ValueError(f"未知的剖析模式: {profile}，可选: {', '.join(PROFILE_MODES)}")
+            self.profile = profile
+            if profile != "off":
+                self.enabled = True
+        if enabled is not None:
+            self.enabled = enabled
+        if slow_ms is not None:
+            self.slow_ms = slow_ms
+        if calls is not None:
+            self.profile_remaining = calls or None
+
+    def reset(self):
+        self.stats.clear()
+        self.slow_traces.clear()
+
+    # ------------------------------------------------------------ 记录
+
+    @contextmanager
+    def trace(self, tool: str):
+        """包住一次工具调用"""
+        if not self.enabled:
+            yield None
+            return
+
+        trace = Trace(tool)
+        token = _current.set(trace)
+        profiler = self._start_profiler()
+        try:
+            yield trace
+        finally:
+            trace.end = time.perf_counter()
+            _current.reset(token)
+            self._finish(trace, profiler)
+
+    def _start_profiler(self):
+        if self.profile == "off" or not self._profiling.acquire(blocking=False):
+            return None
+        if self.profile == "cprofile":
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # 其他剖析工具正在运行
+                self._profiling.release()
+                return None
+        else:
+            profiler = StackSampler(threading.get_ident(), self.sample_interval_ms / 1000)
+            profiler.start()
+        return profiler
+
+    def _finish(self, trace: Trace, profiler):
+        duration = trace.duration_ms
+        tool_stats = self.stats.setdefault(trace.tool, {})
+        self._add_stat(tool_stats, "total", duration)
+        for span in trace.spans:
+            self._add_stat(tool_stats, span["name"], span["duration_ms"])
+
+        slow = duration >= self.slow_ms
+        if slow:
+            self.slow_traces.append(dict(trace.to_dict(), at=datetime.now().isoformat(timespec="seconds")))
+
+        if profiler is None:
+            return
+        try:
+            if isinstance(profiler, cProfile.Profile):
+                profiler.disable()
+            else:
+                profiler.stop()
+            if slow:
+                self._dump(trace, profiler)
+        finally:
+            self._profiling.release()
+            if self.profile_remaining is not None:
+                self.profile_remaining -= 1
+                if self.profile_remaining <= 0:
+                    self.profile = "off"
+                    self.profile_remaining = None
+
+    @staticmethod
+    def _add_stat(stats: Dict[str, Dict[str, float]], name: str, duration: float):
+        stat = stats.get(name)
+        if stat is None:
+            stats[name] = {"count": 1, "total_ms": duration, "max_ms": duration}
+        else:
+            stat["count"] += 1
+            stat["total_ms"] += duration
+            stat["max_ms"] = max(stat["max_ms"], duration)
+
+    def _dump(self, trace: Trace, profiler):
+        """剖析结果落盘：.folded（折叠栈）或 .prof（cProfile），以及 .trace.json（分段）"""
+        try:
+            self.out_dir.mkdir(parents=True, exist_ok=True)
+            stem = self.out_dir / f"{datetime.now():%Y%m%d-%H%M%S-%f}-{trace.tool}-{int(trace.duration_ms)}ms"
+            if isinstance(profiler, cProfile.Profile):
+                path = stem.with_suffix(".prof")
+                profiler.dump_stats(str(path))
+            else:
+                path = stem.with_suffix(".folded")
+                path.write_text(profiler.folded(), encoding="utf-8")
+            Path(f"{stem}.trace.json").write_text(
+                json.dumps({"traceEvents": trace.chrome_events(), "spans": trace.to_dict()}, ensure_ascii=False),
+                encoding="utf-8"
+            )
+            self.dumps.append(str(path))
+            print(f"慢调用 {trace.tool} {trace.duration_ms:.0f}ms，剖析结果: {path}", file=sys.stderr)
+        except OSError as e:
+            print(f"写入剖析结果失败: {str(e)}", file=sys.stderr)
+
+    # ------------------------------------------------------------ 查询
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "profile": self.profile,
+            "profile_remaining": self.profile_remaining,
+            "slow_ms": self.slow_ms,
+            "trace_dir": str(self.out_dir.resolve()),
+            "tools": {
+                tool: {
+                    name: {
+                        "count": int(s["count"]),
+                        "avg_ms": round(s["total_ms"] / s["count"], 3),
+                        "max_ms": round(s["max_ms"], 3),
+                        "total_ms": round(s["total_ms"], 3),
+                    }
+                    for name, s in spans.items()
+                }
+                for tool, spans in self.stats.items()
+            },
+            "slow_calls": list(self.slow_traces)[-10:],
+            "dumps": list(self.dumps)[-10:],
+        }
+
+
+@contextmanager
+def span(name: str):
+    """记录当前工具调用中的一个分段（未开启追踪时直接执行）"""
+    trace = _current.get()
+    if trace is None or trace.end is not None:
+        yield
+        return
+    start = time.perf_counter()
+    trace._depth += 1
+    try:
+        yield
+    finally:
+        trace._depth -= 1
+        end = time.perf_counter()
+        trace.spans.append({
+            "name": name,
+            "depth": trace._depth,
+            "offset_ms": round((start - trace.start) * 1000, 3),
+            "duration_ms": round((end - start) * 1000, 3),
+        })
+
+
+_tracer: Optional[Tracer] = None
+
+
+def get_tracer() -> Tracer:
+    """进程内的追踪器（首次使用时按环境变量创建）"""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer.from_env()
+    return _tracer
@@ -0,0 +1,163 @@
+"""拼写纠错索引
+为 unknown_field 找出最接近的已定义字段名（SymSpell 删除字典）
+
+建索引时对每个字段名（规范化后的前 prefix_length 个字符）生成删除 1~max_distance 个字符的所有变体；
+查询时对未知字段名做同样的删除，查表得到候选，再用编辑距离确认。
+查询开销与字段总数无关，结果按查询的字段名缓存。
+"""
+
+from typing import Dict, Iterable, List, Set
+
+DEFAULT_MAX_DISTANCE = 2
+DEFAULT_PREFIX_LENGTH = 7
+CACHE_SIZE = 4096
+
+
+def normalize(name: str) -> str:
+    """规范化字段名：忽略大小写和分隔符（userId、user_id、USER-ID 视为相同）"""
+    return name.lower().replace("_", "").replace("-", "")
+
+
+def _deletes(word: str, max_distance: int) -> Set[str]:
+    """删除最多 max_distance 个字符得到的所有字符串（包括原字符串）"""
+    result = {word}
+    frontier = [word]
+    for _ in range(max_distance):
+        next_frontier = []
+        for item in frontier:
+            for i in range(len(item)):
+                deleted = item[:i] + item[i + 1:]
+                if deleted not in result:
+                    result.add(deleted)
+                    next_frontier.append(deleted)
+        frontier = next_frontier
+    return result
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    编辑距离（插入、删除、替换、相邻交换各算 1 次），超过 max_distance 时提前返回 max_distance + 1
+
+    Args:
+        a: 字符串
+        b: 字符串
+        max_distance: 关心的最大距离
+
+    Returns:
+        编辑距离
+    """
+    if a == b:
+        return 0
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+
+    # 去掉相同的前缀和后缀，只比较不同的部分
+    prefix = 0
+    shorter = min(len(a), len(b))
+    while prefix < shorter and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < shorter - prefix and a[-1 - suffix] == b[-1 - suffix]:
+        suffix += 1
+    a = a[prefix:len(a) - suffix]
+    b = b[prefix:len(b) - suffix]
+    if not a or not b:
+        return max(len(a), len(b))
+
+    # 只计算对角线附近 max_distance 宽的带状区域，带外的格子距离一定超过 max_distance
+    too_far = max_distance + 1
+    len_b = len(b)
+    previous2: List[int] = []
+    previous = [j if j <= max_distance else too_far for j in range(len_b + 1)]
+    for i in range(1, len(a) + 1):
+        current = [too_far] * (len_b + 1)
+        if i <= max_distance:
+            current[0] = i
+        row_min = too_far
+        char_a = a[i - 1]
+        for j in range(max(1, i - max_distance), min(len_b, i + max_distance) + 1):
+            cost = 0 if char_a == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > max_distance:
+            return too_far
+        previous2, previous = previous, current
+    return min(previous[-1], too_far)
+
+
+class TypoIndex:
+    """单个事件字段名的拼写纠错索引"""
+
+    def __init__(
+        self,
+        names: Iterable[str],
+        max_distance: int = DEFAULT_MAX_DISTANCE,
+        prefix_length: int = DEFAULT_PREFIX_LENGTH
+    ):
+        """
+        建立索引
+
+        Args:
+            names: 已定义的字段名
+            max_distance: 最大编辑距离
+            prefix_length: 只对前这么多个字符生成删除变体（控制索引大小和查询开销）
+        """
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        # 规范化名称 -> 原字段名
+        self._names: Dict[str, List[str]] = {}
+        # 删除变体 -> 规范化名称
+        self._deletes: Dict[str, List[str]] = {}
+        self._cache: Dict[str, List[str]] = {}
+
+        for name in names:
+            key = normalize(name)
+            if key in self._names:
+                if name not in self._names[key]:
+                    self._names[key].append(name)
+                continue
+            self._names[key] = [name]
+            for deleted in _deletes(key[:prefix_length], max_distance):
+                self._deletes.setdefault(deleted, []).append(key)
+
+    def __len__(self) -> int:
+        return sum(len(names) for names in self._names.values())
+
+    def suggest(self, name: str, limit: int = 3) -> List[str]:
+        """
+        最接近的已定义字段名
+
+        Args:
+            name: 未知字段名
+            limit: 最多返回的个数
+
+        Returns:
+            字段名列表，按编辑距离从小到大排列；没有足够接近的字段时为空
+        """
+        key = normalize(name)
+        cached = self._cache.get(key)
+        if cached is None:
+            cached = self._lookup(key)
+            if len(self._cache) >= CACHE_SIZE:
+                self._cache.clear()
+            self._cache[key] = cached
+        return [n for n in cached if n != name][:limit]
+
+    def _lookup(self, key: str) -> List[str]:
+        # 短名字允许的距离更小，避免 id 被纠正成 ip、ab 之类的无关字段
+        max_distance = min(self.max_distance, max(len(key) // 3, 1))
+        candidates = set()
+        for deleted in _deletes(key[:self.prefix_length], max_distance):
+            candidates.update(self._deletes.get(deleted, ()))
+
+        ranked = []
+        for candidate in candidates:
+            distance = edit_distance(key, candidate, max_distance)
+            if distance <= max_distance:
+                ranked.append((distance, abs(len(candidate) - len(key)), candidate))
+        ranked.sort()
+        return [name for _, _, candidate in ranked for name in self._names[candidate]]
@@ -1,27 +1,35 @@
 #!/usr/bin/env python3
 """Claude Stats MCP Server - Python Implementation"""
 
+from utils import startup  # 最先导入，作为启动计时起点
+
 import os
 import sys
 import json
 import asyncio
-from datetime import date, datetime
+import functools
+from datetime import date, datetime, timedelta
 from typing import Optional
+
+# fastmcp 启动时默认打印横幅并请求 PyPI 检查新版本（冷缓存时最多阻塞 2 秒），
+# 本服务在 main() 中自己输出启动信息，默认关闭（需在导入 fastmcp 前设置）
+os.environ.setdefault('FASTMCP_SHOW_SERVER_BANNER', 'false')
+
 from fastmcp import FastMCP
 from dotenv import load_dotenv
 
-from utils.config_loader import load_api_keys
-from utils.api_client import get_all_key_stats, KeyStatsResult
+from utils.tenant_cache import MAX_SHARDS, SHARD_IDLE_TTL, SHARD_MAX_BYTES, TenantCacheManager, discover_tenants
+from utils.stats_snapshot import StatsSnapshot
+from utils.history_store import open_history_store
 from utils.data_analyzer import (
     format_cost,
     format_tokens,
-    get_top_users,
-    find_user_by_name,
-    compare_users,
-    detect_anomalies,
-    generate_summary,
-    calculate_usage_percentage
+    compare_users as compare_user_stats,
+    calculate_usage_percentage,
+    get_workdays_count
 )
+from utils.model_index import cache_ratio
+from utils.tracing import get_tracer, span, traced
 
 # 加载环境变量
 load_dotenv()
@@ -41,69 +49,142 @@ mcp = FastMCP(
 6. analyze_usage_trend - 分析使用趋势
 7. detect_anomalies - 检测异常使用情况
 8. generate_report - 生成完整的使用报告
+9. query_usage_history - 查询本地保存的历史每日统计
+10. query_top_models - 查询费用/请求数最高的模型
+11. query_model_cost_share - 查询各模型的费用占比
+12. query_cache_token_ratio - 查询各模型的缓存Token比例
+13. trace_control - 管理工具：查看分段耗时、开启性能剖析
+14. startup_report - 管理工具：查看服务启动耗时和导入耗时明细
 
 使用示例：
 - "今天使用率最高的是谁？" -> 使用 query_top_users
 - "查询江俊锋的今日使用情况" -> 使用 query_user_stats
 - "对比江俊锋和陈雷的使用情况" -> 使用 compare_users
+- "哪个模型花费最多？" -> 使用 query_top_models
     """.strip()
 )
 
-# 缓存数据
-daily_stats_cache = None
-monthly_stats_cache = None
-last_daily_fetch = 0
-last_monthly_fetch = 0
-CACHE_TTL = 5 * 60  # 5分钟缓存（秒）
+try:
+    from fastmcp.server.middleware import Middleware
+except ImportError:  # 旧版 fastmcp 没有中间件，只记录到传输启动为止
+    Middleware = None
+
+if Middleware is not None:
+    class StartupMarks(Middleware):
+        """记录第一次初始化和第一次工具调用的时间"""
+
+        async def on_initialize(self, context, call_next):
+            startup.mark('first_initialize')
+            return await call_next(context)
+
+        async def on_call_tool(self, context, call_next):
+            startup.mark('first_tool_call')
+            result = await call_next(context)
+            startup.mark('first_tool_result')
+            return result
+
+    mcp.add_middleware(StartupMarks())
+
+startup.mark('module_loaded')
+
+
+@functools.lru_cache(maxsize=None)
+def get_history_store():
+    """本地历史统计（每次刷新追加，趋势查询不再请求上游API）；首次使用时打开"""
+    with startup.timed('history_store'):
+        return open_history_store()
+
+
+@functools.lru_cache(maxsize=None)
+def get_tenant_caches() -> TenantCacheManager:
+    """多租户分片缓存：每个租户一份Key配置，分片独立刷新（按Key缓存，只刷新过期或失败的Key）；首次使用时创建"""
+    watch_interval = None
+    if os.getenv('KEYS_CONFIG_WATCH', 'false').lower() in ('1', 'true', 'yes'):
+        # 可选：轮询监听各租户的Key配置文件
+        watch_interval = float(os.getenv('KEYS_CONFIG_WATCH_INTERVAL', '5'))
+
+    history_store = get_history_store()
+    with startup.timed('tenant_caches'):
+        return TenantCacheManager(
+            discover_tenants(),
+            history=history_store,
+            max_shards=int(os.getenv('TENANT_MAX_SHARDS', MAX_SHARDS)),
+            idle_ttl=float(os.getenv('TENANT_IDLE_TTL', SHARD_IDLE_TTL)),
+            max_shard_bytes=int(os.getenv('TENANT_SHARD_MAX_MB', SHARD_MAX_BYTES // (1024 * 1024))) * 1024 * 1024,
+            watch_interval=watch_interval
+        )
+
+
+async def get_snapshot(period: str = 'daily', force_refresh: bool = False, tenant: str = '') -> StatsSnapshot:
+    """获取租户的统计快照（带缓存，缓存内容变化后才重建）"""
+    tenant_caches = get_tenant_caches()
+    shard = tenant_caches.shard(tenant)
+    key_config = shard.load_config()
+    cache = shard.cache(period)
+    with span('refresh'):
+        await cache.get(list(key_config.keys), force_refresh, key_config.version)
+    tenant_caches.enforce_memory(shard)
+    with span('snapshot'):
+        return cache.snapshot()
+
+
+def to_json(result) -> str:
+    """序列化工具结果"""
+    with span('serialize'):
+        return json.dumps(result, ensure_ascii=False, indent=2)
 
 
-async def get_daily_stats(force_refresh: bool = False):
-    """获取今日统计（带缓存）"""
-    global daily_stats_cache, last_daily_fetch
-    
-    now = asyncio.get_event_loop().time()
-    if not force_refresh and daily_stats_cache and (now - last_daily_fetch) < CACHE_TTL:
-        return daily_stats_cache
-    
-    api_keys = load_api_keys()
-    stats = await get_all_key_stats(api_keys, 'daily')
-    daily_stats_cache = stats
-    last_daily_fetch = now
-    return stats
+def stale_users(stats) -> list:
+    """列出沿用上次数据的用户"""
+    return [
+        {
+            'name': s.name,
+            'account': s.account,
+            'error': s.error
+        }
+        for s in stats if s.stale
+    ]
 
 
-async def get_monthly_stats(force_refresh: bool = False):
-    """获取本月统计（带缓存）"""
-    global monthly_stats_cache, last_monthly_fetch
-    
-    now = asyncio.get_event_loop().time()
-    if not force_refresh and monthly_stats_cache and (now - last_monthly_fetch) < CACHE_TTL:
-        return monthly_stats_cache
-    
-    api_keys = load_api_keys()
-    stats = await get_all_key_stats(api_keys, 'monthly')
-    monthly_stats_cache = stats
-    last_monthly_fetch = now
-    return stats
+def trimmed_keys(snapshot: StatsSnapshot, account: Optional[str] = None) -> dict:
+    """按模型的统计是否缺少部分用户（模型明细因内存上限被丢弃），account 为空时检查全部用户"""
+    trimmed = [s for s in snapshot.trimmed_users if account is None or s.account == account]
+    return {
+        'partial': bool(trimmed),
+        'trimmedKeys': [{'name': s.name, 'account': s.account} for s in trimmed]
+    }
+
+
+def user_candidates(index, user_name: str) -> list:
+    """未确定用户时列出可能的候选（含模糊匹配），供用户确认"""
+    return [
+        {'name': m.user.name, 'account': m.user.account, 'matchType': m.match_type}
+        for m in index.search(user_name)
+    ]
 
 
 @mcp.tool()
-async def query_today_stats(force_refresh: bool = False) -> str:
+@traced
+async def query_today_stats(force_refresh: bool = False, tenant: str = '') -> str:
     """
     查询今日所有账号的使用统计
     
     Args:
         force_refresh: 是否强制刷新缓存数据（默认False）
+        tenant: 租户名称（TENANT_KEYS_DIR 下的配置文件名），留空使用默认租户
     
     Returns:
         JSON格式的统计数据
     """
     try:
-        stats = await get_daily_stats(force_refresh)
-        summary = generate_summary(stats)
+        snapshot = await get_snapshot('daily', force_refresh, tenant=tenant)
+        stats = snapshot.stats
+        summary = snapshot.summary()
         
         result = {
             'period': '今日统计',
+            'tenant': get_tenant_caches().resolve(tenant),
+            'configVersion': snapshot.config_version,
             'timestamp': datetime.now().isoformat(),
             'summary': {
                 'totalUsers': summary['total_users'],
@@ -111,7 +192,8 @@ async def query_today_stats(force_refresh: bool = False) -> str:
                 'totalCost': format_cost(summary['total_cost']),
                 'totalRequests': f"{summary['total_requests']:,}",
                 'totalTokens': format_tokens(summary['total_tokens']),
-                'avgCostPerUser': format_cost(summary['avg_cost_per_user'])
+                'avgCostPerUser': format_cost(summary['avg_cost_per_user']),
+                'staleCount': summary['stale_users']
             },
             'users': [
                 {
@@ -131,31 +213,37 @@ async def query_today_stats(force_refresh: bool = False) -> str:
                     'error': s.error
                 }
                 for s in stats if not s.success
-            ]
+            ],
+            'staleUsers': stale_users(stats)
         }
         
-        return json.dumps(result, ensure_ascii=False, indent=2)
+        return to_json(result)
     except Exception as e:
         return json.dumps({'error': str(e)}, ensure_ascii=False, indent=2)
 
 
 @mcp.tool()
-async def query_monthly_stats(force_refresh: bool = False) -> str:
+@traced
+async def query_monthly_stats(force_refresh: bool = False, tenant: str = '') -> str:
     """
     查询本月所有账号的使用统计
     
     Args:
         force_refresh: 是否强制刷新缓存数据（默认False）
+        tenant: 租户名称（TENANT_KEYS_DIR 下的配置文件名），留空使用默认租户
     
     Returns:
         JSON格式的统计数据
     """
     try:
-        stats = await get_monthly_stats(force_refresh)
-        summary = generate_summary(stats)
+        snapshot = await get_snapshot('monthly', force_refresh, tenant=tenant)
+        stats = snapshot.stats
+        summary = snapshot.summary()
         
         result = {
             'period': '本月统计',
+            'tenant': get_tenant_caches().resolve(tenant),
+            'configVersion': snapshot.config_version,
             'timestamp': datetime.now().isoformat(),
             'summary': {
                 'totalUsers': summary['total_users'],
@@ -163,7 +251,8 @@ async def query_monthly_stats(force_refresh: bool = False) -> str:
                 'totalCost': format_cost(summary['total_cost']),
                 'totalRequests': f"{summary['total_requests']:,}",
                 'totalTokens': format_tokens(summary['total_tokens']),
-                'avgCostPerUser': format_cost(summary['avg_cost_per_user'])
+                'avgCostPerUser': format_cost(summary['avg_cost_per_user']),
+                'staleCount': summary['stale_users']
             },
             'users': [
                 {
@@ -182,39 +271,46 @@ async def query_monthly_stats(force_refresh: bool = False) -> str:
                     'error': s.error
                 }
                 for s in stats if not s.success
-            ]
+            ],
+            'staleUsers': stale_users(stats)
         }
         
-        return json.dumps(result, ensure_ascii=False, indent=2)
+        return to_json(result)
     except Exception as e:
         return json.dumps({'error': str(e)}, ensure_ascii=False, indent=2)
 
 
 @mcp.tool()
-async def query_user_stats(user_name: str, period: str = 'daily') -> str:
+@traced
+async def query_user_stats(user_name: str, period: str = 'daily', tenant: str = '') -> str:
     """
     查询特定用户的统计数据
     
     Args:
         user_name: 用户名称或账号关键词
         period: 统计周期，'daily'(今日) 或 'monthly'(本月)，默认'daily'
+        tenant: 租户名称（TENANT_KEYS_DIR 下的配置文件名），留空使用默认租户
     
     Returns:
         JSON格式的用户统计数据
     """
     try:
-        stats = await get_daily_stats() if period == 'daily' else await get_monthly_stats()
-        user = find_user_by_name(stats, user_name)
+        snapshot = await get_snapshot(period, tenant=tenant)
+        stats = snapshot.stats
+        index = snapshot.user_index
+        match = index.best(user_name)
         
-        if not user:
+        if not match:
             return json.dumps({
                 'error': f"未找到用户: {user_name}",
+                'candidates': user_candidates(index, user_name),
                 'availableUsers': [
                     {'name': s.name, 'account': s.account}
                     for s in stats
                 ]
             }, ensure_ascii=False, indent=2)
         
+        user = match.user
         if not user.success:
             return json.dumps({
                 'error': f"获取用户 {user.name} 的数据失败",
@@ -230,31 +326,48 @@ async def query_user_stats(user_name: str, period: str = 'daily') -> str:
                 'requests': user.stats.requests,
                 'tokens': format_tokens(user.stats.allTokens),
                 'inputTokens': format_tokens(user.stats.inputTokens),
-                'usagePercent': calculate_usage_percentage(user.stats.totalCost, 40) + '%' if period == 'daily' else 'N/A'
-            }
+                'usagePercent': calculate_usage_percentage(user.stats.totalCost, 40) + '%' if period == 'daily' else 'N/A',
+                'stale': user.stale,
+                'models': [
+                    {
+                        'model': m.model,
+                        'cost': format_cost(m.totalCost),
+                        'requests': m.requests,
+                        'tokens': format_tokens(m.allTokens)
+                    }
+                    for m in user.model_breakdown()
+                ]
+            },
+            **trimmed_keys(snapshot, user.account),
+            'matchType': match.match_type,
+            'otherCandidates': [
+                c for c in user_candidates(index, user_name) if c['account'] != user.account
+            ]
         }
         
-        return json.dumps(result, ensure_ascii=False, indent=2)
+        return to_json(result)
     except Exception as e:
         return json.dumps({'error': str(e)}, ensure_ascii=False, indent=2)
 
 
 @mcp.tool()
-async def query_top_users(limit: int = 5, period: str = 'daily') -> str:
+@traced
+async def query_top_users(limit: int = 5, period: str = 'daily', tenant: str = '') -> str:
     """
     查询使用率（费用）最高的前N名用户
     
     Args:
         limit: 返回的用户数量（1-20），默认5
         period: 统计周期，'daily'(今日) 或 'monthly'(本月)，默认'daily'
+        tenant: 租户名称（TENANT_KEYS_DIR 下的配置文件名），留空使用默认租户
     
     Returns:
         JSON格式的Top用户列表
     """
     try:
         limit = max(1, min(limit, 20))  # 限制在1-20之间
-        stats = await get_daily_stats() if period == 'daily' else await get_monthly_stats()
-        top_users = get_top_users(stats, limit)
+        snapshot = await get_snapshot(period, tenant=tenant)
+        top_users = snapshot.top_by_cost(limit)
         
         result = {
             'period': '今日统计' if period == 'daily' else '本月统计',
@@ -273,13 +386,14 @@ async def query_top_users(limit: int = 5, period: str = 'daily') -> str:
             ]
         }
         
-        return json.dumps(result, ensure_ascii=False, indent=2)
+        return to_json(result)
     except Exception as e:
         return json.dumps({'error': str(e)}, ensure_ascii=False, indent=2)
 
 
 @mcp.tool()
-async def compare_users(user1_name: str, user2_name: str, period: str = 'daily') -> str:
+@traced
+async def compare_users(user1_name: str, user2_name: str, period: str = 'daily', tenant: str = '') -> str:
     """
     比较两个用户的使用情况
     
@@ -287,28 +401,35 @@ async def compare_users(user1_name: str, user2_name: str, period: str = 'daily')
         user1_name: 第一个用户的名称
         user2_name: 第二个用户的名称
         period: 统计周期，'daily'(今日) 或 'monthly'(本月)，默认'daily'
+        tenant: 租户名称（TENANT_KEYS_DIR 下的配置文件名），留空使用默认租户
     
     Returns:
         JSON格式的用户对比数据
     """
     try:
-        stats = await get_daily_stats() if period == 'daily' else await get_monthly_stats()
+        snapshot = await get_snapshot(period, tenant=tenant)
+        stats = snapshot.stats
         
-        user1 = find_user_by_name(stats, user1_name)
-        user2 = find_user_by_name(stats, user2_name)
+        index = snapshot.user_index
+        match1 = index.best(user1_name)
+        match2 = index.best(user2_name)
         
-        if not user1 or not user2:
+        if not match1 or not match2:
             return json.dumps({
                 'error': '未找到指定用户',
-                'user1Found': user1 is not None,
-                'user2Found': user2 is not None,
+                'user1Found': match1 is not None,
+                'user2Found': match2 is not None,
+                'user1Candidates': [] if match1 else user_candidates(index, user1_name),
+                'user2Candidates': [] if match2 else user_candidates(index, user2_name),
                 'availableUsers': [
                     {'name': s.name, 'account': s.account}
                     for s in stats
                 ]
             }, ensure_ascii=False, indent=2)
         
-        comparison = compare_users(user1, user2)
+        user1, user2 = match1.user, match2.user
+        
+        comparison = compare_user_stats(user1, user2)
         
         result = {
             'period': '今日统计' if period == 'daily' else '本月统计',
@@ -318,14 +439,16 @@ async def compare_users(user1_name: str, user2_name: str, period: str = 'daily')
                     'account': user1.account,
                     'cost': format_cost(user1.stats.totalCost),
                     'requests': user1.stats.requests,
-                    'tokens': format_tokens(user1.stats.allTokens)
+                    'tokens': format_tokens(user1.stats.allTokens),
+                    'matchType': match1.match_type
                 },
                 'user2': {
                     'name': user2.name,
                     'account': user2.account,
                     'cost': format_cost(user2.stats.totalCost),
                     'requests': user2.stats.requests,
-                    'tokens': format_tokens(user2.stats.allTokens)
+                    'tokens': format_tokens(user2.stats.allTokens),
+                    'matchType': match2.match_type
                 },
                 'differences': {
                     'cost': {
@@ -347,30 +470,46 @@ async def compare_users(user1_name: str, user2_name: str, period: str = 'daily')
             }
         }
         
-        return json.dumps(result, ensure_ascii=False, indent=2)
+        return to_json(result)
     except Exception as e:
         return json.dumps({'error': str(e)}, ensure_ascii=False, indent=2)
 
 
 @mcp.tool()
-async def analyze_usage_trend() -> str:
+@traced
+async def analyze_usage_trend(tenant: str = '') -> str:
     """
     分析使用趋势，对比今日和本月的平均使用情况
     
+    Args:
+        tenant: 租户名称（TENANT_KEYS_DIR 下的配置文件名），留空使用默认租户
+    
     Returns:
         JSON格式的趋势分析数据
     """
     try:
-        daily_stats = await get_daily_stats()
-        monthly_stats = await get_monthly_stats()
-        
-        daily_summary = generate_summary(daily_stats)
-        monthly_summary = generate_summary(monthly_stats)
+        daily_summary = (await get_snapshot('daily', tenant=tenant)).summary()
+        monthly_summary = (await get_snapshot('monthly', tenant=tenant)).summary()
         
-        # 计算本月平均每日费用
-        current_day = date.today().day
+        # 计算本月平均每日费用（优先使用本地历史中已结束的日期）
+        today = date.today()
+        current_day = today.day
         avg_daily_cost = monthly_summary['total_cost'] / current_day if current_day > 0 else 0
-        
+        avg_source = 'monthly_total'
+        rolling_7d = None
+        tenant_name = get_tenant_caches().resolve(tenant)
+        history_store = get_history_store()
+        if history_store is not None:
+            month_avg = history_store.rolling_average(current_day - 1, today, tenant_name) if current_day > 1 else None
+            if month_avg:
+                avg_daily_cost = month_avg['avg_cost']
+                avg_source = f"history ({month_avg['days']} days)"
+            rolling_7d = history_store.rolling_average(7, today, tenant_name)
+
+        # 按工作日（排除周末和法定假日）折算的本月日均费用
+        workdays_elapsed = get_workdays_count(today.replace(day=1), today)
+        avg_workday_cost = monthly_summary['total_cost'] / workdays_elapsed if workdays_elapsed > 0 else 0
+
         result = {
             'trend': {
                 'todayCost': format_cost(daily_summary['total_cost']),
@@ -379,7 +518,9 @@ async def analyze_usage_trend() -> str:
                     'diff': format_cost(abs(daily_summary['total_cost'] - avg_daily_cost)),
                     'percent': f"{((daily_summary['total_cost'] - avg_daily_cost) / avg_daily_cost * 100):.1f}%" if avg_daily_cost > 0 else 'N/A',
                     'status': '高于平均' if daily_summary['total_cost'] > avg_daily_cost else '低于平均'
-                }
+                },
+                'avgSource': avg_source,
+                'rolling7dAvgCost': format_cost(rolling_7d['avg_cost']) if rolling_7d else 'N/A'
             },
             'today': {
                 'totalCost': format_cost(daily_summary['total_cost']),
@@ -392,30 +533,258 @@ async def analyze_usage_trend() -> str:
                 'totalRequests': monthly_summary['total_requests'],
                 'activeUsers': monthly_summary['active_users'],
                 'avgCostPerUser': format_cost(monthly_summary['avg_cost_per_user']),
-                'daysElapsed': current_day
+                'daysElapsed': current_day,
+                'workdaysElapsed': workdays_elapsed,
+                'avgWorkdayCost': format_cost(avg_workday_cost)
             }
         }
         
-        return json.dumps(result, ensure_ascii=False, indent=2)
+        return to_json(result)
     except Exception as e:
         return json.dumps({'error': str(e)}, ensure_ascii=False, indent=2)
 
 
 @mcp.tool()
-async def detect_anomalies(threshold: float = 40.0, period: str = 'daily') -> str:
+@traced
+async def query_usage_history(days: int = 7, user_name: str = '', tenant: str = '') -> str:
+    """
+    查询本地保存的历史每日统计（不请求上游API）
+
+    Args:
+        days: 查询最近多少天（1-90），默认7
+        user_name: 用户名称或账号关键词，留空则返回所有用户的每日汇总
+        tenant: 租户名称（TENANT_KEYS_DIR 下的配置文件名），留空使用默认租户
+
+    Returns:
+        JSON格式的历史统计数据
+    """
+    try:
+        history_store = get_history_store()
+        if history_store is None:
+            return json.dumps({'error': '历史统计未启用（STATS_HISTORY_ENABLED=false）'}, ensure_ascii=False, indent=2)
+
+        tenant_name = get_tenant_caches().resolve(tenant)
+        days = max(1, min(days, 90))
+        end = date.today()
+        start = end - timedelta(days=days - 1)
+
+        if user_name:
+            index = (await get_snapshot('daily', tenant=tenant)).user_index
+            match = index.best(user_name)
+            if not match:
+                return json.dumps({
+                    'error': f"未找到用户: {user_name}",
+                    'candidates': user_candidates(index, user_name)
+                }, ensure_ascii=False, indent=2)
+            user = match.user
+            series = history_store.user_trend(user.account, start, end, tenant_name)
+            result = {
+                'user': {'name': user.name, 'account': user.account},
+                'matchType': match.match_type,
+                'days': [
+                    {
+                        'date': d['day'],
+                        'cost': format_cost(d['cost']),
+                        'requests': d['requests'],
+                        'tokens': format_tokens(d['tokens'])
+                    }
+                    for d in series
+                ]
+            }
+        else:
+            series = history_store.daily_totals(start, end, tenant_name)
+            result = {
+                'days': [
+                    {
+                        'date': d['day'],
+                        'cost': format_cost(d['cost']),
+                        'requests': d['requests'],
+                        'tokens': format_tokens(d['tokens']),
+                        'users': d['users']
+                    }
+                    for d in series
+                ]
+            }
+
+        total_cost = sum(d['cost'] for d in series)
+        result['range'] = {'start': start.isoformat(), 'end': end.isoformat()}
+        result['recordedDays'] = len(series)
+        result['avgDailyCost'] = format_cost(total_cost / len(series)) if series else 'N/A'
+
+        return to_json(result)
+    except Exception as e:
+        return json.dumps({'error': str(e)}, ensure_ascii=False, indent=2)
+
+
+@mcp.tool()
+@traced
+async def query_top_models(limit: int = 5, period: str = 'daily', sort_by: str = 'cost', tenant: str = '') -> str:
+    """
+    查询费用（或请求数、Token）最高的前N个模型，并列出每个模型用量最高的用户
+
+    Args:
+        limit: 返回的模型数量（1-20），默认5
+        period: 统计周期，'daily'(今日) 或 'monthly'(本月)，默认'daily'
+        sort_by: 排序依据，'cost'、'requests' 或 'tokens'，默认'cost'
+        tenant: 租户名称（TENANT_KEYS_DIR 下的配置文件名），留空使用默认租户
+
+    Returns:
+        JSON格式的模型排行
+    """
+    try:
+        limit = max(1, min(limit, 20))
+        column = {'cost': 'totalCost', 'requests': 'requests', 'tokens': 'allTokens'}.get(sort_by, 'totalCost')
+        snapshot = await get_snapshot(period, tenant=tenant)
+        index = snapshot.model_index
+        names = {s.account: s.name for s in snapshot.stats}
+
+        result = {
+            'period': '今日统计' if period == 'daily' else '本月统计',
+            'sortBy': sort_by,
+            'totalCost': format_cost(index.total_cost),
+            'models': [
+                {
+                    'rank': rank + 1,
+                    'model': model,
+                    'cost': format_cost(sums['totalCost']),
+                    'costShare': f"{(sums['totalCost'] / index.total_cost * 100 if index.total_cost else 0):.1f}%",
+                    'requests': int(sums['requests']),
+                    'tokens': format_tokens(int(sums['allTokens'])),
+                    'topUsers': [
+                        {'name': names.get(key, key), 'account': key, 'cost': format_cost(key_sums['totalCost'])}
+                        for key, key_sums in index.top_keys(model)
+                    ]
+                }
+                for rank, (model, sums) in enumerate(index.top_models(limit, column))
+            ],
+            **trimmed_keys(snapshot)
+        }
+
+        return to_json(result)
+    except Exception as e:
+        return json.dumps({'error': str(e)}, ensure_ascii=False, indent=2)
+
+
+@mcp.tool()
+@traced
+async def query_model_cost_share(period: str = 'daily', user_name: str = '', tenant: str = '') -> str:
+    """
+    查询各模型的费用占比（全部用户或单个用户）
+
+    Args:
+        period: 统计周期，'daily'(今日) 或 'monthly'(本月)，默认'daily'
+        user_name: 用户名称或账号关键词，留空统计全部用户
+        tenant: 租户名称（TENANT_KEYS_DIR 下的配置文件名），留空使用默认租户
+
+    Returns:
+        JSON格式的模型费用占比
+    """
+    try:
+        snapshot = await get_snapshot(period, tenant=tenant)
+        key = None
+        scope = '全部用户'
+        match_type = None
+        if user_name:
+            match = snapshot.user_index.best(user_name)
+            if not match:
+                return json.dumps({
+                    'error': f"未找到用户: {user_name}",
+                    'candidates': user_candidates(snapshot.user_index, user_name)
+                }, ensure_ascii=False, indent=2)
+            key = match.user.account
+            scope = f"{match.user.name} ({match.user.account})"
+            match_type = match.match_type
+
+        shares = snapshot.model_index.cost_share(key)
+        result = {
+            'period': '今日统计' if period == 'daily' else '本月统计',
+            'scope': scope,
+            'matchType': match_type,
+            'totalCost': format_cost(sum(sums['totalCost'] for _, sums, _ in shares)),
+            'models': [
+                {
+                    'model': model,
+                    'cost': format_cost(sums['totalCost']),
+                    'share': f"{share * 100:.1f}%",
+                    'requests': int(sums['requests'])
+                }
+                for model, sums, share in shares
+            ],
+            **trimmed_keys(snapshot, key)
+        }
+
+        return to_json(result)
+    except Exception as e:
+        return json.dumps({'error': str(e)}, ensure_ascii=False, indent=2)
+
+
+@mcp.tool()
+@traced
+async def query_cache_token_ratio(period: str = 'daily', model: str = '', tenant: str = '') -> str:
+    """
+    查询各模型的缓存Token比例（缓存读取占全部输入类Token的比例）
+
+    Args:
+        period: 统计周期，'daily'(今日) 或 'monthly'(本月)，默认'daily'
+        model: 模型名称（支持部分匹配），留空返回所有模型
+        tenant: 租户名称（TENANT_KEYS_DIR 下的配置文件名），留空使用默认租户
+
+    Returns:
+        JSON格式的缓存Token统计
+    """
+    try:
+        snapshot = await get_snapshot(period, tenant=tenant)
+        index = snapshot.model_index
+
+        if model:
+            found = index.find_model(model)
+            if not found:
+                return json.dumps({
+                    'error': f"未找到模型: {model}",
+                    'availableModels': list(index.by_model)
+                }, ensure_ascii=False, indent=2)
+            models = [(found, index.by_model[found])]
+        else:
+            models = index.top_models(len(index.by_model), 'allTokens')
+
+        result = {
+            'period': '今日统计' if period == 'daily' else '本月统计',
+            'models': [
+                {
+                    'model': name,
+                    'inputTokens': format_tokens(int(sums['inputTokens'])),
+                    'cacheCreateTokens': format_tokens(int(sums['cacheCreateTokens'])),
+                    'cacheReadTokens': format_tokens(int(sums['cacheReadTokens'])),
+                    'outputTokens': format_tokens(int(sums['outputTokens'])),
+                    'cacheReadRatio': f"{cache_ratio(sums) * 100:.1f}%"
+                }
+                for name, sums in models
+            ],
+            **trimmed_keys(snapshot)
+        }
+
+        return to_json(result)
+    except Exception as e:
+        return json.dumps({'error': str(e)}, ensure_ascii=False, indent=2)
+
+
+@mcp.tool()
+@traced
+async def detect_anomalies(threshold: float = 40.0, period: str = 'daily', tenant: str = '') -> str:
     """
     检测异常使用情况，找出超过指定阈值的账号
     
     Args:
         threshold: 费用阈值（默认$40）
         period: 统计周期，'daily'(今日) 或 'monthly'(本月)，默认'daily'
+        tenant: 租户名称（TENANT_KEYS_DIR 下的配置文件名），留空使用默认租户
     
     Returns:
         JSON格式的异常检测结果
     """
     try:
-        stats = await get_daily_stats() if period == 'daily' else await get_monthly_stats()
-        anomalies = detect_anomalies(stats, threshold)
+        snapshot = await get_snapshot(period, tenant=tenant)
+        anomalies = snapshot.anomalies(threshold)
         
         result = {
             'period': '今日统计' if period == 'daily' else '本月统计',
@@ -436,27 +805,29 @@ async def detect_anomalies(threshold: float = 40.0, period: str = 'daily') -> st
             'message': '未检测到异常使用情况' if len(anomalies) == 0 else f"发现 {len(anomalies)} 个账号超过阈值"
         }
         
-        return json.dumps(result, ensure_ascii=False, indent=2)
+        return to_json(result)
     except Exception as e:
         return json.dumps({'error': str(e)}, ensure_ascii=False, indent=2)
 
 
 @mcp.tool()
-async def generate_report(period: str = 'daily') -> str:
+@traced
+async def generate_report(period: str = 'daily', tenant: str = '') -> str:
     """
     生成完整的使用报告和优化建议
     
     Args:
         period: 统计周期，'daily'(今日) 或 'monthly'(本月)，默认'daily'
+        tenant: 租户名称（TENANT_KEYS_DIR 下的配置文件名），留空使用默认租户
     
     Returns:
         JSON格式的完整报告
     """
     try:
-        stats = await get_daily_stats() if period == 'daily' else await get_monthly_stats()
-        summary = generate_summary(stats)
-        top_users = get_top_users(stats, 3)
-        anomalies = detect_anomalies(stats, 40)
+        snapshot = await get_snapshot(period, tenant=tenant)
+        summary = snapshot.summary()
+        top_users = snapshot.top_by_cost(3)
+        anomalies = summary['anomalies']
         
         # 生成建议
         suggestions = []
@@ -470,6 +841,9 @@ async def generate_report(period: str = 'daily') -> str:
         if summary['active_users'] < summary['total_users']:
             inactive_count = summary['total_users'] - summary['active_users']
             suggestions.append(f"📊 有 {inactive_count} 个账号未获取到数据，建议检查配置")
+
+        if summary['stale_users']:
+            suggestions.append(f"🕒 有 {summary['stale_users']} 个账号本次刷新失败，使用的是上次的数据")
         
         if top_users and top_users[0].stats.totalCost > summary['avg_cost_per_user'] * 2:
             suggestions.append(f"🔝 最高使用者费用是平均值的2倍以上，建议了解使用场景")
@@ -511,6 +885,59 @@ async def generate_report(period: str = 'daily') -> str:
             ]
         }
         
+        return to_json(result)
+    except Exception as e:
+        return json.dumps({'error': str(e)}, ensure_ascii=False, indent=2)
+
+
+@mcp.tool()
+async def trace_control(action: str = 'status', mode: str = 'sample', slow_ms: Optional[float] = None, calls: int = 0) -> str:
+    """
+    管理工具：查看各工具的分段耗时，开启/关闭追踪，对慢调用做性能剖析
+
+    Args:
+        action: 'status' 查看统计，'enable'/'disable' 开关追踪，'profile' 开启剖析，'reset' 清空统计
+        mode: 剖析方式，'sample' 采样调用栈（输出 .folded 火焰图数据）或 'cprofile'（输出 .prof）
+        slow_ms: 慢调用阈值（毫秒），超过阈值的调用才保存剖析结果
+        calls: 剖析的调用次数，之后自动关闭（0表示不限）
+
+    Returns:
+        JSON格式的追踪状态和统计
+    """
+    try:
+        tracer = get_tracer()
+        if action == 'enable':
+            tracer.configure(enabled=True, slow_ms=slow_ms)
+        elif action == 'disable':
+            tracer.configure(enabled=False, profile='off')
+        elif action == 'profile':
+            tracer.configure(profile=mode, slow_ms=slow_ms, calls=calls)
+        elif action == 'reset':
+            tracer.reset()
+        elif action != 'status':
+            return json.dumps({'error': f"未知操作: {action}"}, ensure_ascii=False, indent=2)
+        return json.dumps(tracer.status(), ensure_ascii=False, indent=2)
+    except Exception as e:
+        return json.dumps({'error': str(e)}, ensure_ascii=False, indent=2)
+
+
+@mcp.tool()
+async def startup_report(importtime: bool = False) -> str:
+    """
+    管理工具：查看服务启动耗时（各阶段、延迟创建的组件），可选给出导入耗时明细
+
+    Args:
+        importtime: 是否在子进程中用 -X importtime 统计导入耗时（约需 1 秒）
+
+    Returns:
+        JSON格式的启动耗时报告
+    """
+    try:
+        result = startup.report()
+        if importtime:
+            result['importtime'] = await asyncio.to_thread(
+                startup.importtime_report, 'server', os.path.dirname(os.path.abspath(__file__))
+            )
         return json.dumps(result, ensure_ascii=False, indent=2)
     except Exception as e:
         return json.dumps({'error': str(e)}, ensure_ascii=False, indent=2)
@@ -518,6 +945,12 @@ async def generate_report(period: str = 'daily') -> str:
 
 def main():
     """主函数"""
+    if '--startup-report' in sys.argv:
+        # 只输出导入耗时明细，不启动服务
+        report = startup.importtime_report('server', os.path.dirname(os.path.abspath(__file__)))
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
     print('========================================', file=sys.stderr)
     print('Claude Stats MCP Server (Python)', file=sys.stderr)
     print('========================================', file=sys.stderr)
@@ -533,11 +966,13 @@ def main():
         print(f'URL: http://localhost:{port}/mcp', file=sys.stderr)
         print('========================================\n', file=sys.stderr)
         
+        startup.mark('transport_start')
         mcp.run(transport='http', port=port)
     else:
         print('Mode: STDIO', file=sys.stderr)
         print('========================================\n', file=sys.stderr)
         
+        startup.mark('transport_start')
         mcp.run(transport='stdio')
 
 
@@ -34,6 +34,7 @@ setup(
     packages=find_packages(),
     py_modules=['server'],
     include_package_data=True,
+    package_data={'utils': ['*.json']},
 
     # 依赖
     install_requires=requirements,
@@ -1,7 +1,10 @@
-import httpx
 import os
+import sys
 from typing import List, Dict, Any, Optional
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+
+from .columnar import ModelRecords
+from .tracing import span
 
 API_BASE_URL = os.getenv('API_BASE_URL', 'https://as.imds.ai/apiStats/api')
 
@@ -23,6 +26,19 @@ class AggregatedStats:
     inputTokens: int = 0
 
 
+@dataclass
+class ModelStats:
+    """单个模型的统计数据"""
+    model: str
+    requests: int = 0
+    inputTokens: int = 0
+    outputTokens: int = 0
+    cacheCreateTokens: int = 0
+    cacheReadTokens: int = 0
+    allTokens: int = 0
+    totalCost: float = 0.0
+
+
 @dataclass
 class KeyStatsResult:
     """单个Key的统计结果"""
@@ -32,10 +48,20 @@ class KeyStatsResult:
     stats: AggregatedStats
     success: bool
     error: Optional[str] = None
+    stale: bool = False  # 本次刷新失败，沿用上次的有效数据
+    records: Optional[ModelRecords] = field(default=None, repr=False, compare=False)  # 按模型的列式明细
+
+    def model_breakdown(self) -> List[ModelStats]:
+        """按模型拆分的统计（按费用从高到低）"""
+        if self.records is None:
+            return []
+        return model_breakdown(self.records)
 
 
 async def get_api_id(api_key: str) -> str:
     """获取apiId"""
+    import httpx  # 首次请求时才导入，缩短服务启动时间
+
     try:
         async with httpx.AsyncClient() as client:
             response = await client.post(
@@ -56,6 +82,8 @@ async def get_api_id(api_key: str) -> str:
 
 async def fetch_stats(api_id: str, period: str) -> Dict[str, Any]:
     """获取统计数据"""
+    import httpx
+
     try:
         async with httpx.AsyncClient() as client:
             response = await client.post(
@@ -73,20 +101,40 @@ async def fetch_stats(api_id: str, period: str) -> Dict[str, Any]:
         raise Exception(f"获取统计数据失败 (apiId: {api_id}, period: {period}): {str(e)}")
 
 
+def aggregate_records(records: ModelRecords) -> AggregatedStats:
+    """汇总列式模型记录"""
+    totals = records.totals()
+    return AggregatedStats(
+        requests=int(totals['requests']),
+        allTokens=int(totals['allTokens']),
+        totalCost=totals['totalCost'],
+        inputTokens=int(totals['inputTokens'])
+    )
+
+
 def aggregate_data(model_data: List[Dict[str, Any]]) -> AggregatedStats:
     """汇总所有模型的数据"""
     if not model_data:
         return AggregatedStats()
-    
-    aggregated = AggregatedStats()
-    
-    for model in model_data:
-        aggregated.requests += model.get('requests', 0)
-        aggregated.allTokens += model.get('allTokens', 0)
-        aggregated.totalCost += model.get('costs', {}).get('total', 0)
-        aggregated.inputTokens += model.get('inputTokens', 0)
-    
-    return aggregated
+    return aggregate_records(ModelRecords.from_model_data(model_data))
+
+
+def model_breakdown(records: ModelRecords) -> List[ModelStats]:
+    """按模型分组求和（按费用从高到低）"""
+    models = [
+        ModelStats(
+            model=name,
+            requests=int(sums['requests']),
+            inputTokens=int(sums['inputTokens']),
+            outputTokens=int(sums['outputTokens']),
+            cacheCreateTokens=int(sums['cacheCreateTokens']),
+            cacheReadTokens=int(sums['cacheReadTokens']),
+            allTokens=int(sums['allTokens']),
+            totalCost=sums['totalCost']
+        )
+        for name, sums in records.sum_by_model().items()
+    ]
+    return sorted(models, key=lambda m: m.totalCost, reverse=True)
 
 
 async def get_key_stats(
@@ -99,25 +147,28 @@ async def get_key_stats(
     
     for i in range(retries):
         try:
-            # 步骤1：获取apiId
-            api_id = await get_api_id(key_info.apiKey)
-            
-            # 步骤2：获取统计数据
-            stats = await fetch_stats(api_id, period)
+            with span('fetch'):
+                # 步骤1：获取apiId
+                api_id = await get_api_id(key_info.apiKey)
+
+                # 步骤2：获取统计数据
+                stats = await fetch_stats(api_id, period)
             
-            # 步骤3：汇总数据
-            aggregated = aggregate_data(stats.get('data', []))
+            # 步骤3：汇总数据（保留按模型的列式明细）
+            records = ModelRecords.from_model_data(stats.get('data') or [], key_info.account)
+            aggregated = aggregate_records(records)
             
             return KeyStatsResult(
                 name=key_info.name,
                 account=key_info.account,
                 apiKey=key_info.apiKey,
                 stats=aggregated,
-                success=True
+                success=True,
+                records=records
             )
         except Exception as e:
             last_error = e
-            print(f"尝试 {i + 1}/{retries} 失败: {str(e)}")
+            print(f"尝试 {i + 1}/{retries} 失败: {str(e)}", file=sys.stderr)
             
             # 如果不是最后一次重试，等待1秒后重试
             if i < retries - 1:
@@ -125,7 +176,7 @@ async def get_key_stats(
                 await asyncio.sleep(1)
     
     # 所有重试都失败
-    print(f"获取 {key_info.name} ({key_info.account}) 的统计数据失败: {str(last_error)}")
+    print(f"获取 {key_info.name} ({key_info.account}) 的统计数据失败: {str(last_error)}", file=sys.stderr)
     return KeyStatsResult(
         name=key_info.name,
         account=key_info.account,
@@ -143,7 +194,7 @@ async def get_all_key_stats(
     """批量获取所有Key的统计数据"""
     import asyncio
     
-    print(f"开始获取所有Key的{'今日' if period == 'daily' else '本月'}统计数据...")
+    print(f"开始获取所有Key的{'今日' if period == 'daily' else '本月'}统计数据...", file=sys.stderr)
     
     # 并发请求所有Key的数据
     tasks = [get_key_stats(key_info, period) for key_info in api_keys]
@@ -153,7 +204,7 @@ async def get_all_key_stats(
     success_count = sum(1 for r in results if r.success)
     fail_count = sum(1 for r in results if not r.success)
     
-    print(f"统计完成: {success_count} 成功, {fail_count} 失败")
+    print(f"统计完成: {success_count} 成功, {fail_count} 失败", file=sys.stderr)
     
     return list(results)
 
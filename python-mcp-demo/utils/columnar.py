@@ -0,0 +1,191 @@
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+_numpy_module: Any = False  # False 表示还没有尝试导入
+
+# 模型记录的数值列（列名 -> 上游字段）
+COLUMNS = (
+    'requests',
+    'inputTokens',
+    'outputTokens',
+    'cacheCreateTokens',
+    'cacheReadTokens',
+    'allTokens',
+    'totalCost',
+)
+
+# 行数少于该值时分组求和直接走纯Python（NumPy 的调用开销更大）
+VECTORIZE_MIN_ROWS = 256
+
+
+def _numpy(rows: int):
+    """
+    行数达到 VECTORIZE_MIN_ROWS 时返回 NumPy 模块，否则返回 None
+
+    NumPy 是可选依赖（未安装时使用 array.array 逐行累加），首次需要时才导入，不拖慢服务启动
+    """
+    global _numpy_module
+    if rows < VECTORIZE_MIN_ROWS:
+        return None
+    if _numpy_module is False:
+        try:
+            import numpy
+            _numpy_module = numpy
+        except ImportError:
+            _numpy_module = None
+    return _numpy_module
+
+
+def _record_values(model: Dict[str, Any]) -> Tuple[float, ...]:
+    """从单条上游模型记录中取出各列数值"""
+    costs = model.get('costs') or {}
+    return (
+        model.get('requests') or 0,
+        model.get('inputTokens') or 0,
+        model.get('outputTokens') or 0,
+        model.get('cacheCreateTokens') or 0,
+        model.get('cacheReadTokens') or 0,
+        model.get('allTokens') or 0,
+        costs.get('total') or 0,
+    )
+
+
+class ModelRecords:
+    """
+    列式存储的模型记录
+
+    每行是一个 (Key, 模型) 的统计，数值列保存在连续的 array.array 中，
+    分组求和在安装了 NumPy 时用 bincount 向量化完成。
+    """
+
+    def __init__(self):
+        self.key_labels: List[str] = []
+        self.model_labels: List[str] = []
+        self._key_pos: Dict[str, int] = {}
+        self._model_pos: Dict[str, int] = {}
+        self.key_idx = array('q')
+        self.model_idx = array('q')
+        self.columns: Dict[str, array] = {name: array('d') for name in COLUMNS}
+
+    def __len__(self) -> int:
+        return len(self.key_idx)
+
+    @classmethod
+    def from_model_data(cls, model_data: Iterable[Dict[str, Any]], key: str = '') -> 'ModelRecords':
+        records = cls()
+        records.add(key, model_data)
+        return records
+
+    @staticmethod
+    def _intern(label: str, labels: List[str], positions: Dict[str, int]) -> int:
+        pos = positions.get(label)
+        if pos is None:
+            pos = positions[label] = len(labels)
+            labels.append(label)
+        return pos
+
+    def add(self, key: str, model_data: Iterable[Dict[str, Any]]):
+        """追加一个Key的全部模型记录"""
+        key_pos = self._intern(key, self.key_labels, self._key_pos)
+        cols = [self.columns[name] for name in COLUMNS]
+        for model in model_data or ():
+            self.key_idx.append(key_pos)
+            self.model_idx.append(self._intern(model.get('model') or 'unknown', self.model_labels, self._model_pos))
+            for col, value in zip(cols, _record_values(model)):
+                col.append(value)
+
+    @classmethod
+    def concat(cls, parts: Iterable['ModelRecords']) -> 'ModelRecords':
+        """合并多份记录（如所有Key的记录合成整个账号池）"""
+        records = cls()
+        for part in parts:
+            records.extend(part)
+        return records
+
+    def extend(self, other: 'ModelRecords'):
+        """合并另一份记录（重新映射Key和模型编号）"""
+        key_map = [self._intern(k, self.key_labels, self._key_pos) for k in other.key_labels]
+        model_map = [self._intern(m, self.model_labels, self._model_pos) for m in other.model_labels]
+        if len(key_map) == 1:
+            # 单个Key的记录（最常见）：直接整段复制
+            self.key_idx.extend(array('q', key_map) * len(other))
+        else:
+            self.key_idx.extend(array('q', (key_map[i] for i in other.key_idx)))
+        self.model_idx.extend(array('q', (model_map[i] for i in other.model_idx)))
+        for name in COLUMNS:
+            self.columns[name].extend(other.columns[name])
+
+    def totals(self) -> Dict[str, float]:
+        """所有行的列合计"""
+        np = _numpy(len(self))
+        if np is not None:
+            return {name: float(np.frombuffer(col, dtype=np.float64).sum()) for name, col in self.columns.items()}
+        return {name: sum(col) for name, col in self.columns.items()}
+
+    def _group_sum(self, idx: array, size: int) -> Dict[str, List[float]]:
+        np = _numpy(len(self))
+        if np is not None:
+            groups = np.frombuffer(idx, dtype=np.int64)
+            return {
+                name: np.bincount(groups, weights=np.frombuffer(col, dtype=np.float64), minlength=size).tolist()
+                for name, col in self.columns.items()
+            }
+        sums = {name: [0.0] * size for name in COLUMNS}
+        for name, col in self.columns.items():
+            target = sums[name]
+            for group, value in zip(idx, col):
+                target[group] += value
+        return sums
+
+    def sum_by_key(self) -> Dict[str, Dict[str, float]]:
+        """按Key分组求和"""
+        sums = self._group_sum(self.key_idx, len(self.key_labels))
+        return {
+            label: {name: sums[name][pos] for name in COLUMNS}
+            for pos, label in enumerate(self.key_labels)
+        }
+
+    def sum_by_key_model(self) -> Dict[Tuple[str, str], Dict[str, float]]:
+        """按 (Key, 模型) 分组求和"""
+        width = max(len(self.model_labels), 1)
+        np = _numpy(len(self))
+        if np is not None:
+            combined = np.frombuffer(self.key_idx, dtype=np.int64) * width + np.frombuffer(self.model_idx, dtype=np.int64)
+            combined_idx = array('q', combined.tobytes())
+        else:
+            combined_idx = array('q', (k * width + m for k, m in zip(self.key_idx, self.model_idx)))
+        sums = self._group_sum(combined_idx, len(self.key_labels) * width)
+        result = {}
+        for pos in set(combined_idx):
+            key_pos, model_pos = divmod(pos, width)
+            result[(self.key_labels[key_pos], self.model_labels[model_pos])] = {name: sums[name][pos] for name in COLUMNS}
+        return result
+
+    def sum_by_model(self, key: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+        """按模型分组求和（可限定单个Key）"""
+        if key is not None:
+            return self.select_key(key).sum_by_model()
+        sums = self._group_sum(self.model_idx, len(self.model_labels))
+        return {
+            label: {name: sums[name][pos] for name in COLUMNS}
+            for pos, label in enumerate(self.model_labels)
+            if sums['requests'][pos] or sums['allTokens'][pos] or sums['totalCost'][pos]
+        }
+
+    def select_key(self, key: str) -> 'ModelRecords':
+        """取出单个Key的记录"""
+        selected = ModelRecords()
+        key_pos = self._key_pos.get(key)
+        if key_pos is None:
+            return selected
+        selected._intern(key, selected.key_labels, selected._key_pos)
+        for row, pos in enumerate(self.key_idx):
+            if pos != key_pos:
+                continue
+            selected.key_idx.append(0)
+            selected.model_idx.append(
+                selected._intern(self.model_labels[self.model_idx[row]], selected.model_labels, selected._model_pos)
+            )
+            for name in COLUMNS:
+                selected.columns[name].append(self.columns[name][row])
+        return selected
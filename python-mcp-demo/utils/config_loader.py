@@ -1,47 +1,126 @@
+import asyncio
+import hashlib
 import json
 import os
+import sys
+from dataclasses import dataclass
 from pathlib import Path
-from typing import List
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 from .api_client import ApiKeyInfo
 
 
-def load_api_keys(config_path: str = None) -> List[ApiKeyInfo]:
-    """加载API Key配置"""
+@dataclass(frozen=True)
+class KeyConfig:
+    """一次加载的Key配置"""
+    path: str
+    version: str  # 配置内容的哈希，内容不变则版本不变
+    keys: Tuple[ApiKeyInfo, ...]
+
+
+# 绝对路径 -> (文件签名, 配置)
+_config_cache: Dict[str, Tuple[tuple, KeyConfig]] = {}
+
+
+def resolve_config_path(config_path: str = None) -> Path:
+    """确定配置文件路径"""
+    if config_path:
+        final_path = config_path
+    elif os.getenv('KEYS_CONFIG_PATH'):
+        final_path = os.getenv('KEYS_CONFIG_PATH')
+    else:
+        final_path = str(Path(__file__).parent.parent.parent / 'ccReport' / 'config' / 'keys.json')
+    return Path(final_path).resolve()
+
+
+def _file_signature(path: Path) -> tuple:
+    """文件签名：inode、修改时间和大小，任一变化即重新加载"""
+    st = path.stat()
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _parse_config(path: Path) -> KeyConfig:
+    with open(path, 'rb') as f:
+        raw = f.read()
+    config = json.loads(raw.decode('utf-8'))
+
+    # 支持两种格式：api_keys 或 apiKeys
+    api_keys_data = config.get('api_keys') or config.get('apiKeys')
+
+    if not api_keys_data or not isinstance(api_keys_data, list):
+        raise ValueError('配置文件格式错误：缺少 apiKeys 或 api_keys 数组')
+
+    # 转换为ApiKeyInfo对象
+    api_keys = tuple(
+        ApiKeyInfo(
+            name=key['name'],
+            account=key['account'],
+            apiKey=key['apiKey']
+        )
+        for key in api_keys_data
+    )
+
+    return KeyConfig(str(path), hashlib.sha256(raw).hexdigest()[:12], api_keys)
+
+
+def load_key_config(config_path: str = None) -> KeyConfig:
+    """加载Key配置（文件未变化时直接返回缓存）"""
     try:
-        # 确定配置文件路径
-        if config_path:
-            final_path = config_path
-        elif os.getenv('KEYS_CONFIG_PATH'):
-            final_path = os.getenv('KEYS_CONFIG_PATH')
-        else:
-            final_path = str(Path(__file__).parent.parent.parent / 'ccReport' / 'config' / 'keys.json')
-        
-        absolute_path = Path(final_path).resolve()
-        
+        absolute_path = resolve_config_path(config_path)
+
         if not absolute_path.exists():
             raise FileNotFoundError(f"配置文件不存在: {absolute_path}")
-        
-        # 读取配置文件
-        with open(absolute_path, 'r', encoding='utf-8') as f:
-            config = json.load(f)
-        
-        # 支持两种格式：api_keys 或 apiKeys
-        api_keys_data = config.get('api_keys') or config.get('apiKeys')
-        
-        if not api_keys_data or not isinstance(api_keys_data, list):
-            raise ValueError('配置文件格式错误：缺少 apiKeys 或 api_keys 数组')
-        
-        # 转换为ApiKeyInfo对象
-        api_keys = [
-            ApiKeyInfo(
-                name=key['name'],
-                account=key['account'],
-                apiKey=key['apiKey']
-            )
-            for key in api_keys_data
-        ]
-        
-        return api_keys
+
+        signature = _file_signature(absolute_path)
+        cached = _config_cache.get(str(absolute_path))
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        key_config = _parse_config(absolute_path)
+        _config_cache[str(absolute_path)] = (signature, key_config)
+        return key_config
     except Exception as e:
         raise Exception(f"加载API Key配置失败: {str(e)}")
 
+
+def load_api_keys(config_path: str = None) -> List[ApiKeyInfo]:
+    """加载API Key配置"""
+    return list(load_key_config(config_path).keys)
+
+
+class ConfigWatcher:
+    """轮询配置文件，内容变化时回调（不依赖额外的文件监听库）"""
+
+    def __init__(
+        self,
+        on_change: Callable[[KeyConfig], Awaitable[None]],
+        config_path: str = None,
+        interval: float = 5.0
+    ):
+        self.on_change = on_change
+        self.config_path = config_path
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self._version: Optional[str] = None
+
+    def start(self):
+        """在当前事件循环中启动（重复调用无副作用）"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _run(self):
+        while True:
+            try:
+                key_config = load_key_config(self.config_path)
+                if self._version is not None and key_config.version != self._version:
+                    print(f"检测到Key配置变化: {self._version} -> {key_config.version}", file=sys.stderr)
+                    await self.on_change(key_config)
+                self._version = key_config.version
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"检查Key配置失败: {str(e)}", file=sys.stderr)
+            await asyncio.sleep(self.interval)
@@ -1,20 +1,17 @@
 from typing import List, Optional, Tuple
 from datetime import datetime, date
-from .api_client import KeyStatsResult, AggregatedStats
+from .api_client import KeyStatsResult, AggregatedStats, aggregate_records
+from .columnar import ModelRecords
+from .holiday_calendar import HolidayCalendar, get_default_calendar
 
 
-def get_workdays_count(start_date: date, end_date: date) -> int:
-    """计算两个日期之间的工作日数量（排除周六日）"""
-    count = 0
-    current = start_date
-    
-    while current <= end_date:
-        # 0 = Monday, 6 = Sunday
-        if current.weekday() < 5:  # Monday to Friday
-            count += 1
-        current = date.fromordinal(current.toordinal() + 1)
-    
-    return count
+def get_workdays_count(
+    start_date: date,
+    end_date: date,
+    calendar: Optional[HolidayCalendar] = None
+) -> int:
+    """计算两个日期之间的工作日数量（排除周末和法定假日，计入调休上班日）"""
+    return (calendar or get_default_calendar()).workdays_between(start_date, end_date)
 
 
 def format_tokens(tokens: int) -> str:
@@ -41,22 +38,22 @@ def sort_by_requests(stats: List[KeyStatsResult], descending: bool = True) -> Li
     return sorted(stats, key=lambda x: x.stats.requests, reverse=descending)
 
 
-def find_user_by_name(stats: List[KeyStatsResult], user_name: str) -> Optional[KeyStatsResult]:
-    """查找特定用户"""
-    user_name_lower = user_name.lower()
-    for s in stats:
-        if user_name_lower in s.name.lower() or user_name_lower in s.account.lower():
-            return s
-    return None
-
-
 def get_top_users(stats: List[KeyStatsResult], limit: int = 5) -> List[KeyStatsResult]:
     """获取Top N用户"""
     return sort_by_cost(stats)[:limit]
 
 
+def fleet_records(stats: List[KeyStatsResult]) -> ModelRecords:
+    """合并所有成功Key的模型明细，用于按Key/按模型的向量化分组统计"""
+    return ModelRecords.concat(s.records for s in stats if s.success and s.records is not None)
+
+
 def calculate_totals(stats: List[KeyStatsResult]) -> AggregatedStats:
     """计算总计"""
+    active = [s for s in stats if s.success]
+    if active and all(s.records is not None for s in active):
+        return aggregate_records(fleet_records(active))
+
     totals = AggregatedStats()
     
     for key in stats:
@@ -102,10 +99,15 @@ def compare_users(user1: KeyStatsResult, user2: KeyStatsResult) -> dict:
     }
 
 
-def generate_summary(stats: List[KeyStatsResult], daily_limit: float = 40.0) -> dict:
-    """生成统计摘要"""
+def generate_summary(
+    stats: List[KeyStatsResult],
+    daily_limit: float = 40.0,
+    totals: Optional[AggregatedStats] = None
+) -> dict:
+    """生成统计摘要（可传入缓存中增量维护的总计）"""
     active_stats = [s for s in stats if s.success]
-    totals = calculate_totals(stats)
+    if totals is None:
+        totals = calculate_totals(stats)
     top_users = get_top_users(stats, 1)
     anomalies = detect_anomalies(stats, daily_limit)
     
@@ -118,6 +120,7 @@ def generate_summary(stats: List[KeyStatsResult], daily_limit: float = 40.0) ->
         'avg_cost_per_user': totals.totalCost / len(active_stats) if active_stats else 0,
         'avg_requests_per_user': totals.requests / len(active_stats) if active_stats else 0,
         'top_user': top_users[0] if top_users else None,
-        'anomalies': anomalies
+        'anomalies': anomalies,
+        'stale_users': len([s for s in stats if s.stale])
     }
 
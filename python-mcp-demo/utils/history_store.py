@@ -0,0 +1,193 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .api_client import KeyStatsResult
+from .tracing import span
+
+DEFAULT_HISTORY_PATH = str(Path(__file__).parent.parent / 'data' / 'stats_history.db')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS key_stats (
+    tenant TEXT NOT NULL DEFAULT 'default',
+    period TEXT NOT NULL,
+    day TEXT NOT NULL,
+    key_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    account TEXT NOT NULL,
+    requests INTEGER NOT NULL,
+    all_tokens INTEGER NOT NULL,
+    total_cost REAL NOT NULL,
+    input_tokens INTEGER NOT NULL,
+    recorded_at REAL NOT NULL
+);
+"""
+
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_key_stats_tenant_day ON key_stats (tenant, period, day, key_id, recorded_at);
+CREATE INDEX IF NOT EXISTS idx_key_stats_account ON key_stats (account, period, day);
+DROP INDEX IF EXISTS idx_key_stats_day;
+"""
+
+
+def key_id_of(api_key: str) -> str:
+    """API Key的稳定标识（不落盘明文Key）"""
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]
+
+
+class HistoryStore:
+    """
+    本地统计时序库（SQLite）
+
+    每次刷新把各Key的汇总数据各追加一行（一次刷新一个事务）；同一天内的多次记录以最后一次为准。
+    历史日期会被压缩为每天每个Key一行，查询不需要再请求上游API。
+    使用 WAL 模式：写入时不阻塞查询，提交时不必每次同步到磁盘。
+    """
+
+    def __init__(self, path: str = DEFAULT_HISTORY_PATH):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(key_stats)")]
+        if 'tenant' not in columns:
+            # 旧版本的库没有租户列
+            self._conn.execute("ALTER TABLE key_stats ADD COLUMN tenant TEXT NOT NULL DEFAULT 'default'")
+        self._conn.executescript(_INDEXES)
+        self._lock = threading.Lock()
+        self._compacted_day: Optional[str] = None
+
+    def append(
+        self,
+        period: str,
+        results: List[Tuple[KeyStatsResult, float]],
+        tenant: str = 'default'
+    ):
+        """在一个事务中追加多条Key的统计记录 [(结果, 获取时间)]（只记录成功获取的数据）"""
+        rows = []
+        for result, recorded_at in results:
+            if not result.success or result.stale:
+                continue
+            recorded_at = recorded_at or time.time()
+            rows.append((
+                tenant, period, date.fromtimestamp(recorded_at).isoformat(),
+                key_id_of(result.apiKey), result.name, result.account,
+                result.stats.requests, result.stats.allTokens,
+                result.stats.totalCost, result.stats.inputTokens, recorded_at
+            ))
+        if not rows:
+            return
+        with span('history'), self._lock, self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO key_stats (
+                    tenant, period, day, key_id, name, account,
+                    requests, all_tokens, total_cost, input_tokens, recorded_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                rows
+            )
+        day = max(row[2] for row in rows)
+        if self._compacted_day != day:
+            self.compact(day)
+
+    def compact(self, before_day: str):
+        """删除历史日期中被覆盖的记录，只保留每天每个Key的最后一条"""
+        with self._lock:
+            self._conn.execute(
+                """
+                DELETE FROM key_stats
+                WHERE day < ? AND rowid NOT IN (
+                    SELECT rowid FROM (
+                        SELECT rowid, MAX(recorded_at) FROM key_stats
+                        WHERE day < ? GROUP BY tenant, period, day, key_id
+                    )
+                )
+                """,
+                (before_day, before_day)
+            )
+            self._conn.commit()
+        self._compacted_day = before_day
+
+    def _latest_rows(
+        self,
+        period: str,
+        start: date,
+        end: date,
+        account: Optional[str] = None,
+        tenant: str = 'default'
+    ) -> List[sqlite3.Row]:
+        """查询区间内每天每个Key的最后一条记录"""
+        sql = """
+            SELECT day, key_id, name, account, requests, all_tokens, total_cost, input_tokens,
+                   MAX(recorded_at) AS recorded_at
+            FROM key_stats
+            WHERE tenant = ? AND period = ? AND day BETWEEN ? AND ?
+        """
+        params = [tenant, period, start.isoformat(), end.isoformat()]
+        if account is not None:
+            sql += " AND account = ?"
+            params.append(account)
+        sql += " GROUP BY day, key_id ORDER BY day"
+        with span('history'), self._lock:
+            cursor = self._conn.execute(sql, params)
+            cursor.row_factory = sqlite3.Row
+            return cursor.fetchall()
+
+    def daily_totals(self, start: date, end: date, tenant: str = 'default') -> List[Dict]:
+        """按天汇总区间内所有Key的费用、请求数和Token"""
+        days: Dict[str, Dict] = {}
+        for row in self._latest_rows('daily', start, end, tenant=tenant):
+            day = days.setdefault(row['day'], {
+                'day': row['day'], 'cost': 0.0, 'requests': 0, 'tokens': 0, 'users': 0
+            })
+            day['cost'] += row['total_cost']
+            day['requests'] += row['requests']
+            day['tokens'] += row['all_tokens']
+            day['users'] += 1
+        return list(days.values())
+
+    def rolling_average(self, days: int, end: Optional[date] = None, tenant: str = 'default') -> Optional[Dict]:
+        """最近N个完整自然日的日均费用（不含end当天），无历史数据时返回None"""
+        end = end or date.today()
+        start = end - timedelta(days=days)
+        totals = self.daily_totals(start, end - timedelta(days=1), tenant)
+        if not totals:
+            return None
+        cost = sum(d['cost'] for d in totals)
+        requests = sum(d['requests'] for d in totals)
+        return {
+            'days': len(totals),
+            'avg_cost': cost / len(totals),
+            'avg_requests': requests / len(totals)
+        }
+
+    def user_trend(self, account: str, start: date, end: date, tenant: str = 'default') -> List[Dict]:
+        """单个用户区间内每天的使用情况"""
+        return [
+            {
+                'day': row['day'],
+                'cost': row['total_cost'],
+                'requests': row['requests'],
+                'tokens': row['all_tokens']
+            }
+            for row in self._latest_rows('daily', start, end, account, tenant)
+        ]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_history_store() -> Optional[HistoryStore]:
+    """根据环境变量打开历史库（STATS_HISTORY_ENABLED=false 时关闭）"""
+    if os.getenv('STATS_HISTORY_ENABLED', 'true').lower() in ('0', 'false', 'no'):
+        return None
+    return HistoryStore(os.getenv('STATS_HISTORY_PATH', DEFAULT_HISTORY_PATH))
@@ -0,0 +1,81 @@
+import bisect
+import json
+import os
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+DEFAULT_HOLIDAYS_PATH = str(Path(__file__).parent / 'holidays_cn.json')
+
+
+def count_weekdays(start_date: date, end_date: date) -> int:
+    """闭式计算 [start_date, end_date] 内周一到周五的天数，O(1)"""
+    if end_date < start_date:
+        return 0
+    days = end_date.toordinal() - start_date.toordinal() + 1
+    full_weeks, extra = divmod(days, 7)
+    start = start_date.weekday()  # 0 = Monday, 6 = Sunday
+    # 不足一周的部分：[start, start + extra) 中星期索引 < 5 的天数（可能跨周）
+    tail = max(0, min(start + extra, 5) - min(start, 5)) + max(0, min(start + extra - 7, 5))
+    return full_weeks * 5 + tail
+
+
+class HolidayCalendar:
+    """
+    节假日与调休日历
+
+    只保存会改变工作日计数的日期：落在工作日的法定假日、落在周末的调休上班日，
+    均按序数排序，区间计数用二分查找，O(log h)。
+    """
+
+    def __init__(self, holidays: Iterable[date] = (), workdays: Iterable[date] = ()):
+        self._holidays: List[int] = sorted({d.toordinal() for d in holidays if d.weekday() < 5})
+        self._workdays: List[int] = sorted({d.toordinal() for d in workdays if d.weekday() >= 5})
+
+    @staticmethod
+    def _count(ordinals: List[int], start: date, end: date) -> int:
+        return bisect.bisect_right(ordinals, end.toordinal()) - bisect.bisect_left(ordinals, start.toordinal())
+
+    def workdays_between(self, start_date: date, end_date: date) -> int:
+        """区间内的实际工作日数（周一到周五，扣除法定假日，加上调休上班日）"""
+        if end_date < start_date:
+            return 0
+        return (
+            count_weekdays(start_date, end_date)
+            - self._count(self._holidays, start_date, end_date)
+            + self._count(self._workdays, start_date, end_date)
+        )
+
+    def is_workday(self, day: date) -> bool:
+        return self.workdays_between(day, day) == 1
+
+    @classmethod
+    def load(cls, path: str) -> 'HolidayCalendar':
+        """从JSON文件加载（holidays 为日期区间列表，workdays 为调休上班日列表）"""
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+
+        holidays = []
+        for item in config.get('holidays', []):
+            start = date.fromisoformat(item['start'])
+            end = date.fromisoformat(item.get('end', item['start']))
+            holidays.extend(start + timedelta(days=i) for i in range((end - start).days + 1))
+        workdays = [date.fromisoformat(d) for d in config.get('workdays', [])]
+        return cls(holidays, workdays)
+
+
+_default_calendar: Optional[HolidayCalendar] = None
+
+
+def get_default_calendar() -> HolidayCalendar:
+    """默认日历（HOLIDAYS_CONFIG_PATH 指定的文件，缺省为中国法定节假日），只加载一次"""
+    global _default_calendar
+    if _default_calendar is None:
+        path = os.getenv('HOLIDAYS_CONFIG_PATH', DEFAULT_HOLIDAYS_PATH)
+        try:
+            _default_calendar = HolidayCalendar.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"加载节假日配置失败，仅排除周末: {str(e)}", file=sys.stderr)
+            _default_calendar = HolidayCalendar()
+    return _default_calendar
@@ -0,0 +1,63 @@
+from typing import Dict, List, Optional, Tuple
+
+from .columnar import ModelRecords
+
+
+def cache_ratio(sums: Dict[str, float]) -> float:
+    """缓存读取Token占全部输入类Token的比例"""
+    prompt_tokens = sums['inputTokens'] + sums['cacheCreateTokens'] + sums['cacheReadTokens']
+    return sums['cacheReadTokens'] / prompt_tokens if prompt_tokens else 0.0
+
+
+class ModelIndex:
+    """
+    按模型和按Key的统计索引
+
+    由缓存中所有Key的模型明细构建，每次缓存刷新后构建一次。
+    模型维度的Top N、费用占比和缓存Token比例都直接从索引中读取，不再请求上游API。
+    """
+
+    def __init__(self, records: ModelRecords):
+        self.records = records
+        self.by_model: Dict[str, Dict[str, float]] = records.sum_by_model()
+        self.total_cost = sum(m['totalCost'] for m in self.by_model.values())
+
+        # 模型 -> [(Key, 统计)]，Key -> {模型: 统计}
+        self.model_keys: Dict[str, List[Tuple[str, Dict[str, float]]]] = {}
+        self.key_models: Dict[str, Dict[str, Dict[str, float]]] = {}
+        for (key, model), sums in records.sum_by_key_model().items():
+            if not (sums['requests'] or sums['allTokens'] or sums['totalCost']):
+                continue
+            self.model_keys.setdefault(model, []).append((key, sums))
+            self.key_models.setdefault(key, {})[model] = sums
+        for entries in self.model_keys.values():
+            entries.sort(key=lambda item: item[1]['totalCost'], reverse=True)
+
+        self._ranking: Dict[str, List[str]] = {}
+
+    def top_models(self, limit: int = 5, column: str = 'totalCost') -> List[Tuple[str, Dict[str, float]]]:
+        """按指定列排序的前N个模型（排名按列缓存）"""
+        ranking = self._ranking.get(column)
+        if ranking is None:
+            ranking = sorted(self.by_model, key=lambda m: self.by_model[m][column], reverse=True)
+            self._ranking[column] = ranking
+        return [(model, self.by_model[model]) for model in ranking[:limit]]
+
+    def top_keys(self, model: str, limit: int = 3) -> List[Tuple[str, Dict[str, float]]]:
+        """某个模型费用最高的Key"""
+        return self.model_keys.get(model, [])[:limit]
+
+    def cost_share(self, key: Optional[str] = None) -> List[Tuple[str, Dict[str, float], float]]:
+        """各模型的费用占比（可限定单个Key），按费用从高到低"""
+        models = self.by_model if key is None else self.key_models.get(key, {})
+        total = sum(m['totalCost'] for m in models.values())
+        ranked = sorted(models.items(), key=lambda item: item[1]['totalCost'], reverse=True)
+        return [(model, sums, sums['totalCost'] / total if total else 0.0) for model, sums in ranked]
+
+    def find_model(self, name: str) -> Optional[str]:
+        """按名称（支持部分匹配）查找模型"""
+        if name in self.by_model:
+            return name
+        name_lower = name.lower()
+        matches = [m for m in self.by_model if name_lower in m.lower()]
+        return min(matches, key=len) if matches else None
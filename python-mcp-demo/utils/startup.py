@@ -0,0 +1,103 @@
+"""启动耗时统计
+记录服务启动各阶段和延迟创建的组件耗时，并可以用 -X importtime 给出导入耗时明细
+
+stdio 模式下每个 IDE 会话都会启动一个服务进程，启动耗时就是用户等待第一次响应的时间。
+"""
+
+import os
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+# 本模块在 server.py 中最先导入，以此作为起点（解释器自身的启动时间不计入）
+_START = time.perf_counter()
+_marks: Dict[str, float] = {}
+_components: Dict[str, float] = {}
+
+
+def elapsed_ms() -> float:
+    """距起点的毫秒数"""
+    return (time.perf_counter() - _START) * 1000
+
+
+def mark(name: str):
+    """记录阶段（同名只记录第一次）"""
+    _marks.setdefault(name, round(elapsed_ms(), 2))
+
+
+@contextmanager
+def timed(component: str):
+    """记录延迟创建的组件耗时"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _components[component] = round((time.perf_counter() - start) * 1000, 2)
+
+
+def report() -> Dict:
+    """当前进程的启动耗时"""
+    return {
+        'pid': os.getpid(),
+        'marks_ms': dict(_marks),
+        'lazy_components_ms': dict(_components),
+        'uptime_s': round(elapsed_ms() / 1000, 1)
+    }
+
+
+def importtime_report(module: str = 'server', cwd: Optional[str] = None, top: int = 15) -> Dict:
+    """
+    在子进程中用 -X importtime 导入模块，统计导入耗时
+
+    Args:
+        module: 要导入的模块
+        cwd: 子进程工作目录（默认当前目录）
+        top: 返回的模块数
+
+    Returns:
+        总耗时、按累计耗时排序的模块、按顶层包汇总的自身耗时
+    """
+    # 只在生成报告时才导入，不计入服务自身的启动时间
+    import re
+    import subprocess
+
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=cwd, capture_output=True, text=True, timeout=120
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败: {proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else proc.returncode}")
+
+    entries: List[Dict] = []
+    packages: Dict[str, float] = {}
+    for line in proc.stderr.splitlines():
+        match = re.match(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)', line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = int(match.group(1)), int(match.group(2)), match.group(3), match.group(4)
+        entries.append({
+            'module': name,
+            'depth': (len(indent) - 1) // 2,
+            'self_ms': round(self_us / 1000, 2),
+            'cumulative_ms': round(cumulative_us / 1000, 2)
+        })
+        package = name.split('.')[0]
+        packages[package] = packages.get(package, 0) + self_us / 1000
+
+    target = next((e for e in entries if e['module'] == module and e['depth'] == 0), None)
+    return {
+        'module': module,
+        'import_ms': target['cumulative_ms'] if target else None,
+        'process_wall_ms': round(wall_ms, 2),
+        'top_cumulative': sorted(
+            (e for e in entries if e['depth'] <= 1),
+            key=lambda e: e['cumulative_ms'], reverse=True
+        )[:top],
+        'top_packages': [
+            {'package': name, 'self_ms': round(ms, 2)}
+            for name, ms in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+        ]
+    }
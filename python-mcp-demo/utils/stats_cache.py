@@ -0,0 +1,284 @@
+import asyncio
+import sys
+import time
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional, Tuple
+
+from .api_client import ApiKeyInfo, AggregatedStats, KeyStatsResult, get_key_stats
+from .history_store import HistoryStore
+from .stats_snapshot import StatsSnapshot
+
+CACHE_TTL = 5 * 60  # 单个Key的缓存有效期（秒）
+FAILED_RETRY_INTERVAL = 60  # 失败Key的最短重试间隔（秒）
+REFRESH_SOFT_TIMEOUT = 8.0  # 等待慢Key的最长时间（秒），超时后先返回上次的有效数据
+
+ENTRY_OVERHEAD_BYTES = 1024  # 单个Key除模型明细外的大致内存占用
+RECORD_ROW_BYTES = 8 * 9  # 每行模型明细：7个数值列 + 2个编号列
+
+STATUS_OK = 'ok'
+STATUS_FAILED = 'failed'
+STATUS_STALE = 'stale'
+
+
+@dataclass
+class CacheEntry:
+    """单个Key的缓存条目"""
+    key_info: ApiKeyInfo
+    result: KeyStatsResult
+    status: str = STATUS_OK
+    fetched_at: float = 0.0  # 最近一次成功获取的时间
+    checked_at: float = 0.0  # 最近一次尝试刷新的时间
+
+
+def _add_stats(totals: AggregatedStats, stats: AggregatedStats, sign: int = 1):
+    """把单个Key的统计累加（或扣减）到总计中"""
+    totals.requests += sign * stats.requests
+    totals.allTokens += sign * stats.allTokens
+    totals.totalCost += sign * stats.totalCost
+    totals.inputTokens += sign * stats.inputTokens
+
+
+class StatsCache:
+    """按Key缓存统计数据，只刷新过期或失败的Key，并增量维护总计"""
+
+    def __init__(
+        self,
+        period: str,
+        ttl: float = CACHE_TTL,
+        retry_interval: float = FAILED_RETRY_INTERVAL,
+        soft_timeout: float = REFRESH_SOFT_TIMEOUT,
+        history: Optional[HistoryStore] = None,
+        tenant: str = 'default'
+    ):
+        self.period = period
+        self.tenant = tenant
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+        self.soft_timeout = soft_timeout
+        self.history = history
+        self.entries: Dict[str, CacheEntry] = {}
+        self.totals = AggregatedStats()
+        self.version = 0  # 每次缓存内容变化时递增
+        self.config_version: Optional[str] = None  # 当前数据对应的Key配置版本
+        self._order: List[str] = []
+        self._snapshot: Optional[StatsSnapshot] = None
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._history_rows: List[Tuple[KeyStatsResult, float]] = []  # 待写入历史库的结果
+        self._lock = asyncio.Lock()
+
+    def _needs_refresh(self, entry: Optional[CacheEntry], now: float) -> bool:
+        """判断Key是否需要刷新"""
+        if entry is None:
+            return True
+        if entry.status == STATUS_OK:
+            return now - entry.fetched_at >= self.ttl
+        return now - entry.checked_at >= self.retry_interval
+
+    def _counted(self, entry: Optional[CacheEntry]) -> bool:
+        return entry is not None and entry.result.success
+
+    def _remove(self, api_key: str):
+        """移除配置中已删除的Key"""
+        entry = self.entries.pop(api_key, None)
+        if self._counted(entry):
+            _add_stats(self.totals, entry.result.stats, -1)
+        task = self._inflight.pop(api_key, None)
+        if task:
+            task.cancel()
+        self.version += 1
+
+    def _apply(self, key_info: ApiKeyInfo, result: KeyStatsResult, now: float):
+        """写入一次刷新结果；失败时保留上次的有效数据并标记为过期"""
+        old = self.entries.get(key_info.apiKey)
+
+        if result.success:
+            entry = CacheEntry(key_info, result, STATUS_OK, fetched_at=now, checked_at=now)
+            if self.history is not None:
+                # 刷新结束时一次写入，不为每个Key单独提交
+                self._history_rows.append((result, now))
+        elif old is not None and old.result.success:
+            stale_result = replace(old.result, stale=True, error=result.error)
+            entry = CacheEntry(key_info, stale_result, STATUS_STALE, fetched_at=old.fetched_at, checked_at=now)
+        else:
+            entry = CacheEntry(key_info, result, STATUS_FAILED, checked_at=now)
+
+        if self._counted(old):
+            _add_stats(self.totals, old.result.stats, -1)
+        if self._counted(entry):
+            _add_stats(self.totals, entry.result.stats)
+        self.entries[key_info.apiKey] = entry
+        self.version += 1
+
+    def _mark_pending(self, key_info: ApiKeyInfo):
+        """慢Key尚未返回时，先把上次的有效数据标记为过期"""
+        entry = self.entries.get(key_info.apiKey)
+        if entry is not None and entry.status == STATUS_OK:
+            entry.status = STATUS_STALE
+            entry.result = replace(entry.result, stale=True, error='刷新中，暂用上次数据')
+            self.version += 1
+
+    def _start_fetch(self, key_info: ApiKeyInfo) -> asyncio.Task:
+        """启动单个Key的刷新任务（同一个Key不会重复请求）"""
+        task = self._inflight.get(key_info.apiKey)
+        if task is not None and not task.done():
+            return task
+
+        async def run():
+            result = await get_key_stats(key_info, self.period)
+            # 刷新期间Key可能已从配置中移除
+            if self._inflight.get(key_info.apiKey) is task:
+                self._inflight.pop(key_info.apiKey, None)
+                current = self.entries.get(key_info.apiKey)
+                applied = key_info
+                if current is not None and current.key_info != key_info:
+                    # 刷新期间Key被改名（账号变化的Key会被移除，不会走到这里）：沿用新名称
+                    applied = current.key_info
+                    result = replace(result, name=applied.name)
+                self._apply(applied, result, time.time())
+                if not self._lock.locked():
+                    # 刷新已返回后才完成的慢Key
+                    self._flush_history()
+            return result
+
+        task = asyncio.ensure_future(run())
+        self._inflight[key_info.apiKey] = task
+        return task
+
+    def sync_keys(self, api_keys: List[ApiKeyInfo], config_version: Optional[str] = None) -> List[ApiKeyInfo]:
+        """按配置同步Key：丢弃已删除的Key，更新改名的Key，返回尚无缓存的Key"""
+        wanted = {k.apiKey: k for k in api_keys}
+        for api_key, entry in list(self.entries.items()):
+            key_info = wanted.get(api_key)
+            # 删除的Key，或账号变化的Key（按模型明细以账号为标识）需要移除
+            if key_info is None or key_info.account != entry.key_info.account:
+                self._remove(api_key)
+            elif key_info != entry.key_info:
+                entry.key_info = key_info
+                entry.result = replace(entry.result, name=key_info.name)
+                self.version += 1
+
+        order = [k.apiKey for k in api_keys]
+        if order != self._order:
+            self._order = order
+            self.version += 1
+        if config_version is not None and config_version != self.config_version:
+            self.config_version = config_version
+            self.version += 1
+        return [k for k in api_keys if k.apiKey not in self.entries]
+
+    async def get(
+        self,
+        api_keys: List[ApiKeyInfo],
+        force_refresh: bool = False,
+        config_version: Optional[str] = None
+    ) -> List[KeyStatsResult]:
+        """获取所有Key的统计数据，只刷新过期或失败的Key"""
+        async with self._lock:
+            now = time.time()
+            self.sync_keys(api_keys, config_version)
+
+            to_refresh = [
+                k for k in api_keys
+                if force_refresh or self._needs_refresh(self.entries.get(k.apiKey), now)
+            ]
+            if to_refresh:
+                await self._refresh(to_refresh)
+
+            return self.results()
+
+    async def apply_config(self, api_keys: List[ApiKeyInfo], config_version: Optional[str] = None):
+        """配置变化时只处理增删的Key：删除的丢弃，新增的立即获取"""
+        async with self._lock:
+            if not self.entries:
+                # 还没有被查询过，等首次查询时再获取
+                self.sync_keys(api_keys, config_version)
+                return
+            added = self.sync_keys(api_keys, config_version)
+            if added:
+                await self._refresh(added)
+
+    async def _refresh(self, key_infos: List[ApiKeyInfo]):
+        """并发刷新指定Key；有旧数据的慢Key不阻塞本次返回"""
+        label = '今日' if self.period == 'daily' else '本月'
+        print(f"开始刷新 {len(key_infos)} 个Key的{label}统计数据...", file=sys.stderr)
+
+        tasks = {k.apiKey: self._start_fetch(k) for k in key_infos}
+        done, pending = await asyncio.wait(tasks.values(), timeout=self.soft_timeout)
+
+        # 没有任何旧数据的Key必须等待首次结果
+        must_wait = [
+            tasks[k.apiKey] for k in key_infos
+            if tasks[k.apiKey] in pending and not self._counted(self.entries.get(k.apiKey))
+        ]
+        if must_wait:
+            await asyncio.wait(must_wait)
+
+        slow = [k for k in key_infos if not tasks[k.apiKey].done()]
+        for key_info in slow:
+            self._mark_pending(key_info)
+        self._flush_history()
+
+        counts = {STATUS_OK: 0, STATUS_FAILED: 0, STATUS_STALE: 0}
+        for k in key_infos:
+            entry = self.entries.get(k.apiKey)
+            if entry is not None:
+                counts[entry.status] += 1
+        print(
+            f"刷新完成: {counts[STATUS_OK]} 成功, {counts[STATUS_FAILED]} 失败, "
+            f"{counts[STATUS_STALE]} 使用上次数据（其中 {len(slow)} 个仍在后台刷新）",
+            file=sys.stderr
+        )
+
+    def _flush_history(self):
+        """把已完成的刷新结果写入历史库"""
+        rows, self._history_rows = self._history_rows, []
+        if not rows or self.history is None:
+            return
+        try:
+            self.history.append(self.period, rows, self.tenant)
+        except Exception as e:
+            print(f"写入历史统计失败: {str(e)}", file=sys.stderr)
+
+    def results(self) -> List[KeyStatsResult]:
+        """按配置顺序返回当前缓存的结果"""
+        return [self.entries[k].result for k in self._order if k in self.entries]
+
+    def snapshot(self) -> StatsSnapshot:
+        """当前缓存内容的只读快照（缓存变化后才重建）"""
+        if self._snapshot is None or self._snapshot.version != self.version:
+            self._snapshot = StatsSnapshot(self.results(), self.totals, self.version, self.config_version)
+        return self._snapshot
+
+    def memory_estimate(self) -> int:
+        """缓存的大致内存占用（字节）"""
+        rows = sum(len(e.result.records) for e in self.entries.values() if e.result.records is not None)
+        return len(self.entries) * ENTRY_OVERHEAD_BYTES + rows * RECORD_ROW_BYTES
+
+    def trim(self, max_bytes: int) -> int:
+        """超出内存上限时，从最早获取的Key开始丢弃模型明细（汇总数据保留），返回丢弃的Key数"""
+        trimmed = 0
+        usage = self.memory_estimate()
+        for entry in sorted(self.entries.values(), key=lambda e: e.fetched_at):
+            if usage <= max_bytes:
+                break
+            if entry.result.records is None:
+                continue
+            usage -= len(entry.result.records) * RECORD_ROW_BYTES
+            entry.result = replace(entry.result, records=None)
+            trimmed += 1
+        if trimmed:
+            self.version += 1
+        return trimmed
+
+    def busy(self) -> bool:
+        """是否正在刷新"""
+        return self._lock.locked() or any(not t.done() for t in self._inflight.values())
+
+    def invalidate(self):
+        """清空缓存"""
+        for task in self._inflight.values():
+            task.cancel()
+        self._inflight.clear()
+        self.entries.clear()
+        self.totals = AggregatedStats()
+        self.version += 1
@@ -0,0 +1,105 @@
+import bisect
+from typing import Dict, List, Optional, Tuple
+
+from .api_client import AggregatedStats, KeyStatsResult
+from .columnar import ModelRecords
+from .model_index import ModelIndex
+from .tracing import span
+from .user_index import UserIndex
+
+
+class StatsSnapshot:
+    """
+    统计数据快照（每次缓存刷新后构建一次，只读）
+
+    预先算好总计、按费用/请求数排好的排名和异常分桶，
+    各工具直接读取，单次调用只需 O(k)。
+    """
+
+    __slots__ = (
+        'version', 'config_version', 'stats', 'totals', 'total_users', 'active_users',
+        'stale_users', 'trimmed_users', 'by_cost', 'by_requests', '_neg_costs', '_anomaly_buckets',
+        '_user_index', '_model_index'
+    )
+
+    def __init__(
+        self,
+        stats: List[KeyStatsResult],
+        totals: AggregatedStats,
+        version: int = 0,
+        config_version: Optional[str] = None
+    ):
+        self.version = version
+        self.config_version = config_version
+        self.stats: Tuple[KeyStatsResult, ...] = tuple(stats)
+        self.totals = AggregatedStats(totals.requests, totals.allTokens, totals.totalCost, totals.inputTokens)
+        self.total_users = len(self.stats)
+        self.active_users = sum(1 for s in self.stats if s.success)
+        self.stale_users = sum(1 for s in self.stats if s.stale)
+        # 模型明细因分片内存上限被丢弃的用户（汇总数据仍在，但不计入按模型的统计）
+        self.trimmed_users: Tuple[KeyStatsResult, ...] = tuple(
+            s for s in self.stats if s.success and s.records is None
+        )
+        self.by_cost: Tuple[KeyStatsResult, ...] = tuple(
+            sorted(self.stats, key=lambda x: x.stats.totalCost, reverse=True)
+        )
+        self.by_requests: Tuple[KeyStatsResult, ...] = tuple(
+            sorted(self.stats, key=lambda x: x.stats.requests, reverse=True)
+        )
+        # 费用取负后升序，便于二分查找阈值边界
+        self._neg_costs = [-s.stats.totalCost for s in self.by_cost]
+        self._anomaly_buckets: Dict[float, Tuple[KeyStatsResult, ...]] = {}
+        self._user_index: Optional[UserIndex] = None
+        self._model_index: Optional[ModelIndex] = None
+
+    @property
+    def user_index(self) -> UserIndex:
+        """用户查找索引（首次使用时构建）"""
+        if self._user_index is None:
+            with span('index'):
+                self._user_index = UserIndex(list(self.stats))
+        return self._user_index
+
+    @property
+    def model_index(self) -> ModelIndex:
+        """按模型/按Key的统计索引（首次使用时由各Key的模型明细构建，不含 trimmed_users）"""
+        if self._model_index is None:
+            with span('index'):
+                records = ModelRecords.concat(
+                    s.records for s in self.stats if s.success and s.records is not None
+                )
+                self._model_index = ModelIndex(records)
+        return self._model_index
+
+    def top_by_cost(self, limit: int = 5) -> Tuple[KeyStatsResult, ...]:
+        """费用最高的前N名"""
+        return self.by_cost[:limit]
+
+    def top_by_requests(self, limit: int = 5) -> Tuple[KeyStatsResult, ...]:
+        """请求数最多的前N名"""
+        return self.by_requests[:limit]
+
+    def anomalies(self, threshold: float = 40.0) -> Tuple[KeyStatsResult, ...]:
+        """费用超过阈值的账号（按阈值分桶缓存）"""
+        bucket = self._anomaly_buckets.get(threshold)
+        if bucket is None:
+            end = bisect.bisect_left(self._neg_costs, -threshold)
+            bucket = tuple(s for s in self.by_cost[:end] if s.success)
+            self._anomaly_buckets[threshold] = bucket
+        return bucket
+
+    def summary(self, daily_limit: float = 40.0) -> dict:
+        """统计摘要，字段与 generate_summary 一致"""
+        active = self.active_users
+        return {
+            'total_users': self.total_users,
+            'active_users': active,
+            'total_cost': self.totals.totalCost,
+            'total_requests': self.totals.requests,
+            'total_tokens': self.totals.allTokens,
+            'avg_cost_per_user': self.totals.totalCost / active if active else 0,
+            'avg_requests_per_user': self.totals.requests / active if active else 0,
+            'top_user': self.by_cost[0] if self.by_cost else None,
+            'anomalies': list(self.anomalies(daily_limit)),
+            'stale_users': self.stale_users
+        }
@@ -0,0 +1,142 @@
+import os
+import sys
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .config_loader import ConfigWatcher, KeyConfig, load_key_config
+from .history_store import HistoryStore
+from .stats_cache import StatsCache
+
+DEFAULT_TENANT = 'default'
+MAX_SHARDS = 16  # 同时保留的租户分片数
+SHARD_IDLE_TTL = 30 * 60  # 分片空闲多久后可被淘汰（秒）
+SHARD_MAX_BYTES = 64 * 1024 * 1024  # 单个分片的内存上限（字节）
+
+
+class TenantShard:
+    """单个租户的缓存分片：独立的Key配置、日/月缓存和刷新锁"""
+
+    def __init__(self, tenant: str, config_path: Optional[str], history: Optional[HistoryStore] = None):
+        self.tenant = tenant
+        self.config_path = config_path
+        self.daily = StatsCache('daily', history=history, tenant=tenant)
+        self.monthly = StatsCache('monthly', history=history, tenant=tenant)
+        self.last_used = time.time()
+        self.watcher: Optional[ConfigWatcher] = None
+
+    def cache(self, period: str) -> StatsCache:
+        return self.daily if period == 'daily' else self.monthly
+
+    def load_config(self) -> KeyConfig:
+        return load_key_config(self.config_path)
+
+    async def apply_config(self, key_config: KeyConfig):
+        """Key配置变化：只获取新增的Key，丢弃删除的Key"""
+        for cache in (self.daily, self.monthly):
+            await cache.apply_config(list(key_config.keys), key_config.version)
+
+    def memory_estimate(self) -> int:
+        return self.daily.memory_estimate() + self.monthly.memory_estimate()
+
+    def busy(self) -> bool:
+        return self.daily.busy() or self.monthly.busy()
+
+    def close(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+        self.daily.invalidate()
+        self.monthly.invalidate()
+
+
+class TenantCacheManager:
+    """
+    多租户分片缓存
+
+    每个租户对应一个Key配置文件和一个分片。分片有各自的锁，
+    大租户刷新时不会阻塞小租户的查询；空闲分片按LRU淘汰，单个分片超过内存上限时丢弃最早的模型明细。
+    """
+
+    def __init__(
+        self,
+        tenants: Dict[str, Optional[str]],
+        history: Optional[HistoryStore] = None,
+        max_shards: int = MAX_SHARDS,
+        idle_ttl: float = SHARD_IDLE_TTL,
+        max_shard_bytes: int = SHARD_MAX_BYTES,
+        watch_interval: Optional[float] = None
+    ):
+        self.tenants = tenants
+        self.history = history
+        self.max_shards = max_shards
+        self.idle_ttl = idle_ttl
+        self.max_shard_bytes = max_shard_bytes
+        self.watch_interval = watch_interval
+        self._shards: 'OrderedDict[str, TenantShard]' = OrderedDict()
+
+    def tenant_names(self) -> List[str]:
+        return list(self.tenants)
+
+    def resolve(self, tenant: str = '') -> str:
+        """校验租户名称，留空为默认租户"""
+        tenant = tenant or DEFAULT_TENANT
+        if tenant not in self.tenants:
+            raise ValueError(f"未知租户: {tenant}，可用租户: {', '.join(self.tenants)}")
+        return tenant
+
+    def shard(self, tenant: str = '') -> TenantShard:
+        """获取租户分片（不存在时创建），并更新LRU顺序"""
+        tenant = self.resolve(tenant)
+
+        shard = self._shards.get(tenant)
+        if shard is None:
+            shard = TenantShard(tenant, self.tenants[tenant], self.history)
+            if self.watch_interval:
+                shard.watcher = ConfigWatcher(shard.apply_config, shard.config_path, self.watch_interval)
+            self._shards[tenant] = shard
+        self._shards.move_to_end(tenant)
+        shard.last_used = time.time()
+        if shard.watcher is not None:
+            shard.watcher.start()
+        self._evict(keep=tenant)
+        return shard
+
+    def enforce_memory(self, shard: TenantShard):
+        """分片超过内存上限时丢弃最早获取的模型明细"""
+        usage = shard.memory_estimate()
+        if usage <= self.max_shard_bytes:
+            return
+        budget = self.max_shard_bytes // 2
+        trimmed = shard.daily.trim(budget) + shard.monthly.trim(budget)
+        print(
+            f"租户 {shard.tenant} 缓存约 {usage // 1024}KB，超过上限，已丢弃 {trimmed} 个Key的模型明细",
+            file=sys.stderr
+        )
+
+    def _evict(self, keep: str):
+        """淘汰超出数量或空闲过久的分片（正在刷新的分片不淘汰）"""
+        now = time.time()
+        for tenant in list(self._shards):
+            if len(self._shards) <= self.max_shards and now - self._shards[tenant].last_used < self.idle_ttl:
+                # 按LRU顺序，后面的分片更新，不需要再检查
+                break
+            shard = self._shards[tenant]
+            if tenant == keep or shard.busy():
+                continue
+            del self._shards[tenant]
+            shard.close()
+            print(f"淘汰空闲租户缓存: {tenant}", file=sys.stderr)
+
+
+def discover_tenants() -> Dict[str, Optional[str]]:
+    """
+    读取租户配置：默认租户使用 KEYS_CONFIG_PATH，
+    TENANT_KEYS_DIR 目录下每个 <租户名>.json 是一个租户的Key配置
+    """
+    tenants: Dict[str, Optional[str]] = {DEFAULT_TENANT: None}
+    tenant_dir = os.getenv('TENANT_KEYS_DIR')
+    if tenant_dir and Path(tenant_dir).is_dir():
+        for path in sorted(Path(tenant_dir).glob('*.json')):
+            tenants[path.stem] = str(path)
+    return tenants
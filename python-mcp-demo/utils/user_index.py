@@ -0,0 +1,139 @@
+import bisect
+import re
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set
+
+from .api_client import KeyStatsResult
+
+try:
+    from pypinyin import lazy_pinyin, Style
+except ImportError:  # 可选依赖：未安装时不生成拼音索引
+    lazy_pinyin = None
+
+# 匹配类型及基础得分
+MATCH_EXACT = 'exact'
+MATCH_PREFIX = 'prefix'
+MATCH_SUBSTRING = 'substring'
+MATCH_FUZZY = 'fuzzy'
+
+_SCORES = {MATCH_EXACT: 100.0, MATCH_PREFIX: 80.0, MATCH_SUBSTRING: 60.0, MATCH_FUZZY: 40.0}
+_SEPARATORS = re.compile(r'[\s\-_.·]+')
+_CJK = re.compile(r'[一-鿿]')
+FUZZY_MIN_SIMILARITY = 0.3
+
+
+def normalize(text: str) -> str:
+    """统一全半角、大小写并去掉空白和分隔符"""
+    return _SEPARATORS.sub('', unicodedata.normalize('NFKC', text).casefold())
+
+
+def _grams(text: str) -> Set[str]:
+    """生成二元组；单字符文本返回自身"""
+    if len(text) < 2:
+        return {text} if text else set()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def _index_keys(text: str) -> Set[str]:
+    """倒排表的键：二元组加单字符（单字查询也能命中）"""
+    return _grams(text) | set(text)
+
+
+@dataclass
+class UserMatch:
+    """一次查找的候选结果"""
+    user: KeyStatsResult
+    score: float
+    match_type: str
+    matched_on: str
+
+
+class UserIndex:
+    """
+    用户查找索引
+
+    每次缓存刷新后构建一次，在各工具之间复用。索引名称、账号（含@前的部分）
+    以及中文名的拼音/首字母（需安装 pypinyin），支持精确、前缀和模糊查找。
+    """
+
+    def __init__(self, stats: List[KeyStatsResult]):
+        self.stats = list(stats)
+        self._terms: List[List[str]] = []
+        self._exact: Dict[str, List[int]] = {}
+        self._sorted: List[tuple] = []
+        self._postings: Dict[str, Set[int]] = {}
+
+        for pos, s in enumerate(self.stats):
+            terms = self._terms_of(s)
+            self._terms.append(terms)
+            for term in terms:
+                self._exact.setdefault(term, []).append(pos)
+                self._sorted.append((term, pos))
+                for gram in _index_keys(term):
+                    self._postings.setdefault(gram, set()).add(pos)
+        self._sorted.sort()
+
+    @staticmethod
+    def _terms_of(s: KeyStatsResult) -> List[str]:
+        """一个用户的所有可检索词"""
+        terms = [normalize(s.name), normalize(s.account)]
+        if '@' in s.account:
+            terms.append(normalize(s.account.split('@', 1)[0]))
+        if lazy_pinyin is not None and _CJK.search(s.name):
+            terms.append(''.join(lazy_pinyin(s.name)))
+            terms.append(''.join(lazy_pinyin(s.name, style=Style.FIRST_LETTER)))
+        return list(dict.fromkeys(t for t in terms if t))
+
+    def _hit(self, hits: Dict[int, UserMatch], pos: int, score: float, match_type: str, term: str):
+        current = hits.get(pos)
+        if current is None or score > current.score:
+            hits[pos] = UserMatch(self.stats[pos], score, match_type, term)
+
+    def search(self, query: str, limit: int = 5) -> List[UserMatch]:
+        """按匹配程度返回排序后的候选用户"""
+        q = normalize(query)
+        if not q:
+            return []
+        hits: Dict[int, UserMatch] = {}
+
+        # 精确匹配
+        for pos in self._exact.get(q, []):
+            self._hit(hits, pos, _SCORES[MATCH_EXACT], MATCH_EXACT, q)
+
+        # 前缀匹配：有序词表上二分
+        i = bisect.bisect_left(self._sorted, (q,))
+        while i < len(self._sorted) and self._sorted[i][0].startswith(q):
+            term, pos = self._sorted[i]
+            # 越接近完整词得分越高
+            self._hit(hits, pos, _SCORES[MATCH_PREFIX] + 10 * len(q) / len(term), MATCH_PREFIX, term)
+            i += 1
+
+        # 子串与模糊匹配：用二元组倒排表筛选候选
+        q_grams = _grams(q)
+        candidates: Set[int] = set()
+        for gram in q_grams:
+            candidates.update(self._postings.get(gram, ()))
+
+        for pos in candidates:
+            for term in self._terms[pos]:
+                if q in term:
+                    self._hit(hits, pos, _SCORES[MATCH_SUBSTRING] + 10 * len(q) / len(term), MATCH_SUBSTRING, term)
+                    continue
+                similarity = 2 * len(q_grams & _grams(term)) / (len(q_grams) + len(_grams(term)))
+                if similarity >= FUZZY_MIN_SIMILARITY:
+                    self._hit(hits, pos, _SCORES[MATCH_FUZZY] * similarity, MATCH_FUZZY, term)
+
+        ranked = sorted(hits.values(), key=lambda m: (-m.score, m.user.name))
+        return ranked[:limit]
+
+    def best(self, query: str) -> Optional[UserMatch]:
+        """
+        返回得分最高的精确、前缀或子串匹配
+
+        只有模糊匹配时返回None（模糊匹配很可能是另一个人，应由调用方列出 search 的候选让用户确认）
+        """
+        matches = self.search(query, 1)
+        if matches and matches[0].match_type != MATCH_FUZZY:
+            return matches[0]
+        return None